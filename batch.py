@@ -0,0 +1,184 @@
+"""
+Batch invocation of the chat function, for offline evaluation and bulk re-grading of recorded sessions.
+---
+Each request is an event as sent to the Lambda `handler` (message + params, or a JSON body). The requests
+are read lazily and executed with bounded concurrency (`max_concurrency`), in a thread pool through `handler`
+or on the event loop through `async_handler`, sharing the LLM clients of the process. Results are streamed back
+in the request order or as they complete; an item that fails gets its own error result and does not abort the batch.
+In the request order, at most REORDER_WINDOW * max_concurrency requests are in flight or waiting for an earlier
+one, so a slow request holds back the reading of the next ones instead of buffering the whole input.
+
+The scheduling is done here rather than with LangChain's `batch_as_completed`/`abatch_as_completed`
+(`max_concurrency`) on a RunnableLambda: those take the whole input as a list and report the results of a
+batch without a bound on the results held back for the request order, which a large JSONL file would turn
+into memory. The bound on the requests in flight is the same `max_concurrency`.
+
+Result of each item:
+{"index": 3, "id": "<request id, if given>", "statusCode": 200, "response": {...chat function output...}}
+{"index": 4, "statusCode": 400, "error": "Missing 'params' key in event. ..."}
+
+From the command line, with one request per line (use - for stdin/stdout):
+$ python batch.py requests.jsonl --output results.jsonl --max-concurrency 16 [--as-completed] [--sync]
+
+As a Lambda function (handler `batch.batch_handler`), with the event:
+{"requests": [{"message": ..., "params": ...}, ...], "max_concurrency": 16}
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Iterable, Iterator, TextIO
+
+try:
+    from .index import handler, async_handler, decode_body
+    from .src.agents.utils.types import JsonType
+except ImportError:
+    from index import handler, async_handler, decode_body
+    from src.agents.utils.types import JsonType
+
+DEFAULT_MAX_CONCURRENCY = 8
+# Requests in flight or completed out of order, per unit of concurrency, when the results are in the request order
+REORDER_WINDOW = 4
+
+
+def is_positive_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def read_jsonl(stream: TextIO) -> Iterator[JsonType]:
+    """Requests of a JSONL stream, one per non-empty line."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def item_result(index: int, request: Any, response: Any) -> JsonType:
+    """Batch result of one request from its handler response (or the exception it raised)."""
+    result: JsonType = {"index": index}
+    if isinstance(request, dict) and "id" in request:
+        result["id"] = request["id"]
+    if isinstance(response, Exception):
+        result.update({"statusCode": 500, "error": f"An error occurred while processing the request: {str(response)}"})
+    elif response["statusCode"] == 200:
+        result.update({"statusCode": 200, "response": json.loads(decode_body(response))})
+    else:
+        result.update({"statusCode": response["statusCode"], "error": response["body"]})
+    return result
+
+def _window(max_concurrency: int, ordered: bool) -> int:
+    return max_concurrency * REORDER_WINDOW if ordered else max_concurrency
+
+def run_batch(requests: Iterable[JsonType], max_concurrency: int = DEFAULT_MAX_CONCURRENCY, ordered: bool = True, context=None) -> Iterator[JsonType]:
+    """Run the requests through handler() in a thread pool, yielding the item results."""
+    items = enumerate(requests)
+    window = _window(max_concurrency, ordered)
+    running: dict[Future, tuple[int, Any]] = {}
+    completed: dict[int, JsonType] = {}
+    next_index = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch") as pool:
+        while True:
+            while len(running) < max_concurrency and len(running) + len(completed) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                running[pool.submit(handler, item[1], context)] = item
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, request = running.pop(future)
+                result = item_result(index, request, future.exception() or future.result())
+                if not ordered:
+                    yield result
+                    continue
+                completed[index] = result
+            while next_index in completed:
+                yield completed.pop(next_index)
+                next_index += 1
+
+async def arun_batch(requests: Iterable[JsonType], max_concurrency: int = DEFAULT_MAX_CONCURRENCY, ordered: bool = True, context=None) -> AsyncIterator[JsonType]:
+    """Run the requests through async_handler() on the event loop, yielding the item results."""
+    items = enumerate(requests)
+    window = _window(max_concurrency, ordered)
+    running: dict[asyncio.Task, tuple[int, Any]] = {}
+    completed: dict[int, JsonType] = {}
+    next_index = 0
+    try:
+        while True:
+            while len(running) < max_concurrency and len(running) + len(completed) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                running[asyncio.ensure_future(async_handler(item[1], context))] = item
+            if not running:
+                return
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, request = running.pop(task)
+                result = item_result(index, request, task.exception() or task.result())
+                if not ordered:
+                    yield result
+                    continue
+                completed[index] = result
+            while next_index in completed:
+                yield completed.pop(next_index)
+                next_index += 1
+    finally:
+        for task in running:
+            task.cancel()
+
+def batch_handler(event: JsonType, context):
+    """
+    Lambda handler for a list of requests, returning the item results in the request order.
+    The requests run through the sync handler in a thread pool, not on an event loop created per invocation,
+    which would leave the async LLM clients of the process bound to the closed loop of the previous invocation.
+    """
+    if "body" in event:
+        try:
+            event = json.loads(event["body"])
+        except json.JSONDecodeError:
+            return {"statusCode": 400, "body": "Invalid JSON format in the body or body not found. Please check the input."}
+    if not isinstance(event.get("requests"), list):
+        return {"statusCode": 400, "body": "Missing 'requests' list in event. Please confirm the key in the json body."}
+
+    max_concurrency = event.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+    if not is_positive_int(max_concurrency):
+        return {"statusCode": 400, "body": f"Invalid 'max_concurrency' in event: expected a positive integer, got {json.dumps(max_concurrency)}."}
+    results = list(run_batch(event["requests"], max_concurrency, ordered=True, context=context))
+    return {"statusCode": 200, "body": json.dumps({"results": results})}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of chat requests through the chat function.")
+    parser.add_argument("requests", help="JSONL file with one request per line, - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file for the results, - for stdout")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--as-completed", action="store_true", help="write the results as they complete instead of in the request order")
+    parser.add_argument("--sync", action="store_true", help="use the sync handler in a thread pool instead of the async handler")
+    args = parser.parse_args()
+    if not is_positive_int(args.max_concurrency):
+        parser.error("--max-concurrency must be a positive integer")
+
+    input_stream = sys.stdin if args.requests == "-" else open(args.requests, "r")
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "w")
+    requests = read_jsonl(input_stream)
+
+    def write(result: JsonType) -> None:
+        output_stream.write(json.dumps(result) + "\n")
+        output_stream.flush()
+
+    # the chat function logs to stdout, keep it for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.sync:
+            for result in run_batch(requests, args.max_concurrency, ordered=not args.as_completed):
+                write(result)
+        else:
+            async def run() -> None:
+                async for result in arun_batch(requests, args.max_concurrency, ordered=not args.as_completed):
+                    write(result)
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
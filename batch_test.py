@@ -0,0 +1,91 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+try:
+    from .batch import REORDER_WINDOW, arun_batch, batch_handler, run_batch
+    from .src.agents.base_agent.base_agent import agent
+    from .src.agents.utils.fake_llm import FakeChatModel
+except ImportError:
+    from batch import REORDER_WINDOW, arun_batch, batch_handler, run_batch
+    from src.agents.base_agent.base_agent import agent
+    from src.agents.utils.fake_llm import FakeChatModel
+
+def requests(nr_requests: int) -> list:
+    return [
+        {"id": f"request-{i}", "message": f"Hello {i}", "params": {"conversation_id": f"batch-{i}", "conversation_history": [{"type": "user", "content": f"Hello {i}"}]}}
+        for i in range(nr_requests)
+    ]
+
+class TestBatch(unittest.TestCase):
+    """
+    TestCase Class used to test the batch invocation of the chat function.
+    ---
+    The tutor LLM of the agent is replaced by the offline fake provider.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(agent, "llm", FakeChatModel(response="fake answer", latency=0.05))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_results_in_order_with_item_errors(self):
+        batch = requests(5)
+        batch[2] = {"message": "no params"}
+
+        results = list(run_batch(batch, max_concurrency=3))
+
+        self.assertEqual([r["index"] for r in results], list(range(5)))
+        self.assertEqual([r["statusCode"] for r in results], [200, 200, 400, 200, 200])
+        self.assertEqual(results[0]["id"], "request-0")
+        self.assertEqual(results[0]["response"]["chatbot_response"], "fake answer")
+
+    def test_async_as_completed(self):
+        async def run():
+            return [result async for result in arun_batch(requests(6), max_concurrency=6, ordered=False)]
+
+        results = asyncio.run(run())
+
+        self.assertEqual(sorted(r["index"] for r in results), list(range(6)))
+        self.assertTrue(all(r["statusCode"] == 200 for r in results))
+
+    def test_batch_handler(self):
+        response = batch_handler({"body": json.dumps({"requests": requests(2), "max_concurrency": 2})}, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(len(json.loads(response["body"])["results"]), 2)
+        self.assertEqual(batch_handler({"requests": "nope"}, None)["statusCode"], 400)
+
+    def test_batch_handler_rejects_invalid_max_concurrency(self):
+        for max_concurrency in (0, -1, "16", "many", 2.5, True, None):
+            with self.subTest(max_concurrency=max_concurrency):
+                response = batch_handler({"requests": requests(1), "max_concurrency": max_concurrency}, None)
+                self.assertEqual(response["statusCode"], 400)
+                self.assertIn("max_concurrency", response["body"])
+
+    def test_requests_are_read_lazily(self):
+        read = []
+
+        def stream():
+            for request in requests(40):
+                read.append(request["id"])
+                yield request
+
+        results = run_batch(stream(), max_concurrency=2)
+        self.assertEqual(read, [])
+        self.assertEqual(next(results)["index"], 0)
+        self.assertLessEqual(len(read), 2 * REORDER_WINDOW + 1)
+        self.assertEqual([r["index"] for r in results], list(range(1, 40)))
+
+        async def run():
+            results = arun_batch(stream(), max_concurrency=2, ordered=False)
+            first = await anext(results)
+            nr_read = len(read)
+            await results.aclose()
+            return first, nr_read
+
+        read.clear()
+        first, nr_read = asyncio.run(run())
+        self.assertEqual(first["statusCode"], 200)
+        self.assertLessEqual(nr_read, 3)
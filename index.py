@@ -1,56 +1,204 @@
+import base64
+import binascii
+import gzip
 import json
+import os
+import time
+import zlib
 try:
-    from .src.module import chat_module
+    from .src.module import chat_module, chat_module_async
     from .src.agents.utils.types import JsonType
+    from .src.agents.llm_factory import latency_budget
+    from .src.agents.utils.warm_up import warm_up, warm_up_enabled
+    from .src.agents.utils.params_validation import validate_chat_request
+    from .src.agents.utils.metrics import record_request
 except ImportError:
-    from src.module import chat_module
+    from src.module import chat_module, chat_module_async
     from src.agents.utils.types import JsonType
+    from src.agents.llm_factory import latency_budget
+    from src.agents.utils.warm_up import warm_up, warm_up_enabled
+    from src.agents.utils.params_validation import validate_chat_request
+    from src.agents.utils.metrics import record_request
+
+# Time kept aside from the Lambda remaining time to return a response once the LLM calls are cut off
+LAMBDA_TIMEOUT_MARGIN = 2.0
+
+# Responses smaller than this are not compressed, even if the client accepts gzip
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Pay the first-request costs during the Lambda init phase (captured by the SnapStart snapshot)
+if warm_up_enabled():
+    warm_up()
 
 def handler(event: JsonType, context):
     """
     Lambda handler function
     """
+    start_time = time.perf_counter()
+    response = _handle(event, context)
+    record_request(response["statusCode"], time.perf_counter() - start_time)
+    return response
+
+def _handle(event: JsonType, context) -> JsonType:
     # Log the input event for debugging purposes
     # print("Received event:", " ".join(json.dumps(event, indent=2).splitlines()))
 
+    accept_encoding = get_header(event, "accept-encoding")
+    event, error_response = parse_event(event)
+    if error_response:
+        return error_response
+
+    message = event.get("message")
+    params = event.get("params")
+
+    try:
+        with latency_budget(lambda_budget(context)):
+            chatbot_response = chat_module(message, params)
+    except Exception as e:
+        return {
+            "statusCode": 500,
+            "body": f"An error occurred within the chat_module(): {str(e)}"
+        }
+
+    return build_response(chatbot_response, accept_encoding)
+
+async def async_handler(event: JsonType, context):
+    """
+    Async handler function with the same event and response format as handler().
+    Used when running under an event loop (e.g. an ASGI server) so that
+    concurrent conversations are multiplexed while waiting on the LLM.
+    """
+    start_time = time.perf_counter()
+    response = await _ahandle(event, context)
+    record_request(response["statusCode"], time.perf_counter() - start_time)
+    return response
+
+async def _ahandle(event: JsonType, context) -> JsonType:
+    accept_encoding = get_header(event, "accept-encoding")
+    event, error_response = parse_event(event)
+    if error_response:
+        return error_response
+
+    message = event.get("message")
+    params = event.get("params")
+
+    try:
+        with latency_budget(lambda_budget(context)):
+            chatbot_response = await chat_module_async(message, params)
+    except Exception as e:
+        return {
+            "statusCode": 500,
+            "body": f"An error occurred within the chat_module(): {str(e)}"
+        }
+
+    return build_response(chatbot_response, accept_encoding)
+
+def parse_event(event: JsonType) -> tuple[JsonType, JsonType | None]:
+    """
+    Extract the request from the event. Returns the request and, if it is invalid, the 400 response to return instead.
+    The body may be base64 encoded (isBase64Encoded) and gzip compressed (Content-Encoding: gzip).
+    The message and params are validated here, so malformed requests are rejected before any LLM work.
+    """
+
     if "body" in event:
         try:
-            event = json.loads(event["body"])
+            body = decode_body(event)
+        except (binascii.Error, OSError, EOFError, zlib.error, UnicodeError) as e:
+            return event, {
+                "statusCode": 400,
+                "body": f"The body could not be decoded ({get_header(event, 'content-encoding') or 'base64'}): {str(e)}"
+            }
+        try:
+            event = json.loads(body)
         except json.JSONDecodeError:
-            return {
+            return event, {
                 "statusCode": 400,
                 "body": "Invalid JSON format in the body or body not found. Please check the input."
             }
 
     if "message" not in event:
-        return {
+        return event, {
             "statusCode": 400,
             "body": "Missing 'message' key in event. Please confirm the key in the json body."
         }
     if "params" not in event:
-        return {
+        return event, {
             "statusCode": 400,
             "body": "Missing 'params' key in event. Please confirm the key in the json body. Make sure it contains the necessary conversation_id."
         }
-    
-    message = event.get("message")
-    params = event.get("params")
 
-    try:
-        chatbot_response = chat_module(message, params)
-    except Exception as e:
-        return {
-            "statusCode": 500,
-            "body": f"An error occurred within the chat_module(): {str(e)}"
+    error = validate_chat_request(event["message"], event["params"])
+    if error:
+        return event, {
+            "statusCode": 400,
+            "body": f"Invalid request: {error}"
         }
 
+    return event, None
+
+def lambda_budget(context) -> float | None:
+    """
+    Latency budget (in seconds) left to the LLM calls by the Lambda invocation, None outside of Lambda.
+    """
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return max(0.0, context.get_remaining_time_in_millis() / 1000 - LAMBDA_TIMEOUT_MARGIN)
+
+def get_header(event: JsonType, name: str) -> str | None:
+    """
+    Value of a request header (case-insensitive), None if the event has no such header.
+    """
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def decode_body(event: JsonType) -> str:
+    """
+    Request body as text, decoding base64 (isBase64Encoded) and gzip (Content-Encoding: gzip) if needed.
+    """
+    body = event["body"]
+    content_encoding = (get_header(event, "content-encoding") or "").lower()
+    if not event.get("isBase64Encoded") and content_encoding != "gzip":
+        return body
+
+    data = base64.b64decode(body, validate=True) if event.get("isBase64Encoded") else body.encode("latin-1")
+    if content_encoding == "gzip":
+        data = gzip.decompress(data)
+    return data.decode("utf-8")
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    Whether the Accept-Encoding header allows a gzip response (gzip or *, without q=0).
+    """
+    for coding in (accept_encoding or "").lower().split(","):
+        name, _, parameters = coding.strip().partition(";")
+        if name.strip() in ("gzip", "*"):
+            return parameters.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+def build_response(chatbot_response: JsonType, accept_encoding: str | None = None) -> JsonType:
+    """
+    Wrap the chat module output into the handler response.
+    Large responses are gzip compressed and base64 encoded if the client accepts gzip.
+    """
+
+    body = json.dumps(chatbot_response)
+
     # Create a response
     response = {
         "statusCode": 200,
-        "body": json.dumps(chatbot_response)
+        "body": body
     }
+    if accepts_gzip(accept_encoding) and len(body) >= RESPONSE_COMPRESSION_MIN_BYTES:
+        response = {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json", "Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+            "isBase64Encoded": True,
+            "body": base64.b64encode(gzip.compress(body.encode("utf-8"), compresslevel=6)).decode("ascii")
+        }
 
     # Log the response for debugging purposes
     print("Returning response:", " ".join(json.dumps(response, indent=2).splitlines()))
 
-    return response
\ No newline at end of file
+    return response
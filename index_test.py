@@ -1,10 +1,13 @@
+import asyncio
+import base64
+import gzip
 import unittest
 import json
 
 try:
-    from .index import handler
+    from .index import handler, async_handler, build_response, decode_body
 except ImportError:
-    from index import handler
+    from index import handler, async_handler, build_response, decode_body
 
 class TestChatIndexFunction(unittest.TestCase):
     """
@@ -42,6 +45,18 @@ class TestChatIndexFunction(unittest.TestCase):
 
             self.assertEqual(result.get("statusCode"), 400)
     
+    def test_invalid_params(self):
+        event = {
+            "message": "Hello, World",
+            "params": {"conversation_id": "1234Test", "conversation_history": [{"type": "bot", "content": "Hello, World"}]}
+        }
+        event = {"body":json.dumps(event)}
+
+        result = handler(event, None)
+
+        self.assertEqual(result.get("statusCode"), 400)
+        self.assertIn("params.conversation_history[0].type", result.get("body"))
+
     def test_correct_arguments(self):
         event = {
             "message": "Hello, World",
@@ -63,4 +78,47 @@ class TestChatIndexFunction(unittest.TestCase):
         result = handler(event, None)
 
         self.assertEqual(result.get("statusCode"), 200)
-        
\ No newline at end of file
+        
+    def test_correct_response_async(self):
+        event = {
+            "message": "Hello, World",
+            "params": {"conversation_id": "1234Test", "conversation_history": [{"type": "user", "content": "Hello, World"}]}
+        }
+        event = {"body":json.dumps(event)}
+
+        result = asyncio.run(async_handler(event, None))
+
+        self.assertEqual(result.get("statusCode"), 200)
+        self.assertIn("chatbot_response", json.loads(result.get("body")))
+
+    def test_compressed_request_body(self):
+        event = {"message": "Hello, World", "params": {"conversation_id": "1234Test"}}
+        body = base64.b64encode(gzip.compress(json.dumps(event).encode("utf-8"))).decode("ascii")
+        event = {"body": body, "isBase64Encoded": True, "headers": {"Content-Encoding": "gzip"}}
+
+        self.assertEqual(json.loads(decode_body(event))["message"], "Hello, World")
+
+        # decoded, the request is only missing its message
+        event = {"body": base64.b64encode(gzip.compress(b'{"params": {}}')).decode("ascii"), "isBase64Encoded": True, "headers": {"content-encoding": "gzip"}}
+        result = handler(event, None)
+        self.assertEqual(result.get("statusCode"), 400)
+        self.assertIn("Missing 'message'", result.get("body"))
+
+    def test_invalid_compressed_body(self):
+        event = {"body": "not base64!", "isBase64Encoded": True, "headers": {"Content-Encoding": "gzip"}}
+
+        result = handler(event, None)
+
+        self.assertEqual(result.get("statusCode"), 400)
+
+    def test_negotiated_response_compression(self):
+        chatbot_response = {"chatbot_response": "Hello, World " * 200}
+
+        compressed = build_response(chatbot_response, "br, gzip;q=0.8")
+        plain = build_response(chatbot_response, "gzip;q=0")
+
+        self.assertTrue(compressed["isBase64Encoded"])
+        self.assertEqual(compressed["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(decode_body(compressed)), chatbot_response)
+        self.assertLess(len(compressed["body"]), len(plain["body"]))
+        self.assertEqual(json.loads(plain["body"]), chatbot_response)
@@ -0,0 +1,413 @@
+"""
+Conversation affinity router in front of several chat function worker processes.
+---
+The in-process state of a worker (response cache, opening turns, in-memory checkpoints, warm LLM clients)
+only helps if the turns of a conversation, and the conversations about the same question, reach the same
+worker. AffinityRouter starts N worker processes, each running `async_handler` on its own event loop, and
+dispatches every request to a worker:
+
+- a conversation sticks to the worker that served its previous turn (conversation_id table, LRU bounded)
+- a new conversation goes to the worker owning its question on a consistent hash ring of (agent_type,
+  question), so the conversations about a question share the warm caches, and adding or removing a
+  worker only moves the questions of that worker
+- each worker has at most ROUTER_MAX_PENDING requests in flight (bounded queue); a request for a saturated
+  worker spills over to the next worker on the ring, and waits up to ROUTER_QUEUE_TIMEOUT seconds for a
+  slot (503 response after that) if every worker is saturated; ahandle() waits on the event loop, so the
+  waiting requests hold no thread
+
+metrics_text() gathers the metrics registries of the workers (where the requests run) into one Prometheus text,
+each sample labelled with its worker; the router process itself records no request.
+
+stats() reports the locality rates: the share of the follow-up turns served by the worker of the previous
+turn, and the share of the requests served by a worker that already served their question.
+
+Run in front of the server mode with:
+$ python server.py --affinity-workers 4
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Optional
+
+try:
+    from .index import decode_body
+    from .src.agents.utils.metrics import merge_prometheus_text
+except ImportError:
+    from index import decode_body
+    from src.agents.utils.metrics import merge_prometheus_text
+
+_READY = "ready"
+_METRICS = "metrics"
+_SATURATED = {"statusCode": 503, "body": "All chat workers are saturated, please retry later."}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring of the worker indexes, with virtual nodes to even out the load."""
+
+    def __init__(self, workers: int, replicas: int = 64):
+        self._points = sorted((_hash(f"worker-{worker}:{replica}"), worker) for worker in range(workers) for replica in range(replicas))
+        self._hashes = [point for point, _ in self._points]
+        self.workers = workers
+
+    def preference(self, key: str) -> list[int]:
+        """Workers in ring order from the position of the key, each once: the owner first, then the spill-over order."""
+        start = bisect.bisect(self._hashes, _hash(key))
+        order: list[int] = []
+        for offset in range(len(self._points)):
+            worker = self._points[(start + offset) % len(self._points)][1]
+            if worker not in order:
+                order.append(worker)
+                if len(order) == self.workers:
+                    break
+        return order
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def affinity_keys(event: dict) -> tuple[Optional[str], str]:
+    """
+    Conversation id and question key of a request event (body decoded as the handler does).
+    The question is identified by its first part id (or its title) and the agent type serving it.
+    Undecodable events get no conversation and are still dispatched, the worker returns the 400 response.
+    """
+    try:
+        request = json.loads(decode_body(event)) if "body" in event else event
+        params = request.get("params") or {}
+    except Exception:
+        return None, ""
+    if not isinstance(params, dict):
+        return None, ""
+    question = ((params.get("question_response_details") or {}).get("questionInformation")) or {}
+    parts = question.get("parts") or [{}]
+    question_id = parts[0].get("publishedPartId") or question.get("questionTitle") or ""
+    conversation_id = params.get("conversation_id")
+    return (None if conversation_id is None else str(conversation_id)), f"{params.get('agent_type') or 'base'}:{question_id}"
+
+
+def _worker_main(worker: int, inbox: Any, outbox: Any) -> None:
+    """Worker process: warm up, then run the requests of its inbox concurrently on an event loop."""
+    try:
+        from .index import async_handler
+        from .src.agents.utils.metrics import metrics
+        from .src.agents.utils.warm_up import warm_up
+    except ImportError:
+        from index import async_handler
+        from src.agents.utils.metrics import metrics
+        from src.agents.utils.warm_up import warm_up
+
+    warm_up()
+    outbox.put((_READY, worker, os.getpid()))
+
+    async def run(job_id: int, event: dict) -> None:
+        try:
+            response = await async_handler(event, None)
+        except Exception as e:
+            response = {"statusCode": 500, "body": f"An error occurred within the worker: {str(e)}"}
+        outbox.put((job_id, worker, response))
+
+    async def serve() -> None:
+        loop = asyncio.get_running_loop()
+        tasks: set = set()
+        while True:
+            job = await loop.run_in_executor(None, inbox.get)
+            if job is None:
+                break
+            if job[1] == _METRICS:
+                outbox.put((job[0], worker, metrics.prometheus_text()))
+                continue
+            task = asyncio.create_task(run(*job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    asyncio.run(serve())
+
+
+class AffinityRouter:
+    """Dispatcher of the requests to a pool of worker processes, by conversation and question affinity."""
+
+    def __init__(self, workers: int, max_pending: Optional[int] = None, queue_timeout: Optional[float] = None, max_conversations: int = 100_000, policy: str = "affinity"):
+        if policy not in ("affinity", "round_robin"):
+            raise ValueError(f"Unknown routing policy '{policy}'")
+        self.workers = workers
+        self.max_pending = max_pending or int(os.environ.get("ROUTER_MAX_PENDING", "16"))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.environ.get("ROUTER_QUEUE_TIMEOUT", "30"))
+        self.max_conversations = max_conversations
+        self.policy = policy
+        self.ring = HashRing(workers)
+
+        self._context = multiprocessing.get_context("spawn")
+        self._outbox = self._context.Queue()
+        self._inboxes: list = []
+        self._processes: list = []
+        self._pending = [0] * workers
+        self._alive = [False] * workers
+        self._jobs: dict[int, tuple[Future, int]] = {}
+        self._next_job = 0
+        self._round_robin = 0
+        self._condition = threading.Condition()
+        # event loop futures of the ahandle() calls waiting for a slot, woken with the threads waiting on the condition
+        self._waiters: dict[asyncio.Future, asyncio.AbstractEventLoop] = {}
+        self._collector: Optional[threading.Thread] = None
+
+        # conversation id -> worker of its previous turn, and question key -> workers that served it
+        self._conversations: OrderedDict[str, int] = OrderedDict()
+        self._questions: OrderedDict[str, set] = OrderedDict()
+        self._stats = {"requests": 0, "spill_overs": 0, "rejected": 0, "follow_ups": 0, "conversation_hits": 0, "question_hits": 0, "max_pending": 0}
+        self._served = [0] * workers
+
+    def start(self, timeout: float = 120.0) -> "AffinityRouter":
+        """Start the worker processes and wait until each one is warmed up."""
+        for worker in range(self.workers):
+            inbox = self._context.Queue()
+            process = self._context.Process(target=_worker_main, args=(worker, inbox, self._outbox), name=f"chat-worker-{worker}", daemon=True)
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        deadline = time.monotonic() + timeout
+        while not all(self._alive):
+            try:
+                kind, worker, _ = self._outbox.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop()
+                raise TimeoutError(f"The chat workers did not warm up within {timeout}s")
+            if kind == _READY:
+                self._alive[worker] = True
+
+        self._collector = threading.Thread(target=self._collect, name="router-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the workers once their in-flight requests are done."""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        with self._condition:
+            self._alive = [False] * self.workers
+            self._condition.notify_all()
+            self._notify_waiters()
+
+    def __enter__(self) -> "AffinityRouter":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _collect(self) -> None:
+        """Resolve the futures of the completed requests, and fail those of a worker that died."""
+        while any(self._alive):
+            try:
+                job_id, worker, response = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            with self._condition:
+                future, _ = self._jobs.pop(job_id, (None, None))
+                self._pending[worker] -= 1
+                self._condition.notify()
+                self._notify_waiters()
+            if future is not None:
+                future.set_result(response)
+
+    def _check_workers(self) -> None:
+        with self._condition:
+            for worker, process in enumerate(self._processes):
+                if self._alive[worker] and not process.is_alive():
+                    # the ring moves its questions to the next workers, its requests fail
+                    self._alive[worker] = False
+                    failed = [job_id for job_id, (_, job_worker) in self._jobs.items() if job_worker == worker]
+                    for job_id in failed:
+                        self._jobs.pop(job_id)[0].set_exception(RuntimeError(f"Chat worker {worker} exited with code {process.exitcode}"))
+                    self._pending[worker] = 0
+                    self._condition.notify_all()
+                    self._notify_waiters()
+
+    def _notify_waiters(self) -> None:
+        """Wake the ahandle() calls waiting for a slot, to try again (under the lock)."""
+        for waiter, loop in self._waiters.items():
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # the event loop of the waiter is closed
+                pass
+        self._waiters.clear()
+
+    def _candidates(self, conversation_id: Optional[str], question_key: str) -> list[int]:
+        if self.policy == "round_robin":
+            self._round_robin += 1
+            return [(self._round_robin + offset) % self.workers for offset in range(self.workers)]
+        order = self.ring.preference(question_key)
+        sticky = self._conversations.get(conversation_id) if conversation_id is not None else None
+        if sticky is not None:
+            order.remove(sticky)
+            order.insert(0, sticky)
+        return order
+
+    def _try_assign(self, conversation_id: Optional[str], question_key: str, future: Future, deadline: float) -> tuple[Optional[tuple[int, int]], float]:
+        """
+        Worker and job id of the request if a worker has a free slot (under the lock), else None and the seconds
+        left to wait for one (0 once the request is rejected: no live worker or queue_timeout elapsed).
+        """
+        candidates = [worker for worker in self._candidates(conversation_id, question_key) if self._alive[worker]]
+        for position, worker in enumerate(candidates):
+            if self._pending[worker] < self.max_pending:
+                self._record(conversation_id, question_key, worker, spilled=position > 0 and self.policy == "affinity")
+                job_id = self._next_job
+                self._next_job += 1
+                self._jobs[job_id] = (future, worker)
+                return (worker, job_id), 0.0
+        remaining = deadline - time.monotonic()
+        if not candidates or remaining <= 0:
+            self._stats["rejected"] += 1
+            return None, 0.0
+        return None, remaining
+
+    def _assign(self, conversation_id: Optional[str], question_key: str, future: Future) -> Optional[tuple[int, int]]:
+        """
+        Worker and job id of the request, waiting for a slot if every worker is saturated.
+        None if no worker had a free slot within queue_timeout.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            while True:
+                assignment, remaining = self._try_assign(conversation_id, question_key, future, deadline)
+                if assignment is not None or remaining <= 0:
+                    return assignment
+                self._condition.wait(remaining)
+
+    async def _aassign(self, conversation_id: Optional[str], question_key: str, future: Future) -> Optional[tuple[int, int]]:
+        """Async version of _assign(), waiting for a slot on the event loop instead of in a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + self.queue_timeout
+        while True:
+            waiter = loop.create_future()
+            with self._condition:
+                assignment, remaining = self._try_assign(conversation_id, question_key, future, deadline)
+                if assignment is not None or remaining <= 0:
+                    return assignment
+                self._waiters[waiter] = loop
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._condition:
+                    self._waiters.pop(waiter, None)
+
+    def _record(self, conversation_id: Optional[str], question_key: str, worker: int, spilled: bool) -> None:
+        """Update the locality statistics and the affinity tables (under the lock)."""
+        stats = self._stats
+        stats["requests"] += 1
+        stats["spill_overs"] += spilled
+        self._pending[worker] += 1
+        self._served[worker] += 1
+        stats["max_pending"] = max(stats["max_pending"], self._pending[worker])
+
+        if conversation_id is not None:
+            previous = self._conversations.pop(conversation_id, None)
+            if previous is not None:
+                stats["follow_ups"] += 1
+                stats["conversation_hits"] += previous == worker
+            self._conversations[conversation_id] = worker
+            if len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+
+        served_by = self._questions.pop(question_key, set())
+        stats["question_hits"] += worker in served_by
+        served_by.add(worker)
+        self._questions[question_key] = served_by
+        if len(self._questions) > self.max_conversations:
+            self._questions.popitem(last=False)
+
+    def submit(self, event: dict) -> Future:
+        """Dispatch a handler event to a worker. The future's result is the handler response."""
+        conversation_id, question_key = affinity_keys(event)
+        future: Future = Future()
+        assignment = self._assign(conversation_id, question_key, future)
+        if assignment is None:
+            future.set_result(dict(_SATURATED))
+            return future
+        worker, job_id = assignment
+        self._inboxes[worker].put((job_id, event))
+        return future
+
+    def handle(self, event: dict) -> dict:
+        return self.submit(event).result()
+
+    async def ahandle(self, event: dict) -> dict:
+        """
+        Async version of handle(). The request waits for a slot on the event loop, so a backlog of saturated
+        requests does not hold the threads of the default executor.
+        """
+        conversation_id, question_key = affinity_keys(event)
+        future: Future = Future()
+        assignment = await self._aassign(conversation_id, question_key, future)
+        if assignment is None:
+            return dict(_SATURATED)
+        worker, job_id = assignment
+        self._inboxes[worker].put((job_id, event))
+        return await asyncio.wrap_future(future)
+
+    def metrics_futures(self) -> dict[int, Future]:
+        """Ask each live worker for its Prometheus text, by worker. Not limited by max_pending."""
+        futures = {}
+        with self._condition:
+            for worker in range(self.workers):
+                if self._alive[worker]:
+                    future: Future = Future()
+                    job_id = self._next_job
+                    self._next_job += 1
+                    self._jobs[job_id] = (future, worker)
+                    self._pending[worker] += 1
+                    futures[worker] = future
+                    self._inboxes[worker].put((job_id, _METRICS))
+        return futures
+
+    def metrics_text(self, timeout: float = 10.0) -> str:
+        """Prometheus text of the workers' metrics, each sample labelled with its worker."""
+        texts = {}
+        for worker, future in self.metrics_futures().items():
+            try:
+                texts[str(worker)] = future.result(timeout)
+            except Exception:
+                # a worker that died or did not answer in time is left out
+                pass
+        return merge_prometheus_text(texts)
+
+    async def ametrics_text(self, timeout: float = 10.0) -> str:
+        """Async version of metrics_text()."""
+        futures = self.metrics_futures()
+        results = await asyncio.gather(*(asyncio.wait_for(asyncio.wrap_future(future), timeout) for future in futures.values()), return_exceptions=True)
+        return merge_prometheus_text({str(worker): result for worker, result in zip(futures, results) if isinstance(result, str)})
+
+    def stats(self) -> dict[str, Any]:
+        """Routing and locality statistics since the router started."""
+        with self._condition:
+            stats = dict(self._stats)
+            stats["conversation_locality"] = round(stats["conversation_hits"] / stats["follow_ups"], 4) if stats["follow_ups"] else None
+            stats["question_locality"] = round(stats["question_hits"] / stats["requests"], 4) if stats["requests"] else None
+            stats["served"] = list(self._served)
+            stats["pending"] = list(self._pending)
+            return stats
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+try:
+    from .router import AffinityRouter, HashRing, affinity_keys
+except ImportError:
+    from router import AffinityRouter, HashRing, affinity_keys
+
+FAKE_ROUTES = {"LLM_ROUTE_TUTOR": "fake", "LLM_ROUTE_SUMMARISER": "fake", "LLM_ROUTE_STYLE_ANALYSER": "fake"}
+
+def chat_event(conversation_id: str, part_id: str, message: str = "Hi") -> dict:
+    question = {"questionTitle": "Vectors", "parts": [{"publishedPartId": part_id, "publishedPartPosition": 0}]}
+    params = {"conversation_id": conversation_id, "conversation_history": [{"type": "user", "content": message}], "question_response_details": {"questionInformation": question}}
+    return {"body": json.dumps({"message": message, "params": params})}
+
+class TestAffinityRouter(unittest.TestCase):
+    """
+    TestCase Class used to test the conversation affinity router.
+    ---
+    The dispatch decisions are tested without worker processes, and one test runs the requests through two workers.
+    """
+
+    def routing_only(self, workers: int, max_pending: int) -> AffinityRouter:
+        router = AffinityRouter(workers, max_pending=max_pending, queue_timeout=0)
+        router._alive = [True] * workers
+        return router
+
+    def test_hash_ring_is_consistent(self):
+        ring, larger_ring = HashRing(4), HashRing(5)
+        keys = [f"base:part-{i}" for i in range(500)]
+        for key in keys:
+            self.assertEqual(sorted(ring.preference(key)), [0, 1, 2, 3])
+        moved = sum(ring.preference(key)[0] != larger_ring.preference(key)[0] for key in keys)
+        # only the keys taken over by the new worker move
+        self.assertEqual(moved, sum(larger_ring.preference(key)[0] == 4 for key in keys))
+        self.assertLess(moved, 200)
+
+    def test_affinity_keys(self):
+        self.assertEqual(affinity_keys(chat_event("c1", "part-1")), ("c1", "base:part-1"))
+        self.assertEqual(affinity_keys({"body": "not json"}), (None, ""))
+
+    def test_conversation_sticks_and_spills_over(self):
+        router = self.routing_only(workers=3, max_pending=1)
+        first = router._assign("c1", "base:part-1", None)[0]
+        self.assertEqual(first, router.ring.preference("base:part-1")[0])
+
+        # the owner of the question is saturated: the second conversation spills over to the next worker
+        second = router._assign("c2", "base:part-1", None)[0]
+        self.assertEqual(second, router.ring.preference("base:part-1")[1])
+
+        router._pending = [0, 0, 0]
+        self.assertEqual(router._assign("c2", "base:part-1", None)[0], second)
+        self.assertEqual(router._assign("c1", "base:part-1", None)[0], first)
+
+        stats = router.stats()
+        self.assertEqual((stats["requests"], stats["spill_overs"], stats["follow_ups"]), (4, 1, 2))
+        self.assertEqual(stats["conversation_locality"], 1.0)
+        self.assertEqual(stats["question_hits"], 2)
+
+    def test_saturated_workers_reject(self):
+        router = self.routing_only(workers=2, max_pending=1)
+        self.assertIsNotNone(router._assign("c1", "base:part-1", None))
+        self.assertIsNotNone(router._assign("c2", "base:part-1", None))
+        response = router.submit(chat_event("c3", "part-1")).result()
+        self.assertEqual(response["statusCode"], 503)
+        self.assertEqual(asyncio.run(router.ahandle(chat_event("c4", "part-1")))["statusCode"], 503)
+        self.assertEqual(router.stats()["rejected"], 2)
+
+    def test_async_requests_wait_on_the_event_loop(self):
+        router = AffinityRouter(1, max_pending=1, queue_timeout=0.5)
+        router._alive = [True]
+        self.assertIsNotNone(router._assign("c0", "base:part-1", None))
+
+        async def run() -> list:
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+            waiting = [asyncio.ensure_future(router._aassign(f"c{i}", "base:part-1", None)) for i in range(1, 9)]
+            await asyncio.sleep(0.05)
+            # the waiting requests hold no thread of the default executor
+            await asyncio.wait_for(asyncio.to_thread(time.sleep, 0), 0.2)
+            # a request completes and frees its slot
+            with router._condition:
+                router._pending[0] -= 1
+                router._notify_waiters()
+            return await asyncio.gather(*waiting)
+
+        assignments = asyncio.run(run())
+        self.assertEqual(sum(assignment is not None for assignment in assignments), 1)
+        self.assertEqual(router.stats()["rejected"], 7)
+        self.assertEqual(router._waiters, {})
+
+    @patch.dict(os.environ, FAKE_ROUTES)
+    def test_requests_through_workers(self):
+        with AffinityRouter(2, max_pending=4) as router:
+            responses = [router.submit(chat_event(f"c{i % 3}", f"part-{i % 2}")) for i in range(6)]
+            for future in responses:
+                self.assertEqual(future.result(timeout=60)["statusCode"], 200)
+            stats = router.stats()
+            metrics_text = router.metrics_text()
+
+        # the metrics of the requests are gathered from the workers
+        counts = [float(line.rsplit(" ", 1)[1]) for line in metrics_text.splitlines() if line.startswith("requests_total{worker=")]
+        self.assertEqual(sum(counts), 6)
+        self.assertEqual(metrics_text.count("# TYPE requests_total counter"), 1)
+
+        self.assertEqual(stats["requests"], 6)
+        self.assertEqual(sum(stats["served"]), 6)
+        self.assertEqual(stats["pending"], [0, 0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""
+Long-lived HTTP server mode of the chat function.
+---
+Serves the same requests as the Lambda `handler` from a persistent process, so the
+LangChain imports and the agent construction are paid once per worker instead of once per cold start.
+
+The app is a plain ASGI application around `async_handler`. Each worker is a separate
+process with its own agent and LLM clients (shared-nothing), started by uvicorn:
+
+$ python server.py --host 0.0.0.0 --port 8080 --workers 4
+
+With --affinity-workers N, a single server process dispatches the requests to N worker processes through the
+conversation affinity router (router.py), so the turns of a conversation reach the same warm worker:
+
+$ python server.py --host 0.0.0.0 --port 8080 --affinity-workers 4
+
+Endpoints:
+- POST /chat                                          request body as sent to the Lambda (message + params), returns the chat function body
+- POST /2015-03-31/functions/function/invocations     Lambda RIE compatible, event in the body and the handler response returned as JSON
+- GET  /health                                        liveness, 200 as soon as the worker is up
+- GET  /ready                                         readiness, 200 once the agent has been pre-warmed, 503 otherwise
+- GET  /metrics                                       Prometheus text exposition of the metrics (src/agents/utils/metrics.py): with
+                                                      --affinity-workers, of all the router workers (labelled worker="N");
+                                                      with uvicorn --workers N, of the one process that served the scrape only
+- GET  /router                                        routing and locality statistics of the affinity router (404 without it)
+"""
+
+import argparse
+import base64
+import json
+import os
+
+try:
+    from .index import async_handler
+    from .router import AffinityRouter
+    from .src.agents.utils.metrics import metrics
+    from .src.agents.utils.warm_up import warm_up as warm_up_agent
+except ImportError:
+    from index import async_handler
+    from router import AffinityRouter
+    from src.agents.utils.metrics import metrics
+    from src.agents.utils.warm_up import warm_up as warm_up_agent
+
+RIE_INVOCATION_PATH = "/2015-03-31/functions/function/invocations"
+
+_state = {"ready": False, "router": None}
+
+def warm_up() -> None:
+    """
+    Pre-warm the worker before it reports ready.
+    Importing `index` already compiled the agent graph and created the LLM clients, the dry pass warms the rest.
+    With CHAT_ROUTER_WORKERS set, the affinity router workers are started (and warmed up) instead.
+    """
+    router_workers = int(os.environ.get("CHAT_ROUTER_WORKERS", "0"))
+    if router_workers > 0:
+        _state["router"] = AffinityRouter(router_workers).start()
+    else:
+        warm_up_agent()
+    _state["ready"] = True
+
+async def _dispatch(event: dict) -> dict:
+    router = _state["router"]
+    return await (router.ahandle(event) if router is not None else async_handler(event, None))
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/") or "/"
+    method = scope["method"]
+
+    if path == "/health" and method == "GET":
+        await _send_json(send, 200, {"status": "ok", "pid": os.getpid()})
+    elif path == "/ready" and method == "GET":
+        ready = _state["ready"]
+        await _send_json(send, 200 if ready else 503, {"ready": ready})
+    elif path == "/metrics" and method == "GET":
+        router = _state["router"]
+        text = await router.ametrics_text() if router is not None else metrics.prometheus_text()
+        await _send(send, 200, text.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+    elif path == "/router" and method == "GET" and _state["router"] is not None:
+        await _send_json(send, 200, _state["router"].stats())
+    elif path == "/chat" and method == "POST":
+        body = await _read_body(receive)
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        event = {"body": base64.b64encode(body).decode("ascii"), "isBase64Encoded": True, "headers": headers}
+        response = await _dispatch(event)
+        if response.get("isBase64Encoded"):
+            await _send(send, response["statusCode"], base64.b64decode(response["body"]), _content_type(response), response.get("headers"))
+        else:
+            await _send(send, response["statusCode"], response["body"].encode("utf-8"), _content_type(response))
+    elif path == RIE_INVOCATION_PATH and method == "POST":
+        body = await _read_body(receive)
+        try:
+            event = json.loads(body)
+        except json.JSONDecodeError:
+            event = {"body": body.decode("utf-8")}
+        response = await _dispatch(event)
+        await _send_json(send, 200, response)
+    else:
+        await _send_json(send, 404, {"error": f"No route for {method} {path}"})
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            warm_up()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _state["ready"] = False
+            if _state["router"] is not None:
+                _state["router"].stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+def _content_type(response: dict) -> str:
+    return "application/json" if response["statusCode"] == 200 else "text/plain; charset=utf-8"
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    await _send(send, status, json.dumps(payload).encode("utf-8"), "application/json")
+
+async def _send(send, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+    extra_headers = [(key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in (headers or {}).items() if key.lower() != "content-type"]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode("latin-1")), (b"content-length", str(len(body)).encode("latin-1"))] + extra_headers,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the chat function as a long-lived HTTP service.")
+    parser.add_argument("--host", default=os.environ.get("CHAT_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("CHAT_SERVER_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CHAT_SERVER_WORKERS", "1")), help="number of worker processes")
+    parser.add_argument("--affinity-workers", type=int, default=int(os.environ.get("CHAT_ROUTER_WORKERS", "0")), help="number of worker processes behind the affinity router (replaces --workers)")
+    args = parser.parse_args()
+    if args.affinity_workers > 0:
+        # a single server process owns the router, which starts the workers at startup
+        os.environ["CHAT_ROUTER_WORKERS"] = str(args.affinity_workers)
+        args.workers = 1
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Server mode requires uvicorn: pip install uvicorn")
+
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers, lifespan="on")
+
+if __name__ == "__main__":
+    main()
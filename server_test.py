@@ -0,0 +1,78 @@
+import asyncio
+import json
+import unittest
+
+try:
+    from .server import app, warm_up, RIE_INVOCATION_PATH
+except ImportError:
+    from server import app, warm_up, RIE_INVOCATION_PATH
+
+def call_app(method: str, path: str, body: bytes = b"") -> tuple[int, bytes]:
+    """Drive the ASGI app with a single HTTP request and return the status and body."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path}
+    asyncio.run(app(scope, receive, send))
+
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+class TestChatServer(unittest.TestCase):
+    """
+    TestCase Class used to test the HTTP server mode.
+    ---
+    The ASGI app is driven directly, without starting uvicorn.
+    """
+
+    def test_health(self):
+        status, body = call_app("GET", "/health")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "ok")
+
+    def test_ready_after_warm_up(self):
+        warm_up()
+        status, body = call_app("GET", "/ready")
+
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(body)["ready"])
+
+    def test_metrics(self):
+        call_app("POST", "/chat", b"not json")
+        status, body = call_app("GET", "/metrics")
+
+        self.assertEqual(status, 200)
+        self.assertIn('requests_total{status_code="400"}', body.decode("utf-8"))
+
+    def test_unknown_route(self):
+        status, _ = call_app("GET", "/unknown")
+
+        self.assertEqual(status, 404)
+
+    def test_missing_argument(self):
+        event = {"params": {"conversation_id": "1234Test", "conversation_history": [{"type": "user", "content": "Hello, World"}]}}
+        status, _ = call_app("POST", "/chat", json.dumps(event).encode("utf-8"))
+
+        self.assertEqual(status, 400)
+
+    def test_rie_invocation_path(self):
+        event = {"body": json.dumps({"message": "Hello, World"})}
+        status, body = call_app("POST", RIE_INVOCATION_PATH, json.dumps(event).encode("utf-8"))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["statusCode"], 400)
+
+    def test_correct_response(self):
+        event = {
+            "message": "Hello, World",
+            "params": {"conversation_id": "1234Test", "conversation_history": [{"type": "user", "content": "Hello, World"}]}
+        }
+        status, body = call_app("POST", "/chat", json.dumps(event).encode("utf-8"))
+
+        self.assertEqual(status, 200)
+        self.assertIn("chatbot_response", json.loads(body))
@@ -0,0 +1,125 @@
+"""
+Registry of named tutor agent variants, selected per request by params.agent_type.
+---
+A variant is a BaseAgent configuration: model routes, summary mode, summarisation threshold and role prompt.
+Each variant's graph is compiled once (compile_agent_variants(), called by the warm-up during the init
+phase) and shared by the requests, so switching variants costs nothing per request. The latency and token
+metrics are labelled with the variant (see utils/metrics.py), so the variants of an A/B test can be compared.
+
+Built-in variants are defined in AGENT_VARIANTS. More variants, or overrides of the built-in ones, are read
+from the JSON file at AGENT_VARIANTS_PATH, without a code change:
+
+{
+    "concise": {"role_prompt_suffix": "Keep your answers under 80 words.", "max_messages_to_summarize": 7},
+    "mini": {"routes": {"tutor": "openai:gpt-4o-mini"}, "summary_mode": "combined"}
+}
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, fields
+from typing import Any, Optional
+
+DEFAULT_AGENT_VARIANT = "base"
+
+
+@dataclass
+class AgentVariant:
+    """Configuration of a tutor agent variant, None fields keep the BaseAgent defaults."""
+    name: str
+    routes: Optional[dict] = None
+    summary_mode: Optional[str] = None
+    max_messages_to_summarize: Optional[int] = None
+    role_prompt: Optional[str] = None
+    role_prompt_suffix: str = ""
+    description: str = ""
+
+
+AGENT_VARIANTS: dict[str, AgentVariant] = {
+    "base": AgentVariant("base", description="Tutor agent with the default routes, prompts and thresholds."),
+    "combined_summary": AgentVariant("combined_summary", summary_mode="combined", description="Summary and conversational style in a single structured-output call."),
+}
+
+if os.environ.get("OLLAMA_BASE_URL"):
+    # on-prem nodes with a local inference server
+    AGENT_VARIANTS["local"] = AgentVariant("local", routes={role: "ollama" for role in ("tutor", "summariser", "style_analyser")}, description="All the roles on the local inference server (OLLAMA_MODEL).")
+
+_lock = threading.Lock()
+_agents: dict[str, Any] = {}
+_loaded_path: Optional[str] = None
+
+
+def _load_variants_file() -> None:
+    """Register the variants of AGENT_VARIANTS_PATH (once per path)."""
+    global _loaded_path
+    path = os.environ.get("AGENT_VARIANTS_PATH")
+    if not path or path == _loaded_path:
+        return
+    with open(path, "r") as file:
+        definitions = json.load(file)
+    known_fields = {variant_field.name for variant_field in fields(AgentVariant)} - {"name"}
+    for name, definition in definitions.items():
+        unknown = set(definition) - known_fields
+        if unknown:
+            raise ValueError(f"Unknown fields in the agent variant '{name}': {', '.join(sorted(unknown))}")
+        register_agent_variant(AgentVariant(name, **definition))
+    _loaded_path = path
+
+def register_agent_variant(variant: AgentVariant) -> None:
+    """Add or replace a variant, its agent is rebuilt on next use."""
+    with _lock:
+        AGENT_VARIANTS[variant.name] = variant
+        _agents.pop(variant.name, None)
+
+def agent_variant_names() -> list[str]:
+    _load_variants_file()
+    return list(AGENT_VARIANTS)
+
+def _is_default(variant: AgentVariant) -> bool:
+    return variant.routes is None and variant.summary_mode is None and variant.max_messages_to_summarize is None and variant.role_prompt is None and not variant.role_prompt_suffix
+
+def build_agent(variant: AgentVariant, routes: Optional[dict] = None):
+    """New BaseAgent configured by the variant, routes override the variant's routes (e.g. for benchmarks)."""
+    try:
+        from .base_agent.base_agent import BaseAgent
+    except ImportError:
+        from src.agents.base_agent.base_agent import BaseAgent
+
+    agent = BaseAgent(routes={**(variant.routes or {}), **(routes or {})} or None, summary_mode=variant.summary_mode, variant=variant.name)
+    if variant.max_messages_to_summarize is not None:
+        agent.max_messages_to_summarize = variant.max_messages_to_summarize
+    if variant.role_prompt is not None:
+        agent.role_prompt = variant.role_prompt
+    if variant.role_prompt_suffix:
+        agent.role_prompt = f"{agent.role_prompt}\n\n{variant.role_prompt_suffix}\n\n"
+    return agent
+
+def get_agent(name: Optional[str] = None):
+    """Compiled agent of a variant (default: base), built on first use. Raises ValueError for an unknown variant."""
+    name = name or DEFAULT_AGENT_VARIANT
+    agent = _agents.get(name)
+    if agent is not None:
+        return agent
+    _load_variants_file()
+    if name not in AGENT_VARIANTS:
+        raise ValueError(f"Unknown agent type '{name}'. Known agent types: {', '.join(AGENT_VARIANTS)}")
+    with _lock:
+        if name not in _agents:
+            if name == DEFAULT_AGENT_VARIANT and _is_default(AGENT_VARIANTS[name]):
+                # the unmodified base variant is the module agent of base_agent.py
+                try:
+                    from .base_agent.base_agent import agent as base_agent
+                except ImportError:
+                    from src.agents.base_agent.base_agent import agent as base_agent
+                _agents[name] = base_agent
+            else:
+                _agents[name] = build_agent(AGENT_VARIANTS[name])
+        return _agents[name]
+
+def compile_agent_variants() -> list[str]:
+    """Build and compile the agents of all the variants, so no request pays for it. Returns their names."""
+    names = agent_variant_names()
+    for name in names:
+        get_agent(name)
+    return names
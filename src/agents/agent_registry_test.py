@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    from .agent_registry import AGENT_VARIANTS, AgentVariant, agent_variant_names, get_agent, register_agent_variant
+    from .base_agent.base_agent import agent as module_agent
+    from .utils.metrics import AGENT_LATENCY, PROMPT_TOKENS
+    from .utils.params_validation import validate_chat_request
+    from ..module import chat_module
+except ImportError:
+    from src.agents.agent_registry import AGENT_VARIANTS, AgentVariant, agent_variant_names, get_agent, register_agent_variant
+    from src.agents.base_agent.base_agent import agent as module_agent
+    from src.agents.utils.metrics import AGENT_LATENCY, PROMPT_TOKENS
+    from src.agents.utils.params_validation import validate_chat_request
+    from src.module import chat_module
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+class TestAgentRegistry(unittest.TestCase):
+    """
+    TestCase Class used to test the registry of tutor agent variants.
+    """
+
+    def tearDown(self):
+        for name in ("test_concise", "test_file"):
+            AGENT_VARIANTS.pop(name, None)
+
+    def test_variants_are_built_once(self):
+        self.assertIs(get_agent("base"), module_agent)
+        self.assertIs(get_agent(None), module_agent)
+
+        register_agent_variant(AgentVariant("test_concise", routes=FAKE_ROUTES, max_messages_to_summarize=5, role_prompt_suffix="Answer in one sentence."))
+        agent = get_agent("test_concise")
+        self.assertIs(get_agent("test_concise"), agent)
+        self.assertEqual(agent.variant, "test_concise")
+        self.assertEqual(agent.max_messages_to_summarize, 5)
+        self.assertTrue(agent.role_prompt.rstrip().endswith("Answer in one sentence."))
+
+        with self.assertRaises(ValueError):
+            get_agent("unknown")
+
+    def test_variants_file(self):
+        path = os.path.join(tempfile.mkdtemp(), "variants.json")
+        with open(path, "w") as file:
+            json.dump({"test_file": {"routes": FAKE_ROUTES, "summary_mode": "combined"}}, file)
+
+        with mock.patch.dict(os.environ, {"AGENT_VARIANTS_PATH": path}):
+            self.assertIn("test_file", agent_variant_names())
+            self.assertEqual(get_agent("test_file").summary_mode, "combined")
+
+    def test_selected_per_request(self):
+        register_agent_variant(AgentVariant("test_concise", routes=FAKE_ROUTES))
+        latencies = AGENT_LATENCY.count(variant="test_concise")
+        prompts = PROMPT_TOKENS.count(variant="test_concise")
+
+        params = {"conversation_id": "variant-test", "agent_type": "test_concise", "include_test_data": True, "conversation_history": [{"type": "user", "content": "How do I start?"}]}
+        response = chat_module("How do I start?", params)
+
+        self.assertEqual(response["metadata"]["agent_type"], "test_concise")
+        self.assertEqual(AGENT_LATENCY.count(variant="test_concise"), latencies + 1)
+        self.assertEqual(PROMPT_TOKENS.count(variant="test_concise"), prompts + 1)
+
+    def test_unknown_agent_type_is_rejected(self):
+        history = [{"type": "user", "content": "Hi"}]
+        error = validate_chat_request("Hi", {"conversation_id": "1", "conversation_history": history, "agent_type": "unknown"})
+        self.assertIn("params.agent_type: unknown agent type 'unknown'", error)
+        self.assertIsNone(validate_chat_request("Hi", {"conversation_id": "1", "conversation_history": history, "agent_type": "base"}))
+
+if __name__ == "__main__":
+    unittest.main()
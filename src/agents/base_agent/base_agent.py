@@ -1,20 +1,37 @@
 try:
-    from ..llm_factory import OpenAILLMs, GoogleAILLMs
+    from ..llm_factory import estimate_tokens, get_llm, output_limit_kwargs, remaining_budget
     from .base_prompts import \
-        role_prompt, conv_pref_prompt, update_conv_pref_prompt, summary_prompt, update_summary_prompt, summary_system_prompt
+        role_prompt, conv_pref_prompt, update_conv_pref_prompt, summary_prompt, update_summary_prompt, summary_system_prompt, summary_and_conv_pref_prompt
     from ..utils.types import InvokeAgentResponseType
+    from ..utils.checkpointers import get_checkpointer
+    from ..utils.message_normalisation import normalise_messages
+    from ..utils.semantic_cache import CacheLookup, SemanticResponseCache, get_response_cache
+    from ..utils.opening_turns import OpeningTurnStore, get_opening_turn_store
+    from ..utils.output_budget import OutputBudget, latency_target, output_budget, output_budget_enabled, output_stats, reply_tokens, throughput
+    from ..utils.metrics import OUTPUT_CUT_OFFS, OUTPUT_TOKENS, PROMPT_TOKENS, SUMMARISATIONS, TUTOR_REPLIES
 except ImportError:
-    from src.agents.llm_factory import OpenAILLMs, GoogleAILLMs
+    from src.agents.llm_factory import estimate_tokens, get_llm, output_limit_kwargs, remaining_budget
     from src.agents.base_agent.base_prompts import \
-        role_prompt, conv_pref_prompt, update_conv_pref_prompt, summary_prompt, update_summary_prompt, summary_system_prompt
+        role_prompt, conv_pref_prompt, update_conv_pref_prompt, summary_prompt, update_summary_prompt, summary_system_prompt, summary_and_conv_pref_prompt
     from src.agents.utils.types import InvokeAgentResponseType
+    from src.agents.utils.checkpointers import get_checkpointer
+    from src.agents.utils.message_normalisation import normalise_messages
+    from src.agents.utils.semantic_cache import CacheLookup, SemanticResponseCache, get_response_cache
+    from src.agents.utils.opening_turns import OpeningTurnStore, get_opening_turn_store
+    from src.agents.utils.output_budget import OutputBudget, latency_target, output_budget, output_budget_enabled, output_stats, reply_tokens, throughput
+    from src.agents.utils.metrics import OUTPUT_CUT_OFFS, OUTPUT_TOKENS, PROMPT_TOKENS, SUMMARISATIONS, TUTOR_REPLIES
 
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.messages import SystemMessage, RemoveMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.config import RunnableConfig
 from langgraph.graph.message import add_messages
 from typing import Annotated, TypeAlias
 from typing_extensions import TypedDict
+import asyncio
+import os
+import time
 
 """
 Base agent for development [LLM workflow with a summarisation, profiling, and chat agent that receives an external conversation history].
@@ -23,6 +40,29 @@ This agent is designed to:
 - [summarise_prompt]        summarise the conversation after 'max_messages_to_summarize' number of messages is reached in the conversation
 - [conv_pref_prompt]        analyse the conversation style of the student 
 - [role_prompt]             role of a tutor to answer student's questions on the topic  
+
+Summary modes (SUMMARY_MODE environment variable or summary_mode argument):
+- separate                  two summarisation LLM calls, one for the summary and one for the conversational style (default)
+- combined                  one structured-output LLM call returning both, falling back to the two calls if it fails
+
+Conversation state (CHECKPOINTER_URL environment variable or checkpointer argument):
+- without a checkpointer the agent has no memory and the request carries the full conversation history, summary and style
+- with a checkpointer the state is stored per conversation id, so after the first turn a request only needs the latest message
+
+Response cache (RESPONSE_CACHE environment variable or response_cache argument, see utils/semantic_cache.py):
+- on the first 'max_cached_turns' turns, without a summary, the tutor response to a message similar to one already
+  answered for the same question version and part is served from the cache instead of calling the LLM
+- the request opts out by not passing a response_cache_scope
+
+Opening turns (OPENING_TURNS_PATH environment variable or opening_turns argument, see utils/opening_turns.py):
+- the first turn of a request with an opening_turn_key found in the store is answered with the precomputed response
+
+Output budget (OUTPUT_BUDGET environment variable, see utils/output_budget.py):
+- the tutor call is limited to a max_tokens budget from the message type, the conversational style and the latency target
+- the reply's 'output_budget' response metadata reports its output tokens, tokens per second and whether it was cut off
+
+The incoming conversation history is normalised once per request (normalise_messages()), and the add_messages reducer
+applies the RemoveMessage updates, so the nodes read state["messages"] as is without filtering it again.
 """
 
 ValidMessageTypes: TypeAlias = SystemMessage | HumanMessage | AIMessage
@@ -33,30 +73,167 @@ class State(TypedDict):
     summary: str
     conversationalStyle: str
 
+class SummaryAndStyle(TypedDict):
+    """Summary of the tutoring conversation and analysis of the student's conversational style."""
+    summary: Annotated[str, ..., "Summary of the conversation, following the instructions of task 1"]
+    conversational_style: Annotated[str, ..., "Conversational style of the student, following the instructions of task 2"]
+
 class BaseAgent:
-    def __init__(self):
-        llm = OpenAILLMs()                  # OpenAILLMs() or GoogleAILLMs()
-        self.llm = llm.get_llm()
-        summarisation_llm = OpenAILLMs()    # OpenAILLMs() or GoogleAILLMs()
-        self.summarisation_llm = summarisation_llm.get_llm()
+    def __init__(self, routes: dict | None = None, summary_mode: str | None = None, checkpointer: BaseCheckpointSaver | None = None, response_cache: SemanticResponseCache | None = None, opening_turns: OpeningTurnStore | None = None, variant: str = "base"):
+        # LLM of each role, from the routing table in llm_factory.py (routes override it, e.g. {"summariser": "openai:gpt-4o-mini"})
+        self.llm = get_llm("tutor", routes)
+        self.summarisation_llm = get_llm("summariser", routes)
+        self.style_llm = get_llm("style_analyser", routes)
+        self.summary_mode = summary_mode or os.environ.get("SUMMARY_MODE", "separate")
+        # name of the agent variant (see agent_registry.py), labels the metrics
+        self.variant = variant
+        self._structured_summariser = None
         self.summary = ""
         self.conversationalStyle = ""
 
         # Define Agent's specific Parameters
         self.max_messages_to_summarize = 11
+        self.max_cached_turns = int(os.environ.get("RESPONSE_CACHE_MAX_TURNS", "1"))
+        # created on first use (RESPONSE_CACHE), so the embedding client is not built at import
+        self.response_cache = response_cache
+        self.opening_turns = opening_turns
         self.role_prompt = role_prompt
         self.summary_prompt = summary_prompt
         self.update_summary_prompt = update_summary_prompt
         self.conversation_preference_prompt = conv_pref_prompt
         self.update_conversation_preference_prompt = update_conv_pref_prompt
+        self.summary_and_conversation_preference_prompt = summary_and_conv_pref_prompt
 
         # Define a new graph for the conversation & compile it
         self.workflow = StateGraph(State)
         self.workflow_definition()
-        self.app = self.workflow.compile()
+        self.checkpointer = checkpointer if checkpointer is not None else get_checkpointer(os.environ.get("CHECKPOINTER_URL"))
+        self.app = self.workflow.compile(checkpointer=self.checkpointer)
 
     def call_model(self, state: State, config: RunnableConfig) -> str:
         """Call the LLM model knowing the role system prompt, the summary and the conversational style."""
+
+        opening_turn = self.opening_turn_for(state, config)
+        if opening_turn is not None:
+            TUTOR_REPLIES.inc(source="opening_turn")
+            return self.model_update(state, opening_turn)
+
+        cache, cache_lookup = self.response_cache_for(state, config), None
+        if cache is not None:
+            cache_lookup = self.safe_cache_call(lambda: cache.lookup(config["configurable"]["response_cache_scope"], state["messages"][-1].content))
+            if cache_lookup and cache_lookup.response is not None:
+                TUTOR_REPLIES.inc(source="response_cache")
+                return self.model_update(state, self.cached_response(cache_lookup))
+
+        valid_messages = self.build_model_messages(state, config)
+        PROMPT_TOKENS.observe(estimate_tokens(valid_messages), variant=self.variant)
+        budget, llm_kwargs = self.output_budget_for(state, config)
+        start_time = time.perf_counter()
+        response = self.llm.invoke(valid_messages, **llm_kwargs)
+        if budget is not None:
+            self.record_output(response, budget, time.perf_counter() - start_time)
+
+        TUTOR_REPLIES.inc(source="llm")
+        OUTPUT_TOKENS.observe(reply_tokens(response), variant=self.variant)
+        if cache_lookup:
+            self.safe_cache_call(lambda: cache.store(cache_lookup, response.content))
+        return self.model_update(state, response)
+
+    async def acall_model(self, state: State, config: RunnableConfig) -> str:
+        """Async version of call_model(), awaiting the LLM instead of blocking the worker."""
+
+        opening_turn = self.opening_turn_for(state, config)
+        if opening_turn is not None:
+            TUTOR_REPLIES.inc(source="opening_turn")
+            return self.model_update(state, opening_turn)
+
+        cache, cache_lookup = self.response_cache_for(state, config), None
+        if cache is not None:
+            try:
+                cache_lookup = await cache.alookup(config["configurable"]["response_cache_scope"], state["messages"][-1].content)
+            except Exception as e:
+                print("WARNING:: response cache unavailable, calling the LLM: ", e)
+            if cache_lookup and cache_lookup.response is not None:
+                TUTOR_REPLIES.inc(source="response_cache")
+                return self.model_update(state, self.cached_response(cache_lookup))
+
+        valid_messages = self.build_model_messages(state, config)
+        PROMPT_TOKENS.observe(estimate_tokens(valid_messages), variant=self.variant)
+        budget, llm_kwargs = self.output_budget_for(state, config)
+        start_time = time.perf_counter()
+        response = await self.llm.ainvoke(valid_messages, **llm_kwargs)
+        if budget is not None:
+            self.record_output(response, budget, time.perf_counter() - start_time)
+
+        TUTOR_REPLIES.inc(source="llm")
+        OUTPUT_TOKENS.observe(reply_tokens(response), variant=self.variant)
+        if cache_lookup:
+            self.safe_cache_call(lambda: cache.store(cache_lookup, response.content))
+        return self.model_update(state, response)
+
+    def opening_turn_for(self, state: State, config: RunnableConfig) -> AIMessage | None:
+        """Precomputed response of the first turn, None if the request has no opening_turn_key or it is not in the store."""
+        key = config["configurable"].get("opening_turn_key")
+        if not key or state.get("summary") or sum(1 for message in state["messages"] if message.type == "human") != 1:
+            return None
+        store = self.opening_turns if self.opening_turns is not None else get_opening_turn_store()
+        response = store.get(key) if store is not None else None
+        if response is None:
+            return None
+        print(f"INFO:: tutor response served from the precomputed opening turns ({key})")
+        return AIMessage(content=response, response_metadata={"opening_turn": key})
+
+    def response_cache_for(self, state: State, config: RunnableConfig) -> SemanticResponseCache | None:
+        """
+        Response cache to use for this turn, None if the request has no cache scope (opt-out) or the conversation
+        is past its first turns: it has a summary or more than max_cached_turns student messages.
+        """
+        if not config["configurable"].get("response_cache_scope") or state.get("summary"):
+            return None
+        messages = state["messages"]
+        if not messages or messages[-1].type != "human" or not isinstance(messages[-1].content, str):
+            return None
+        if sum(1 for message in messages if message.type == "human") > self.max_cached_turns:
+            return None
+        return self.response_cache if self.response_cache is not None else get_response_cache()
+
+    def safe_cache_call(self, call):
+        """Run a cache operation, a failing cache (e.g. the embedding call) only costs the cache."""
+        try:
+            return call()
+        except Exception as e:
+            print("WARNING:: response cache unavailable, calling the LLM: ", e)
+            return None
+
+    def cached_response(self, cache_lookup: CacheLookup) -> AIMessage:
+        print(f"INFO:: tutor response served from the response cache (similarity {cache_lookup.similarity:.3f})")
+        return AIMessage(content=cache_lookup.response, response_metadata={"response_cache": {"similarity": round(cache_lookup.similarity, 4)}})
+
+    def output_budget_for(self, state: State, config: RunnableConfig) -> tuple[OutputBudget | None, dict]:
+        """Output budget of the tutor reply and the LLM call arguments enforcing it, (None, {}) if OUTPUT_BUDGET is off."""
+        if not output_budget_enabled():
+            return None, {}
+        budget = output_budget(
+            state["messages"][-1].content,
+            state.get("conversationalStyle") or config["configurable"].get("conversational_style"),
+            latency_target(remaining_budget()),
+            throughput.tokens_per_second(self.tutor_model_name()),
+        )
+        return budget, output_limit_kwargs(self.llm, budget.max_tokens)
+
+    def record_output(self, response: AIMessage, budget: OutputBudget, latency: float) -> None:
+        """Report the output statistics in the response metadata and update the model's tokens per second."""
+        stats = output_stats(response, budget, latency)
+        response.response_metadata["output_budget"] = stats
+        if stats["cut_off"]:
+            OUTPUT_CUT_OFFS.inc()
+        throughput.observe(self.tutor_model_name(), stats["tokens_per_second"])
+
+    def tutor_model_name(self) -> str:
+        return str(getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or "tutor")
+
+    def build_model_messages(self, state: State, config: RunnableConfig) -> list[ValidMessageTypes]:
+        """Assemble the tutor system prompt and the conversation into the messages sent to the LLM."""
         
         # Default AI tutor role prompt
         system_message = self.role_prompt
@@ -74,32 +251,94 @@ class BaseAgent:
         if conversationalStyle:
             system_message += f"## Known conversational style and preferences of the student for this conversation: {conversationalStyle}. \n\nYour answer must be in line with this conversational style."
 
-        messages = [SystemMessage(content=system_message)] + state['messages']
+        return [SystemMessage(content=system_message)] + state['messages']
+
+    def model_update(self, state: State, response: AIMessage) -> dict:
+        """State update returned by the call_llm node."""
 
-        valid_messages = self.check_for_valid_messages(messages)
-        response = self.llm.invoke(valid_messages)
+        summary = state.get("summary", "")
 
         # Save summary for fetching outside the class
         self.summary = summary
-        self.conversationalStyle = conversationalStyle
+        self.conversationalStyle = state.get("conversationalStyle", "")
 
         return {"summary": summary, "messages": [response]}
     
-    def check_for_valid_messages(self, messages: list[AllMessageTypes]) -> list[ValidMessageTypes]:
-        """ Removing the RemoveMessage() from the list of messages """
-
-        valid_messages: list[ValidMessageTypes] = []
-        for message in messages:
-            if message.type != 'remove':
-                valid_messages.append(message)
-        return valid_messages
-    
     def summarize_conversation(self, state: State, config: RunnableConfig) -> dict:
         """Summarize the conversation."""
 
+        if self.summary_mode == "combined":
+            combined_update = self.summarize_conversation_combined(state, config)
+            if combined_update:
+                return combined_update
+
+        summary_messages, conversationalStyle_messages = self.build_summary_messages(state, config)
+
+        # STEP 1: Summarize the conversation
+        summary_response = self.summarisation_llm.invoke(summary_messages)
+
+        # STEP 2: Analyze the conversational style
+        conversationalStyle_response = self.style_llm.invoke(conversationalStyle_messages)
+
+        return self.summary_update(state, summary_response.content, conversationalStyle_response.content)
+
+    async def asummarize_conversation(self, state: State, config: RunnableConfig) -> dict:
+        """Async version of summarize_conversation(), running both summarisation calls concurrently."""
+
+        if self.summary_mode == "combined":
+            combined_update = await self.asummarize_conversation_combined(state, config)
+            if combined_update:
+                return combined_update
+
+        summary_messages, conversationalStyle_messages = self.build_summary_messages(state, config)
+
+        summary_response, conversationalStyle_response = await asyncio.gather(
+            self.summarisation_llm.ainvoke(summary_messages),
+            self.style_llm.ainvoke(conversationalStyle_messages),
+        )
+
+        return self.summary_update(state, summary_response.content, conversationalStyle_response.content)
+
+    def summarize_conversation_combined(self, state: State, config: RunnableConfig) -> dict | None:
+        """
+        Summary and conversational style in a single structured-output call, sending the conversation only once.
+        Returns None if the call or the parsing fails, so the caller falls back to the two separate calls.
+        """
+        try:
+            structured_response = self.structured_summariser().invoke(self.build_combined_summary_messages(state, config))
+        except Exception as e:
+            print("WARNING:: combined summarisation failed, falling back to separate calls: ", e)
+            return None
+        return self.combined_summary_update(state, structured_response)
+
+    async def asummarize_conversation_combined(self, state: State, config: RunnableConfig) -> dict | None:
+        """Async version of summarize_conversation_combined()."""
+        try:
+            structured_response = await self.structured_summariser().ainvoke(self.build_combined_summary_messages(state, config))
+        except Exception as e:
+            print("WARNING:: combined summarisation failed, falling back to separate calls: ", e)
+            return None
+        return self.combined_summary_update(state, structured_response)
+
+    def structured_summariser(self):
+        """Summarisation LLM bound to the SummaryAndStyle output schema (rebuilt if the summarisation LLM is replaced)."""
+        if self._structured_summariser is None or self._structured_summariser[0] is not self.summarisation_llm:
+            self._structured_summariser = (self.summarisation_llm, self.summarisation_llm.with_structured_output(SummaryAndStyle, include_raw=True))
+        return self._structured_summariser[1]
+
+    def combined_summary_update(self, state: State, structured_response: dict) -> dict | None:
+        parsed = structured_response.get("parsed")
+        if structured_response.get("parsing_error") or not parsed or not parsed.get("summary") or not parsed.get("conversational_style"):
+            print("WARNING:: combined summarisation could not be parsed, falling back to separate calls: ", structured_response.get("parsing_error"))
+            return None
+        return self.summary_update(state, parsed["summary"], parsed["conversational_style"])
+
+    def build_summary_tasks(self, state: State, config: RunnableConfig) -> tuple[str, str]:
+        """Summary and conversational style instructions, updating the previous ones if known."""
+
         summary = state.get("summary", "")
         previous_summary = config["configurable"].get("summary", "")
-        previous_conversationalStyle = config["configurable"].get("conversational_style", "")
+        previous_conversationalStyle = config["configurable"].get("conversational_style", "") or state.get("conversationalStyle", "")
         if previous_summary:
             summary = previous_summary
         
@@ -119,20 +358,35 @@ class BaseAgent:
         else:
             conversationalStyle_message = self.conversation_preference_prompt
 
-        # STEP 1: Summarize the conversation
-        messages = state["messages"][:-1] + [HumanMessage(content=summary_message)] 
-        valid_messages = self.check_for_valid_messages(messages)
-        summary_response = self.summarisation_llm.invoke(valid_messages)
+        return summary_message, conversationalStyle_message
 
-        # STEP 2: Analyze the conversational style
-        messages = state["messages"][:-1] + [HumanMessage(content=conversationalStyle_message)]
-        valid_messages = self.check_for_valid_messages(messages)
-        conversationalStyle_response = self.summarisation_llm.invoke(valid_messages)
+    def build_summary_messages(self, state: State, config: RunnableConfig) -> tuple[list[ValidMessageTypes], list[ValidMessageTypes]]:
+        """Build the summary and the conversational style requests for the summarisation LLM."""
+
+        summary_message, conversationalStyle_message = self.build_summary_tasks(state, config)
 
+        history = state["messages"][:-1]
+        summary_messages = history + [HumanMessage(content=summary_message)]
+        conversationalStyle_messages = history + [HumanMessage(content=conversationalStyle_message)]
+
+        return summary_messages, conversationalStyle_messages
+
+    def build_combined_summary_messages(self, state: State, config: RunnableConfig) -> list[ValidMessageTypes]:
+        """Build the single request asking for both the summary and the conversational style."""
+
+        summary_message, conversationalStyle_message = self.build_summary_tasks(state, config)
+        combined_message = self.summary_and_conversation_preference_prompt.format(summary_task=summary_message, conv_pref_task=conversationalStyle_message)
+
+        return state["messages"][:-1] + [HumanMessage(content=combined_message)]
+
+    def summary_update(self, state: State, summary: str, conversationalStyle: str) -> dict:
+        """State update returned by the summarize_conversation node."""
+
+        SUMMARISATIONS.inc()
         # Delete messages that are no longer wanted, except the last ones
         delete_messages: list[AllMessageTypes] = [RemoveMessage(id=m.id) for m in state["messages"][:-3]]
 
-        return {"summary": summary_response.content, "conversationalStyle": conversationalStyle_response.content, "messages": delete_messages}
+        return {"summary": summary, "conversationalStyle": conversationalStyle, "messages": delete_messages}
     
     def should_summarize(self, state: State) -> str:
         """
@@ -142,11 +396,10 @@ class BaseAgent:
         """
 
         messages = state["messages"]
-        valid_messages = self.check_for_valid_messages(messages)
-        nr_messages = len(valid_messages)
-        if len(valid_messages) == 0:
+        nr_messages = len(messages)
+        if nr_messages == 0:
             raise Exception("Internal Error: No valid messages found in the conversation history. Conversation history might be empty.")
-        if "system" in valid_messages[-1].type:
+        if "system" in messages[-1].type:
             nr_messages -= 1
 
         # always pairs of (sent, response) + 1 latest message
@@ -155,8 +408,9 @@ class BaseAgent:
         return "call_llm"    
 
     def workflow_definition(self) -> None:
-        self.workflow.add_node("call_llm", self.call_model)
-        self.workflow.add_node("summarize_conversation", self.summarize_conversation)
+        # Nodes carry both a sync and an async implementation so the same graph serves app.invoke() and app.ainvoke()
+        self.workflow.add_node("call_llm", RunnableLambda(self.call_model, afunc=self.acall_model, name="call_llm"))
+        self.workflow.add_node("summarize_conversation", RunnableLambda(self.summarize_conversation, afunc=self.asummarize_conversation, name="summarize_conversation"))
 
         self.workflow.add_conditional_edges(source=START, path=self.should_summarize)
         self.workflow.add_edge("summarize_conversation", "call_llm")
@@ -179,25 +433,84 @@ class BaseAgent:
         return event["messages"][-1].content
     
 agent = BaseAgent()
-def invoke_base_agent(query: str, conversation_history: list, summary: str, conversationalStyle: str, question_response_details: str, session_id: str) -> InvokeAgentResponseType:
+
+def _agent_config(summary: str, conversationalStyle: str, question_response_details: str, session_id: str, response_cache_scope: str | None = None, opening_turn_key: str | None = None) -> dict:
+    """Graph config shared by the sync and async invocations."""
+
+    return {"configurable": {"thread_id": session_id, "summary": summary, "conversational_style": conversationalStyle, "question_response_details": question_response_details, "response_cache_scope": response_cache_scope, "opening_turn_key": opening_turn_key}}
+
+def _agent_input(query: str, conversation_history: list, summary: str, conversationalStyle: str, stored_state: dict | None) -> dict:
     """
-    Call an agent that has no conversation memory and expects to receive all past messages in the params and the latest human request in the query.
-    If conversation history longer than X, the agent will summarize the conversation and will provide a conversational style analysis.
+    Graph input shared by the sync and async invocations.
+    stored_state is the checkpointed state of the conversation, None if the agent has no checkpointer.
+    Once the conversation has a stored state, the conversation_history, summary and conversational style of the
+    request are ignored: the stored state is the conversation. To restart it, use a new conversation id.
     """
-    print(f'in invoke_base_agent(), thread_id = {session_id}')
 
-    config = {"configurable": {"thread_id": session_id, "summary": summary, "conversational_style": conversationalStyle, "question_response_details": question_response_details}}
-    response_events = agent.app.invoke({"messages": conversation_history, "summary": summary, "conversational_style": conversationalStyle}, config=config, stream_mode="values") #updates
+    if stored_state:
+        if len(conversation_history or []) > 1 or summary or conversationalStyle:
+            print("WARNING:: the conversation has a stored state, the conversation_history, summary and conversational_style of the request are ignored")
+        # The checkpointer restores the (trimmed) conversation, only the new message is added to it
+        return {"messages": [HumanMessage(content=query)]}
+    if stored_state is not None and not conversation_history:
+        # First turn of a checkpointed conversation sent without history
+        conversation_history = [HumanMessage(content=query)]
+    return {"messages": normalise_messages(conversation_history), "summary": summary, "conversational_style": conversationalStyle}
+
+def _agent_response(agent: BaseAgent, query: str, conversation_history: list, response_events: dict) -> InvokeAgentResponseType:
+    """
+    Build the agent response from the final graph state.
+    Summary and conversational style are read from the state (not from the shared agent instance) so concurrent invocations do not leak into each other.
+    """
     pretty_printed_response = agent.pretty_response_value(response_events) # get last event/ai answer in the response
 
     # Gather Metadata from the agent
-    summary = agent.get_summary()
-    conversationalStyle = agent.get_conversational_style()
-
-    print(f'in invoke_base_agent(), response generated by chatbot')
+    summary = response_events.get("summary", "")
+    conversationalStyle = response_events.get("conversationalStyle", "")
 
-    return {
+    response = {
         "input": query,
         "output": pretty_printed_response,
         "intermediate_steps": [str(summary), conversationalStyle, conversation_history]
-    }
\ No newline at end of file
+    }
+    output_budget_stats = getattr(response_events["messages"][-1], "response_metadata", {}).get("output_budget")
+    if output_budget_stats:
+        response["llm_output"] = output_budget_stats
+    return response
+
+def invoke_base_agent(query: str, conversation_history: list, summary: str, conversationalStyle: str, question_response_details: str, session_id: str, base_agent: BaseAgent | None = None, response_cache_scope: str | None = None, opening_turn_key: str | None = None) -> InvokeAgentResponseType:
+    """
+    Call an agent that has no conversation memory and expects to receive all past messages in the params and the latest human request in the query.
+    If conversation history longer than X, the agent will summarize the conversation and will provide a conversational style analysis.
+    By default the module agent is used, another BaseAgent instance (e.g. with other model routes) can be passed as base_agent.
+    With a response_cache_scope (question version and part), the first turns can be served from the response cache,
+    and with an opening_turn_key (see utils/opening_turns.py) the first turn from the precomputed opening turns.
+    """
+    base_agent = base_agent or agent
+    print(f'in invoke_base_agent(), thread_id = {session_id}')
+
+    config = _agent_config(summary, conversationalStyle, question_response_details, session_id, response_cache_scope, opening_turn_key)
+    stored_state = base_agent.app.get_state(config).values if base_agent.checkpointer else None
+    agent_input = _agent_input(query, conversation_history, summary, conversationalStyle, stored_state)
+    response_events = base_agent.app.invoke(agent_input, config=config, stream_mode="values") #updates
+
+    print(f'in invoke_base_agent(), response generated by chatbot')
+
+    return _agent_response(base_agent, query, conversation_history, response_events)
+
+async def ainvoke_base_agent(query: str, conversation_history: list, summary: str, conversationalStyle: str, question_response_details: str, session_id: str, base_agent: BaseAgent | None = None, response_cache_scope: str | None = None, opening_turn_key: str | None = None) -> InvokeAgentResponseType:
+    """
+    Async version of invoke_base_agent(). The graph runs with app.ainvoke() and the async LLM clients,
+    so a single event loop can serve many conversations while they wait on the LLM.
+    """
+    base_agent = base_agent or agent
+    print(f'in ainvoke_base_agent(), thread_id = {session_id}')
+
+    config = _agent_config(summary, conversationalStyle, question_response_details, session_id, response_cache_scope, opening_turn_key)
+    stored_state = (await base_agent.app.aget_state(config)).values if base_agent.checkpointer else None
+    agent_input = _agent_input(query, conversation_history, summary, conversationalStyle, stored_state)
+    response_events = await base_agent.app.ainvoke(agent_input, config=config, stream_mode="values")
+
+    print(f'in ainvoke_base_agent(), response generated by chatbot')
+
+    return _agent_response(base_agent, query, conversation_history, response_events)
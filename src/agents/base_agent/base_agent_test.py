@@ -0,0 +1,134 @@
+import asyncio
+import os
+import unittest
+import uuid
+from unittest import mock
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+try:
+    from .base_agent import BaseAgent, invoke_base_agent
+    from ..utils.checkpointers import get_checkpointer
+    from ..utils.fake_llm import FakeChatModel
+except ImportError:
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+    from src.agents.utils.checkpointers import get_checkpointer
+    from src.agents.utils.fake_llm import FakeChatModel
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+def long_conversation(nr_messages: int = 14) -> list:
+    messages = []
+    for i in range(nr_messages):
+        message_type = HumanMessage if i % 2 == 0 else AIMessage
+        messages.append(message_type(content=f"message {i}", id=str(uuid.uuid4())))
+    return messages
+
+class TestSummaryModes(unittest.TestCase):
+    """
+    TestCase Class used to test the separate and combined summarisation modes of the base agent.
+    ---
+    The LLMs are replaced by the offline fake provider.
+    """
+
+    def setUp(self):
+        self.state = {"messages": long_conversation(), "summary": "", "conversationalStyle": ""}
+        self.config = {"configurable": {"summary": "", "conversational_style": ""}}
+
+    def test_separate_mode(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, summary_mode="separate")
+        agent.summarisation_llm = FakeChatModel(response="the summary")
+        agent.style_llm = FakeChatModel(response="the style")
+
+        update = agent.summarize_conversation(self.state, self.config)
+
+        self.assertEqual(update["summary"], "the summary")
+        self.assertEqual(update["conversationalStyle"], "the style")
+        self.assertEqual(len(update["messages"]), len(self.state["messages"]) - 3)
+
+    def test_combined_mode_single_call(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, summary_mode="combined")
+        agent.summarisation_llm = FakeChatModel(structured_response={"summary": "combined summary", "conversational_style": "combined style"})
+        agent.style_llm = FakeChatModel(response="unused")
+
+        update = agent.summarize_conversation(self.state, self.config)
+
+        self.assertEqual(update["summary"], "combined summary")
+        self.assertEqual(update["conversationalStyle"], "combined style")
+        self.assertEqual(agent.summarisation_llm.calls, 1)
+        self.assertEqual(agent.style_llm.calls, 0)
+
+    def test_combined_mode_falls_back_on_parsing_error(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, summary_mode="combined")
+        agent.summarisation_llm = FakeChatModel(response="fallback summary")
+        agent.style_llm = FakeChatModel(response="fallback style")
+
+        update = asyncio.run(agent.asummarize_conversation(self.state, self.config))
+
+        self.assertEqual(update["summary"], "fallback summary")
+        self.assertEqual(update["conversationalStyle"], "fallback style")
+
+class TestCheckpointedConversation(unittest.TestCase):
+    """
+    TestCase Class used to test the server-side conversation state of the base agent.
+    """
+
+    def run_turns(self, checkpointer_url: str) -> dict:
+        agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=get_checkpointer(checkpointer_url))
+        for turn in range(8):
+            response = invoke_base_agent(f"message {turn}", [], "", "", "", "conversation-1", base_agent=agent)
+        self.assertEqual(response["output"], FakeChatModel().response)
+        return agent.app.get_state({"configurable": {"thread_id": "conversation-1"}}).values
+
+    def test_memory_checkpointer_restores_the_conversation(self):
+        state = self.run_turns("memory")
+
+        # summarised past 11 messages, then trimmed to the last ones
+        self.assertTrue(state["summary"])
+        self.assertLess(len(state["messages"]), 16)
+        self.assertEqual(state["messages"][-2].content, "message 7")
+
+    def test_sqlite_checkpointer_restores_the_conversation(self):
+        state = self.run_turns("sqlite:")
+
+        self.assertEqual(state["messages"][-2].content, "message 7")
+
+    def test_checkpointers_keep_the_latest_checkpoint_of_recent_conversations(self):
+        for url in ("memory", "sqlite:"):
+            with self.subTest(url=url), mock.patch.dict(os.environ, {"CHECKPOINTER_MAX_THREADS": "2"}):
+                checkpointer = get_checkpointer(url)
+                checkpointer.EVICT_EVERY = 1
+                agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=checkpointer)
+                for conversation in range(3):
+                    for turn in range(3):
+                        invoke_base_agent(f"message {turn}", [], "", "", "", f"conversation-{conversation}", base_agent=agent)
+
+                # the oldest conversation is deleted, the others keep their latest checkpoint only
+                self.assertEqual(agent.app.get_state({"configurable": {"thread_id": "conversation-0"}}).values, {})
+                for conversation in (1, 2):
+                    config = {"configurable": {"thread_id": f"conversation-{conversation}"}}
+                    self.assertEqual(len(list(checkpointer.list(config))), 1)
+                    self.assertEqual([m.content for m in agent.app.get_state(config).values["messages"][::2]], ["message 0", "message 1", "message 2"])
+                    if url == "memory":
+                        # one stored value per channel of the latest checkpoint
+                        blobs = [key for key in checkpointer.blobs if key[0] == f"conversation-{conversation}"]
+                        self.assertLessEqual(len(blobs), len(checkpointer.get_tuple(config).checkpoint["channel_versions"]))
+                if url == "memory":
+                    self.assertFalse(any(key[0] == "conversation-0" for key in list(checkpointer.blobs) + list(checkpointer.writes)))
+
+    def test_stored_state_takes_precedence_over_the_request_history(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=get_checkpointer("memory"))
+        invoke_base_agent("message 0", [], "", "", "", "conversation-1", base_agent=agent)
+
+        edited_history = [{"type": "user", "content": "edited message"}, {"type": "ai", "content": "edited answer"}, {"type": "user", "content": "message 1"}]
+        with mock.patch("builtins.print") as printed:
+            invoke_base_agent("message 1", edited_history, "edited summary", "edited style", "", "conversation-1", base_agent=agent)
+
+        state = agent.app.get_state({"configurable": {"thread_id": "conversation-1"}}).values
+        self.assertEqual([m.content for m in state["messages"][::2]], ["message 0", "message 1"])
+        self.assertNotEqual(state.get("summary"), "edited summary")
+        self.assertTrue(any("are ignored" in str(call) for call in printed.call_args_list))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_checkpointer("mongodb://localhost")
@@ -105,4 +105,11 @@ update_summary_prompt = f"""Update the summary by taking into account the new me
 
 {summary_guidelines}"""
 
-summary_system_prompt = "You are continuing a tutoring session with the student. Background context: {summary}. Use this context to inform your understanding but do not explicitly restate, refer to, or incorporate the details directly in your responses unless the user brings them up. Respond naturally to the user's current input, assuming prior knowledge from the summary."
\ No newline at end of file
+summary_system_prompt = "You are continuing a tutoring session with the student. Background context: {summary}. Use this context to inform your understanding but do not explicitly restate, refer to, or incorporate the details directly in your responses unless the user brings them up. Respond naturally to the user's current input, assuming prior knowledge from the summary."
+summary_and_conv_pref_prompt = """Based on the interaction above, complete the two tasks below in a single answer: write the 'summary' of the conversation and the analysis of the student's 'conversational_style'.
+
+## Task 1: summary
+{summary_task}
+
+## Task 2: conversational_style
+{conv_pref_task}"""
@@ -1,22 +1,48 @@
+import asyncio
+import contextvars
+import json
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, Optional
 
+import httpx
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig
 from langchain_openai import AzureChatOpenAI
 from langchain_openai import AzureOpenAIEmbeddings
-from langchain_community.llms import Ollama
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_openai import ChatOpenAI
 from langchain_openai import OpenAIEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
+try:
+    from .utils.fake_llm import FakeChatModel
+    from .utils.cassette import CassetteLLM, get_cassette
+except ImportError:
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.utils.cassette import CassetteLLM, get_cassette
 load_dotenv()
 
+# Retries inside the provider SDKs (2 for OpenAI and Azure by default) would run within every ResilientLLM attempt,
+# each with the full request timeout, and absorb the 429s the AdaptiveLimiter adapts to: ResilientLLM owns the retries.
+PROVIDER_MAX_RETRIES = 0
+
 class AzureLLMs:
-    def __init__(self, temperature: int = 0):
+    def __init__(self, temperature: int = 0, model: Optional[str] = None):
         self._azure_llm = AzureChatOpenAI(
                         openai_api_version=os.environ["AZURE_OPENAI_API_VERSION"],
-                        azure_deployment=os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"],
+                        azure_deployment=model or os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT_NAME"],
                         temperature=temperature,
                         max_tokens=None,
+                        max_retries=PROVIDER_MAX_RETRIES,
                     )
         self._azure_embedding = AzureOpenAIEmbeddings(azure_deployment=os.environ['AZURE_OPENAI_EMBEDDING_1536_DEPLOYMENT'], 
                                         openai_api_version=os.environ["AZURE_OPENAI_API_VERSION"],
@@ -28,25 +54,76 @@ class AzureLLMs:
     def get_embedding(self):
         return self._azure_embedding
 
+def ollama_parallel() -> int:
+    """Requests the local inference server generates at once (its parallel slots, as OLLAMA_NUM_PARALLEL of the Ollama server)."""
+    return int(os.environ.get("OLLAMA_NUM_PARALLEL") or 4)
+
+def ollama_concurrency() -> int:
+    """
+    Requests in flight to the local inference server: its parallel slots plus OLLAMA_QUEUE_DEPTH requests waiting
+    in the server (default: one per slot), so a slot does not idle while the next request is sent.
+    """
+    queue_depth = os.environ.get("OLLAMA_QUEUE_DEPTH")
+    return ollama_parallel() + (int(queue_depth) if queue_depth else ollama_parallel())
+
+def ollama_keep_alive() -> int | str:
+    """How long the server keeps the model loaded after a request: a duration ("30m"), seconds, or -1 for ever."""
+    keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE") or "30m"
+    return int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+
 class OllamaLLMs:
-    def __init__(self):
-        self._ollama_llm = Ollama(
-            model=os.environ['OLLAMA_MODEL'], # Any of the available models listed in the API docs
-            base_url=os.environ['OLLAMA_BASE_URL'],
-            headers={
-                'X-API-Key': os.environ['OLLAMA_API_KEY'],
-            },
+    """
+    Local inference server of the on-prem nodes: Ollama, or another server with an OpenAI-compatible API (llama.cpp, vLLM).
+    The chat model calls the OpenAI-compatible endpoint {OLLAMA_BASE_URL}/v1 over persistent (keep-alive) connections,
+    one per request in flight. The requests in flight are limited to the server's parallel slots and a short queue
+    (see ollama_concurrency()), preload() loads the model before the first request.
+    The requests carry OLLAMA_KEEP_ALIVE, but Ollama's /v1 endpoint ignores it: each chat request resets the time the
+    model stays loaded to the server's own OLLAMA_KEEP_ALIVE, so that is the setting that keeps the model loaded.
+    Only the preload request (the native /api/generate endpoint) applies the keep_alive sent by the client.
+    """
+    def __init__(self, temperature: int = 0, model: Optional[str] = None):
+        self.model = model or os.environ['OLLAMA_MODEL']
+        self.base_url = os.environ['OLLAMA_BASE_URL'].rstrip('/')
+        self.keep_alive = ollama_keep_alive()
+        self.headers = {'X-API-Key': os.environ.get('OLLAMA_API_KEY', '')}
+        limits = httpx.Limits(max_keepalive_connections=ollama_concurrency(), keepalive_expiry=float(os.environ.get("OLLAMA_CONNECTION_KEEP_ALIVE") or 300))
+
+        self._ollama_llm = ChatOpenAI(
+            model=self.model,
+            temperature=temperature,
+            base_url=f"{self.base_url}/v1",
+            api_key=os.environ.get('OLLAMA_API_KEY') or "ollama",
+            default_headers=self.headers,
+            extra_body={"keep_alive": self.keep_alive},
+            max_retries=PROVIDER_MAX_RETRIES,
+            http_client=httpx.Client(limits=limits),
+            http_async_client=httpx.AsyncClient(limits=limits),
         )
 
         self._ollama_embedding = OllamaEmbeddings(
-            model='nomic-embed-text:137m-v1.5-fp16',
-            base_url=os.environ['OLLAMA_BASE_URL'],
-            headers={
-                'X-API-Key': os.environ['OLLAMA_API_KEY'],
-            },
-            show_progress=True
+            model=os.environ.get('OLLAMA_EMBEDDING_MODEL') or 'nomic-embed-text:137m-v1.5-fp16',
+            base_url=self.base_url,
+            headers=self.headers,
         )
 
+    @staticmethod
+    def limiter_policy() -> "LimiterPolicy":
+        """Concurrency limit of the requests, so the other requests wait in the process (within their latency budget) rather than in the server."""
+        policy = LimiterPolicy.from_env()
+        policy.initial_limit = policy.max_limit = ollama_concurrency()
+        return policy
+
+    def preload(self) -> float:
+        """
+        Load the model into the server's memory (a generate request without a prompt), kept loaded for OLLAMA_KEEP_ALIVE
+        until the next chat request resets it to the server's setting. Returns the seconds it took.
+        """
+        start_time = time.perf_counter()
+        response = httpx.post(f"{self.base_url}/api/generate", json={"model": self.model, "keep_alive": self.keep_alive},
+                              headers=self.headers, timeout=float(os.environ.get("OLLAMA_PRELOAD_TIMEOUT") or 300))
+        response.raise_for_status()
+        return time.perf_counter() - start_time
+
     def get_llm(self):
         return self._ollama_llm
 
@@ -54,11 +131,12 @@ class OllamaLLMs:
         return self._ollama_embedding
     
 class OpenAILLMs:
-    def __init__(self, temperature: int = 0):
+    def __init__(self, temperature: int = 0, model: Optional[str] = None):
         self._openai_llm = ChatOpenAI(
-            model=os.environ['OPENAI_MODEL'],
+            model=model or os.environ['OPENAI_MODEL'],
             temperature=temperature,
             api_key=os.environ["OPENAI_API_KEY"],
+            max_retries=PROVIDER_MAX_RETRIES,
         )
 
         self._openai_embedding = OpenAIEmbeddings(
@@ -73,13 +151,716 @@ class OpenAILLMs:
         return self._openai_embedding
 
 class GoogleAILLMs:
-    def __init__(self, temperature: int = 0):
+    def __init__(self, temperature: int = 0, model: Optional[str] = None):
 
         self._google_llm = ChatGoogleGenerativeAI(
-            model=os.environ['GOOGLE_AI_MODEL'],
+            model=model or os.environ['GOOGLE_AI_MODEL'],
             temperature=temperature,
             google_api_key=os.environ['GOOGLE_AI_API_KEY'],
+            # attempts including the first request, 0 or 1 for none
+            max_retries=PROVIDER_MAX_RETRIES,
         )
     
     def get_llm(self):
-        return self._google_llm
\ No newline at end of file
+        return self._google_llm
+
+class FakeLLMs:
+    """Offline stub provider for load tests and benchmarks, the model name is the response latency in seconds."""
+    def __init__(self, temperature: int = 0, model: Optional[str] = None):
+        self._fake_llm = FakeChatModel(latency=float(model or 0))
+        self._fake_embedding = DeterministicFakeEmbedding(size=256)
+
+    def get_llm(self):
+        return self._fake_llm
+
+    def get_embedding(self):
+        return self._fake_embedding
+
+
+# ---------------------------------------------------------------------------
+# Resilience layer: per-call deadlines from a request latency budget, retries
+# with jittered backoff and optional hedged requests around any chat model.
+# ---------------------------------------------------------------------------
+
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_request_deadline", default=None)
+_request_attempts: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("llm_request_attempts", default=None)
+
+@contextmanager
+def latency_budget(seconds: Optional[float] = None) -> Iterator[list]:
+    """
+    Scope a request latency budget (in seconds) over all the LLM calls made inside the block.
+    Nested budgets keep the earliest deadline. Yields the list in which every LLM attempt of the request is recorded.
+    """
+    deadline = _request_deadline.get()
+    if seconds is not None:
+        own_deadline = time.monotonic() + seconds
+        deadline = own_deadline if deadline is None else min(deadline, own_deadline)
+    attempts = _request_attempts.get()
+    if attempts is None:
+        attempts = []
+
+    deadline_token = _request_deadline.set(deadline)
+    attempts_token = _request_attempts.set(attempts)
+    try:
+        yield attempts
+    finally:
+        _request_deadline.reset(deadline_token)
+        _request_attempts.reset(attempts_token)
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request latency budget, None if no budget is set."""
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+@dataclass
+class ResiliencePolicy:
+    """
+    Retry, timeout and hedging settings of an LLM client. All durations are in seconds.
+    - attempt_timeout:      upper bound of a single attempt (further capped by the request latency budget)
+    - max_attempts:         attempts per call, including the first one
+    - backoff_base/max:     full-jitter exponential backoff between attempts
+    - hedge:                send a duplicate request if the first one is slower than the hedge threshold
+    - hedge_after:          fixed hedge threshold; if None, the observed latency percentile is used
+    """
+    attempt_timeout: Optional[float] = 60.0
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    hedge: bool = False
+    hedge_after: Optional[float] = None
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> "ResiliencePolicy":
+        """Policy configured through the LLM_* environment variables, defaults otherwise."""
+        policy = cls()
+        if os.environ.get("LLM_ATTEMPT_TIMEOUT"):
+            policy.attempt_timeout = float(os.environ["LLM_ATTEMPT_TIMEOUT"])
+        if os.environ.get("LLM_MAX_ATTEMPTS"):
+            policy.max_attempts = int(os.environ["LLM_MAX_ATTEMPTS"])
+        if os.environ.get("LLM_BACKOFF_BASE"):
+            policy.backoff_base = float(os.environ["LLM_BACKOFF_BASE"])
+        if os.environ.get("LLM_HEDGE"):
+            policy.hedge = os.environ["LLM_HEDGE"].lower() in ("1", "true", "yes")
+        if os.environ.get("LLM_HEDGE_AFTER"):
+            policy.hedge_after = float(os.environ["LLM_HEDGE_AFTER"])
+        return policy
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, rate limits, server errors and connection errors are retried; other client errors (4xx) are not."""
+    if isinstance(error, TimeoutError) and "latency budget" in str(error):
+        return False
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in (408, 409, 429) or status_code >= 500
+    return True
+
+# ---------------------------------------------------------------------------
+# Adaptive rate limiting: an AIMD concurrency limit and a token bucket per
+# provider and model, shared by the threads and tasks of the process (and by
+# the workers of a node through a lock file).
+# ---------------------------------------------------------------------------
+
+@dataclass
+class LimiterPolicy:
+    """
+    Settings of an AdaptiveLimiter.
+    - initial/min/max_limit:        concurrent requests allowed, adapted between min_limit and max_limit
+    - increase:                     additive increase of the limit per limit-many successful requests
+    - decrease:                     multiplicative decrease of the limit on a rate limit (429) or a slow response
+    - latency_target:               responses slower than this (in seconds) count as an overload signal (None: 429 only)
+    - cooldown:                     minimum seconds between two decreases, so a burst of 429s counts once
+    - tokens_per_minute/burst:      token bucket refill rate and capacity (None: no token limit, burst defaults to a minute)
+    - output_tokens_estimate:       tokens reserved for the response, corrected with the reported usage afterwards
+    - coordination_dir:             directory of the lock files shared by the workers of a node (None: in-process only)
+    """
+    initial_limit: float = 8
+    min_limit: float = 1
+    max_limit: float = 64
+    increase: float = 1.0
+    decrease: float = 0.5
+    latency_target: Optional[float] = None
+    cooldown: float = 1.0
+    tokens_per_minute: Optional[int] = None
+    token_burst: Optional[int] = None
+    output_tokens_estimate: int = 256
+    coordination_dir: Optional[str] = None
+    poll_interval: float = 0.01
+
+    @classmethod
+    def from_env(cls) -> "LimiterPolicy":
+        """Policy configured through the LLM_LIMITER_* environment variables, defaults otherwise."""
+        policy = cls()
+        if os.environ.get("LLM_LIMITER_INITIAL"):
+            policy.initial_limit = float(os.environ["LLM_LIMITER_INITIAL"])
+        if os.environ.get("LLM_LIMITER_MAX"):
+            policy.max_limit = float(os.environ["LLM_LIMITER_MAX"])
+        if os.environ.get("LLM_LIMITER_LATENCY_TARGET"):
+            policy.latency_target = float(os.environ["LLM_LIMITER_LATENCY_TARGET"])
+        if os.environ.get("LLM_TOKENS_PER_MINUTE"):
+            policy.tokens_per_minute = int(os.environ["LLM_TOKENS_PER_MINUTE"])
+        if os.environ.get("LLM_LIMITER_DIR"):
+            policy.coordination_dir = os.environ["LLM_LIMITER_DIR"]
+        return policy
+
+class LimiterState:
+    """Shared state of a limiter within the process: in-flight requests per process, limit and token bucket."""
+
+    # whether an update may block on I/O, so the async callers run it in a thread
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: dict = {}
+
+    @contextmanager
+    def update(self) -> Iterator[dict]:
+        with self._lock:
+            yield self._state
+
+class FileLimiterState(LimiterState):
+    """
+    Limiter state kept in a lock file, so the worker processes of a node share one limit and token bucket.
+    The in-flight requests of a worker that died are dropped.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @contextmanager
+    def update(self) -> Iterator[dict]:
+        import fcntl
+
+        with self._lock, open(self.path, "a+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read()
+                state = json.loads(content) if content else {}
+                state["in_flight"] = {pid: count for pid, count in state.get("in_flight", {}).items() if _process_alive(int(pid))}
+                yield state
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def estimate_tokens(input: Any) -> int:
+    """Rough token count of a request (4 characters per token), used to reserve the token bucket."""
+    if isinstance(input, str):
+        return len(input) // 4
+    if isinstance(input, (list, tuple)):
+        return sum(estimate_tokens(getattr(message, "content", message)) for message in input)
+    if isinstance(input, dict):
+        return estimate_tokens(input.get("content", ""))
+    return estimate_tokens(str(getattr(input, "content", input)))
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter with a token bucket, in front of one provider and model.
+    Successful requests slowly raise the concurrency limit; rate limits (429) and slow responses cut it by a factor.
+    Waiting requests poll the shared state, so the same limiter serves threads, asyncio tasks and, with
+    a FileLimiterState, the other worker processes of the node.
+    """
+
+    def __init__(self, name: str, policy: Optional[LimiterPolicy] = None, state: Optional[LimiterState] = None):
+        self.name = name
+        self.policy = policy or LimiterPolicy()
+        self.state = state or LimiterState()
+
+    def _initialise(self, state: dict) -> None:
+        if "limit" not in state:
+            state.update(limit=self.policy.initial_limit, last_decrease=0.0, rate_limited=0)
+        state.setdefault("in_flight", {})
+        if self.policy.tokens_per_minute and "tokens" not in state:
+            state.update(tokens=float(self._token_capacity()), refilled_at=time.time())
+
+    def _token_capacity(self) -> int:
+        return self.policy.token_burst or self.policy.tokens_per_minute
+
+    def _try_acquire(self, tokens: int) -> bool:
+        pid = str(os.getpid())
+        with self.state.update() as state:
+            self._initialise(state)
+            if sum(state["in_flight"].values()) >= max(1, int(state["limit"])):
+                return False
+            if self.policy.tokens_per_minute:
+                now = time.time()
+                state["tokens"] = min(self._token_capacity(), state["tokens"] + (now - state["refilled_at"]) * self.policy.tokens_per_minute / 60)
+                state["refilled_at"] = now
+                # a request larger than the bucket waits for a full bucket instead of forever
+                if state["tokens"] < min(tokens, self._token_capacity()):
+                    return False
+                state["tokens"] -= tokens
+            state["in_flight"][pid] = state["in_flight"].get(pid, 0) + 1
+            return True
+
+    def _wait_error(self, deadline: Optional[float]) -> Optional[TimeoutError]:
+        remaining = remaining_budget()
+        if (deadline is not None and time.monotonic() >= deadline) or (remaining is not None and remaining <= 0):
+            return TimeoutError(f"Internal Error: The {self.name} LLM call timed out waiting for the rate limiter.")
+        return None
+
+    def acquire(self, input: Any, deadline: Optional[float] = None) -> int:
+        """Block until the request may be sent (or the deadline passes). Returns the reserved tokens."""
+        tokens = estimate_tokens(input) + self.policy.output_tokens_estimate
+        while not self._try_acquire(tokens):
+            error = self._wait_error(deadline)
+            if error:
+                raise error
+            time.sleep(self.policy.poll_interval)
+        return tokens
+
+    async def aacquire(self, input: Any, deadline: Optional[float] = None) -> int:
+        """
+        Async version of acquire(), yielding to the event loop while waiting. The updates of a shared lock file
+        run in a thread, so the event loop does not wait on the file lock of the other workers.
+        """
+        tokens = estimate_tokens(input) + self.policy.output_tokens_estimate
+        while not await self._atry_acquire(tokens):
+            error = self._wait_error(deadline)
+            if error:
+                raise error
+            await asyncio.sleep(self.policy.poll_interval)
+        return tokens
+
+    async def _atry_acquire(self, tokens: int) -> bool:
+        if not self.state.blocking:
+            return self._try_acquire(tokens)
+        loop = asyncio.get_running_loop()
+        attempt = loop.run_in_executor(None, self._try_acquire, tokens)
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            # the update completes in its thread anyway, give back the slot if it took one
+            def give_back(done: asyncio.Future) -> None:
+                if not done.cancelled() and done.exception() is None and done.result():
+                    loop.run_in_executor(None, self.release, tokens, 0.0, asyncio.CancelledError())
+            attempt.add_done_callback(give_back)
+            raise
+
+    def release(self, tokens: int, latency: float, error: Optional[BaseException] = None, output: Any = None) -> None:
+        """Return the slot, correct the token bucket with the reported usage and adapt the limit to the outcome."""
+        pid = str(os.getpid())
+        used = (getattr(output, "usage_metadata", None) or {}).get("total_tokens")
+        with self.state.update() as state:
+            self._initialise(state)
+            state["in_flight"][pid] = max(0, state["in_flight"].get(pid, 0) - 1)
+            if used is not None and self.policy.tokens_per_minute:
+                state["tokens"] -= used - tokens
+
+            rate_limited = error is not None and getattr(error, "status_code", None) == 429
+            slow = error is None and self.policy.latency_target is not None and latency > self.policy.latency_target
+            if rate_limited:
+                state["rate_limited"] += 1
+            if rate_limited or slow:
+                now = time.time()
+                if now - state["last_decrease"] >= self.policy.cooldown:
+                    state["limit"] = max(self.policy.min_limit, state["limit"] * self.policy.decrease)
+                    state["last_decrease"] = now
+            elif error is None:
+                state["limit"] = min(self.policy.max_limit, state["limit"] + self.policy.increase / state["limit"])
+
+    async def arelease(self, tokens: int, latency: float, error: Optional[BaseException] = None, output: Any = None) -> None:
+        """Async version of release(), in a thread for the state of a shared lock file."""
+        if self.state.blocking:
+            await asyncio.to_thread(self.release, tokens, latency, error, output)
+        else:
+            self.release(tokens, latency, error, output)
+
+    @property
+    def limit(self) -> float:
+        with self.state.update() as state:
+            self._initialise(state)
+            return state["limit"]
+
+    @property
+    def rate_limited(self) -> int:
+        """Rate limit (429) responses seen by the limiter."""
+        with self.state.update() as state:
+            self._initialise(state)
+            return state["rate_limited"]
+
+_limiters: dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def limiter_enabled() -> bool:
+    return os.environ.get("LLM_LIMITER", "").lower() in ("1", "true", "yes")
+
+def get_limiter(name: str, policy: Optional[LimiterPolicy] = None) -> AdaptiveLimiter:
+    """Limiter shared by all the clients of a provider and model in the process (and the node, with a coordination dir)."""
+    with _limiters_lock:
+        if name not in _limiters:
+            policy = policy or LimiterPolicy.from_env()
+            state = None
+            if policy.coordination_dir:
+                filename = "".join(c if c.isalnum() or c in "-_." else "_" for c in name) + ".limiter.json"
+                state = FileLimiterState(os.path.join(policy.coordination_dir, filename))
+            _limiters[name] = AdaptiveLimiter(name, policy, state)
+        return _limiters[name]
+
+
+class ResilientLLM(Runnable):
+    """
+    Runnable wrapper applying a ResiliencePolicy around an LLM client (invoke and ainvoke).
+    Every attempt is recorded in the request attempts list (see latency_budget()) and in the
+    'attempts' response metadata of the returned message.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-attempt")
+
+    def __init__(self, llm: Runnable, policy: Optional[ResiliencePolicy] = None, name: str = "llm", limiter: Optional[AdaptiveLimiter] = None):
+        self.llm = llm
+        self.policy = policy or ResiliencePolicy()
+        self.name = name
+        self.limiter = limiter
+        self._latencies: deque = deque(maxlen=200)
+
+    def __getattr__(self, attribute: str) -> Any:
+        # expose the attributes of the wrapped client (e.g. model_name)
+        if attribute == "llm":
+            raise AttributeError(attribute)
+        return getattr(self.llm, attribute)
+
+    def with_structured_output(self, *args: Any, **kwargs: Any) -> "ResilientLLM":
+        return ResilientLLM(self.llm.with_structured_output(*args, **kwargs), self.policy, self.name, self.limiter)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay after which a hedged duplicate request is sent, None if hedging is off or not calibrated yet."""
+        if not self.policy.hedge:
+            return None
+        if self.policy.hedge_after is not None:
+            return self.policy.hedge_after
+        if len(self._latencies) < self.policy.hedge_min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(self.policy.hedge_percentile * len(latencies)))]
+
+    def _attempt_timeout(self) -> Optional[float]:
+        timeout = self.policy.attempt_timeout
+        remaining = remaining_budget()
+        if remaining is not None:
+            if remaining <= 0:
+                raise TimeoutError(f"Internal Error: The {self.name} LLM call exceeded the request latency budget.")
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def _backoff(self, attempt: int) -> float:
+        delay = self.policy.backoff(attempt)
+        remaining = remaining_budget()
+        return delay if remaining is None else max(0.0, min(delay, remaining))
+
+    def _record(self, attempt: int, hedged: bool, start_time: float, timeout: Optional[float], error: Optional[BaseException] = None) -> dict:
+        latency = time.monotonic() - start_time
+        record = {
+            "llm": self.name,
+            "attempt": attempt,
+            "hedged": hedged,
+            "outcome": "ok" if error is None else ("timeout" if isinstance(error, TimeoutError) else "error"),
+            "latency": round(latency, 4),
+            "timeout": None if timeout is None else round(timeout, 4),
+        }
+        if error is not None:
+            record["error"] = repr(error)
+        else:
+            self._latencies.append(latency)
+        attempts = _request_attempts.get()
+        if attempts is not None:
+            attempts.append(record)
+        return record
+
+    def _call(self, input: Any, config: Optional[RunnableConfig], deadline: Optional[float], **kwargs: Any) -> Any:
+        """Single request to the LLM client, through the rate limiter if any, cut off by the client at the deadline."""
+        if self.limiter is None:
+            return self.llm.invoke(input, config, **kwargs, **request_timeout_kwargs(self.llm, deadline))
+        tokens = self.limiter.acquire(input, deadline)
+        start_time = time.monotonic()
+        output, error = None, None
+        try:
+            output = self.llm.invoke(input, config, **kwargs, **request_timeout_kwargs(self.llm, deadline))
+            return output
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(tokens, time.monotonic() - start_time, error, output)
+
+    async def _acall(self, input: Any, config: Optional[RunnableConfig], deadline: Optional[float], **kwargs: Any) -> Any:
+        """Async version of _call()."""
+        if self.limiter is None:
+            return await self.llm.ainvoke(input, config, **kwargs, **request_timeout_kwargs(self.llm, deadline))
+        tokens = await self.limiter.aacquire(input, deadline)
+        start_time = time.monotonic()
+        output, error = None, None
+        try:
+            output = await self.llm.ainvoke(input, config, **kwargs, **request_timeout_kwargs(self.llm, deadline))
+            return output
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self.limiter.arelease(tokens, time.monotonic() - start_time, error, output)
+
+    def _finish(self, output: Any, records: list) -> Any:
+        if isinstance(output, BaseMessage):
+            output.response_metadata["attempts"] = records
+        return output
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        records = []
+        for attempt in range(1, self.policy.max_attempts + 1):
+            timeout = self._attempt_timeout()
+            try:
+                output = self._invoke_attempt(input, config, kwargs, attempt, timeout, records)
+                return self._finish(output, records)
+            except Exception as error:
+                if attempt == self.policy.max_attempts or not is_retryable(error):
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    def _invoke_attempt(self, input: Any, config: Optional[RunnableConfig], kwargs: dict, attempt: int, timeout: Optional[float], records: list) -> Any:
+        hedge_delay = self.hedge_delay()
+        start_time = time.monotonic()
+        deadline = None if timeout is None else start_time + timeout
+
+        # Without a timeout or hedging there is nothing to wait on concurrently, so the call runs inline.
+        # Otherwise it runs in the executor so the wait can end at the deadline or when the hedge is due. The
+        # threads cannot be cancelled, but the client gets the deadline as its request timeout (for the clients
+        # that take one, see request_timeout_kwargs()), so a timed out or losing attempt ends at the deadline
+        # at the latest and releases its thread and limiter slot.
+        if timeout is None and hedge_delay is None:
+            try:
+                output = self._call(input, config, deadline, **kwargs)
+            except Exception as error:
+                records.append(self._record(attempt, False, start_time, timeout, error))
+                raise
+            records.append(self._record(attempt, False, start_time, timeout))
+            return output
+
+        def submit():
+            context = contextvars.copy_context()
+            return self._executor.submit(context.run, self._call, input, config, deadline, **kwargs)
+
+        futures = {submit(): False}
+        hedge_sent = False
+        first_error = None
+        while futures:
+            wait_time = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if hedge_delay is not None and not hedge_sent:
+                hedge_wait = max(0.0, start_time + hedge_delay - time.monotonic())
+                wait_time = hedge_wait if wait_time is None else min(wait_time, hedge_wait)
+            done, _ = wait(list(futures), timeout=wait_time, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                hedged = futures.pop(future)
+                error = future.exception()
+                records.append(self._record(attempt, hedged, start_time, timeout, error))
+                if error is None:
+                    # the slower duplicate keeps running in its thread until the deadline, its result is ignored
+                    return future.result()
+                first_error = first_error or error
+
+            if deadline is not None and time.monotonic() >= deadline and futures:
+                for hedged in futures.values():
+                    records.append(self._record(attempt, hedged, start_time, timeout, TimeoutError("attempt timed out")))
+                raise TimeoutError(f"Internal Error: The {self.name} LLM call timed out after {timeout:.2f}s.")
+            if hedge_delay is not None and not hedge_sent and futures and time.monotonic() >= start_time + hedge_delay:
+                futures[submit()] = True
+                hedge_sent = True
+
+        raise first_error
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        records = []
+        for attempt in range(1, self.policy.max_attempts + 1):
+            timeout = self._attempt_timeout()
+            try:
+                output = await self._ainvoke_attempt(input, config, kwargs, attempt, timeout, records)
+                return self._finish(output, records)
+            except Exception as error:
+                if attempt == self.policy.max_attempts or not is_retryable(error):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def _ainvoke_attempt(self, input: Any, config: Optional[RunnableConfig], kwargs: dict, attempt: int, timeout: Optional[float], records: list) -> Any:
+        hedge_delay = self.hedge_delay()
+        start_time = time.monotonic()
+
+        deadline = None if timeout is None else start_time + timeout
+        tasks = {asyncio.ensure_future(self._acall(input, config, deadline, **kwargs)): False}
+        hedge_sent = False
+        first_error = None
+        try:
+            while tasks:
+                wait_time = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if hedge_delay is not None and not hedge_sent:
+                    hedge_wait = max(0.0, start_time + hedge_delay - time.monotonic())
+                    wait_time = hedge_wait if wait_time is None else min(wait_time, hedge_wait)
+                done, _ = await asyncio.wait(list(tasks), timeout=wait_time, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    hedged = tasks.pop(task)
+                    error = task.exception()
+                    records.append(self._record(attempt, hedged, start_time, timeout, error))
+                    if error is None:
+                        return task.result()
+                    first_error = first_error or error
+
+                if deadline is not None and time.monotonic() >= deadline and tasks:
+                    for hedged in tasks.values():
+                        records.append(self._record(attempt, hedged, start_time, timeout, TimeoutError("attempt timed out")))
+                    raise TimeoutError(f"Internal Error: The {self.name} LLM call timed out after {timeout:.2f}s.")
+                if hedge_delay is not None and not hedge_sent and tasks and time.monotonic() >= start_time + hedge_delay:
+                    tasks[asyncio.ensure_future(self._acall(input, config, deadline, **kwargs))] = True
+                    hedge_sent = True
+        finally:
+            # unlike threads, losing or timed out async requests can be cancelled
+            for task in tasks:
+                task.cancel()
+
+        raise first_error
+
+def with_resilience(llm: Runnable, policy: Optional[ResiliencePolicy] = None, name: str = "llm", limiter: Optional[AdaptiveLimiter] = None) -> ResilientLLM:
+    """Wrap an LLM client from the classes above with the resilience layer (policy from the environment by default)."""
+    return ResilientLLM(llm, policy or ResiliencePolicy.from_env(), name=name, limiter=limiter)
+
+def get_llm_attempts() -> list:
+    """LLM attempts recorded so far in the current latency_budget() scope."""
+    return list(_request_attempts.get() or [])
+
+
+# ---------------------------------------------------------------------------
+# Model routing: which provider and model serves each agent role.
+# ---------------------------------------------------------------------------
+
+LLM_PROVIDERS = {
+    "openai": OpenAILLMs,
+    "google": GoogleAILLMs,
+    "azure": AzureLLMs,
+    "ollama": OllamaLLMs,
+    "fake": FakeLLMs,
+}
+
+# Default route of each role: "provider" or "provider:model" (without a model, the provider's model environment variable is used).
+# Override a role with the LLM_ROUTE_<ROLE> environment variable, e.g. LLM_ROUTE_SUMMARISER=openai:gpt-4o-mini
+LLM_ROUTES = {
+    "tutor": "openai",
+    "summariser": "openai",
+    "style_analyser": "openai",
+    "student": "openai",
+}
+
+# Sampling temperature of each role
+LLM_ROLE_TEMPERATURES = {
+    "tutor": 0,
+    "summariser": 0,
+    "style_analyser": 0,
+    "student": 0.75,
+}
+
+_llm_clients: dict = {}
+
+def get_route(role: str, routes: Optional[dict] = None) -> str:
+    """Route of a role, in order of precedence: the given routes, LLM_ROUTE_<ROLE>, LLM_ROUTES."""
+    if routes and role in routes:
+        return routes[role]
+    if role not in LLM_ROUTES:
+        raise ValueError(f"Unknown LLM role: {role}")
+    return os.environ.get(f"LLM_ROUTE_{role.upper()}") or LLM_ROUTES[role]
+
+def get_llm(role: str, routes: Optional[dict] = None, resilience: Optional[ResiliencePolicy] = None) -> ResilientLLM:
+    """
+    LLM client of an agent role, wrapped with the resilience layer.
+    Clients are shared between the roles routed to the same provider, model and temperature, so they also share their connection pool.
+    With LLM_CASSETTE set, the client calls are recorded to or replayed from the cassette (see utils/cassette.py).
+    With LLM_LIMITER set, the requests to each provider and model go through a shared AdaptiveLimiter. Providers with a
+    limiter_policy() (the local inference server) always do, limited to what the server runs at once.
+    """
+    provider, _, model = get_route(role, routes).partition(":")
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}' for role {role}")
+    temperature = LLM_ROLE_TEMPERATURES.get(role, 0)
+
+    key = (provider, model, temperature)
+    if key not in _llm_clients:
+        _llm_clients[key] = LLM_PROVIDERS[provider](temperature=temperature, model=model or None).get_llm()
+    llm = _llm_clients[key]
+    cassette = get_cassette()
+    if cassette is not None:
+        llm = CassetteLLM(llm, cassette, client=f"{provider}:{model}:{temperature}")
+    limiter_policy = getattr(LLM_PROVIDERS[provider], "limiter_policy", None)
+    limiter = None
+    if limiter_enabled() or limiter_policy is not None:
+        limiter = get_limiter(f"{provider}:{model}", limiter_policy() if limiter_policy is not None else None)
+    return with_resilience(llm, resilience, name=role, limiter=limiter)
+
+_embedding_clients: dict = {}
+
+def get_embedding(provider: Optional[str] = None):
+    """Embedding client of a provider (default: EMBEDDING_PROVIDER, else openai), shared between callers."""
+    provider = provider or os.environ.get("EMBEDDING_PROVIDER") or "openai"
+    if provider not in LLM_PROVIDERS or not hasattr(LLM_PROVIDERS[provider], "get_embedding"):
+        raise ValueError(f"No embedding client for provider '{provider}'")
+    if provider not in _embedding_clients:
+        _embedding_clients[provider] = LLM_PROVIDERS[provider]().get_embedding()
+    return _embedding_clients[provider]
+
+def request_timeout_kwargs(llm: Runnable, deadline: Optional[float]) -> dict:
+    """
+    Call arguments cutting off the HTTP request of an LLM client at the deadline (time.monotonic()), so the request
+    does not outlive the attempt. Empty without a deadline or for the clients without a request timeout (the fake).
+    """
+    if deadline is None:
+        return {}
+    client = llm
+    while isinstance(client, (ResilientLLM, CassetteLLM)):
+        client = client.llm
+    bound = getattr(client, "first", client)
+    bound = getattr(bound, "bound", bound)
+    if not isinstance(bound, (ChatOpenAI, AzureChatOpenAI, ChatGoogleGenerativeAI)):
+        return {}
+    return {"timeout": max(0.001, deadline - time.monotonic())}
+
+def output_limit_kwargs(llm: Runnable, max_tokens: int) -> dict:
+    """Call arguments limiting the output of an LLM client to max_tokens, named as its provider expects."""
+    client = llm
+    while isinstance(client, (ResilientLLM, CassetteLLM)):
+        client = client.llm
+    if isinstance(client, ChatGoogleGenerativeAI):
+        return {"generation_config": {"max_output_tokens": max_tokens}}
+    return {"max_tokens": max_tokens}
+
+def preload_local_models(routes: Iterable[Optional[dict]] = (None,)) -> list[str]:
+    """
+    Load the models of the roles routed to the local inference server ('ollama'), so the first request does not wait
+    for the model to load. Each of routes is a routing table as passed to get_llm(). Returns the preloaded routes.
+    """
+    preloaded = []
+    for role_routes in routes:
+        for role in LLM_ROUTES:
+            route = get_route(role, role_routes)
+            provider, _, model = route.partition(":")
+            if provider == "ollama" and route not in preloaded:
+                OllamaLLMs(model=model or None).preload()
+                preloaded.append(route)
+    return preloaded
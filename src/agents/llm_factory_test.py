@@ -0,0 +1,304 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+try:
+    from .llm_factory import ResiliencePolicy, ResilientLLM, get_llm, get_route, latency_budget, \
+        AdaptiveLimiter, FileLimiterState, LimiterPolicy, OllamaLLMs, OpenAILLMs, output_limit_kwargs, preload_local_models, request_timeout_kwargs
+    from .utils.fake_llm import FakeChatModel, FakeInferenceServer, FakeProviderError
+except ImportError:
+    from src.agents.llm_factory import ResiliencePolicy, ResilientLLM, get_llm, get_route, latency_budget, \
+        AdaptiveLimiter, FileLimiterState, LimiterPolicy, OllamaLLMs, OpenAILLMs, output_limit_kwargs, preload_local_models, request_timeout_kwargs
+    from src.agents.utils.fake_llm import FakeChatModel, FakeInferenceServer, FakeProviderError
+
+class TestResilientLLM(unittest.TestCase):
+    """
+    TestCase Class used to test the resilience layer around the LLM clients.
+    ---
+    A local fake provider injects latency and errors, no network is used.
+    """
+
+    def test_retries_until_success(self):
+        fake = FakeChatModel(error_rate=0.5, seed=3)
+        llm = ResilientLLM(fake, ResiliencePolicy(max_attempts=10, backoff_base=0.0, attempt_timeout=None))
+
+        with latency_budget() as attempts:
+            response = llm.invoke("Hello")
+
+        self.assertEqual(response.content, fake.response)
+        self.assertEqual(attempts[-1]["outcome"], "ok")
+        self.assertEqual(len(attempts), fake.calls)
+        self.assertEqual(response.response_metadata["attempts"], attempts)
+
+    def test_client_errors_are_not_retried(self):
+        fake = FakeChatModel(error_rate=1.0, error_status_code=400)
+        llm = ResilientLLM(fake, ResiliencePolicy(max_attempts=3, backoff_base=0.0))
+
+        with self.assertRaises(FakeProviderError):
+            llm.invoke("Hello")
+
+        self.assertEqual(fake.calls, 1)
+
+    def test_attempt_timeout(self):
+        fake = FakeChatModel(latency=0.5)
+        llm = ResilientLLM(fake, ResiliencePolicy(attempt_timeout=0.05, max_attempts=2, backoff_base=0.0))
+
+        with latency_budget() as attempts:
+            with self.assertRaises(TimeoutError):
+                llm.invoke("Hello")
+
+        self.assertEqual([a["outcome"] for a in attempts], ["timeout", "timeout"])
+
+    def test_latency_budget_caps_the_call(self):
+        fake = FakeChatModel(latency=1.0)
+        llm = ResilientLLM(fake, ResiliencePolicy(attempt_timeout=30, max_attempts=5, backoff_base=0.0))
+
+        start_time = time.monotonic()
+        with latency_budget(0.1):
+            with self.assertRaises(TimeoutError) as cm:
+                llm.invoke("Hello")
+
+        self.assertLess(time.monotonic() - start_time, 0.5)
+        self.assertIn("latency budget", str(cm.exception))
+
+    def test_hedged_request_beats_slow_primary(self):
+        # with this seed the first request is slow and the hedged duplicate is fast
+        fake = FakeChatModel(slow_rate=0.5, slow_latency=1.0, latency=0.01, seed=1)
+        llm = ResilientLLM(fake, ResiliencePolicy(hedge=True, hedge_after=0.05, attempt_timeout=5))
+
+        start_time = time.monotonic()
+        with latency_budget() as attempts:
+            llm.invoke("Hello")
+
+        self.assertLess(time.monotonic() - start_time, 0.5)
+        self.assertTrue(any(a["hedged"] and a["outcome"] == "ok" for a in attempts))
+
+    def test_timed_out_request_is_cut_off(self):
+        with FakeInferenceServer(latency=1.0) as server, mock.patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            client = OllamaLLMs(model="stand-in").get_llm()
+            llm = ResilientLLM(client, ResiliencePolicy(attempt_timeout=0.2, max_attempts=1))
+            finished = threading.Event()
+            call = llm._call
+
+            def tracked_call(*args, **kwargs):
+                try:
+                    return call(*args, **kwargs)
+                finally:
+                    finished.set()
+
+            with mock.patch.object(llm, "_call", tracked_call):
+                with self.assertRaises(TimeoutError):
+                    llm.invoke("Hello")
+                # the request in the executor thread ends at the deadline, not when the server answers
+                self.assertTrue(finished.wait(0.5))
+            # and the client does not send it again
+            self.assertEqual(server.requests, 1)
+
+        self.assertIn("timeout", request_timeout_kwargs(client.with_structured_output({"title": "Reply", "type": "object", "properties": {}}), time.monotonic() + 1))
+        self.assertEqual(request_timeout_kwargs(FakeChatModel(), time.monotonic() + 1), {})
+        self.assertEqual(request_timeout_kwargs(client, None), {})
+
+    def test_retries_are_owned_by_the_resilience_layer(self):
+        # each attempt is a single HTTP request: the provider SDKs do not retry within it
+        with FakeInferenceServer(error_rate=1.0) as server, mock.patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            llm = ResilientLLM(OllamaLLMs(model="stand-in").get_llm(), ResiliencePolicy(max_attempts=3, backoff_base=0.0))
+            with latency_budget() as attempts:
+                with self.assertRaises(Exception) as cm:
+                    llm.invoke("Hello")
+
+        self.assertEqual(getattr(cm.exception, "status_code", None), 503)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(server.requests, 3)
+
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "stand-in", "OPENAI_MODEL": "stand-in"}):
+            self.assertEqual(OpenAILLMs().get_llm().root_client.max_retries, 0)
+
+    def test_async_retries_and_timeout(self):
+        fake = FakeChatModel(error_rate=0.5, seed=3)
+        llm = ResilientLLM(fake, ResiliencePolicy(max_attempts=10, backoff_base=0.0))
+
+        async def run():
+            with latency_budget() as attempts:
+                response = await llm.ainvoke("Hello")
+            return response, attempts
+
+        response, attempts = asyncio.run(run())
+        self.assertEqual(response.content, fake.response)
+        self.assertEqual(len(attempts), fake.calls)
+
+        slow = ResilientLLM(FakeChatModel(latency=1.0), ResiliencePolicy(attempt_timeout=0.05, max_attempts=1))
+        with self.assertRaises(TimeoutError):
+            asyncio.run(slow.ainvoke("Hello"))
+
+class TestModelRouting(unittest.TestCase):
+    """
+    TestCase Class used to test the per-role model routing.
+    """
+
+    def test_routes_override_the_default(self):
+        llm = get_llm("summariser", routes={"summariser": "fake:0.01"})
+
+        self.assertIsInstance(llm, ResilientLLM)
+        self.assertIsInstance(llm.llm, FakeChatModel)
+        self.assertEqual(llm.llm.latency, 0.01)
+
+    def test_environment_override(self):
+        with mock.patch.dict(os.environ, {"LLM_ROUTE_STYLE_ANALYSER": "fake:0.02"}):
+            self.assertEqual(get_route("style_analyser"), "fake:0.02")
+
+    def test_same_route_shares_the_client(self):
+        routes = {"summariser": "fake:0.03", "style_analyser": "fake:0.03"}
+
+        self.assertIs(get_llm("summariser", routes).llm, get_llm("style_analyser", routes).llm)
+
+    def test_unknown_role(self):
+        with self.assertRaises(ValueError):
+            get_llm("grader")
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    """
+    TestCase Class used to test the adaptive concurrency and token-rate limiter.
+    ---
+    The fake provider enforces quotas and answers 429 when they are exceeded, as the real providers do.
+    """
+
+    def run_concurrently(self, llm: ResilientLLM, nr_requests: int, message: str = "Hello") -> list:
+        with ThreadPoolExecutor(max_workers=nr_requests) as executor:
+            return list(executor.map(lambda _: llm.invoke(message).content, range(nr_requests)))
+
+    def test_concurrency_limit_adapts_to_rate_limits(self):
+        fake = FakeChatModel(latency=0.05, max_concurrency=4)
+        limiter = AdaptiveLimiter("fake", LimiterPolicy(initial_limit=16, cooldown=0.0))
+        llm = ResilientLLM(fake, ResiliencePolicy(attempt_timeout=None, max_attempts=20, backoff_base=0.01), limiter=limiter)
+
+        responses = self.run_concurrently(llm, 32)
+
+        self.assertEqual(responses, [fake.response] * 32)
+        self.assertGreater(limiter.rate_limited, 0)
+        self.assertLessEqual(limiter.limit, 8)
+
+    def test_limit_adapts_to_provider_rate_limits(self):
+        # the 429s of the provider API reach the limiter through the real client
+        with FakeInferenceServer(parallel=8, latency=0.05, max_concurrency=4) as server, mock.patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            limiter = AdaptiveLimiter("stand-in", LimiterPolicy(initial_limit=16, cooldown=0.0))
+            llm = ResilientLLM(OllamaLLMs(model="stand-in").get_llm(), ResiliencePolicy(attempt_timeout=None, max_attempts=20, backoff_base=0.01), limiter=limiter)
+
+            responses = self.run_concurrently(llm, 32)
+
+        self.assertEqual(responses, [server.response] * 32)
+        self.assertGreater(server.rate_limited, 0)
+        self.assertEqual(limiter.rate_limited, server.rate_limited)
+        self.assertLessEqual(limiter.limit, 8)
+
+    def test_limit_grows_on_success(self):
+        limiter = AdaptiveLimiter("fake", LimiterPolicy(initial_limit=2, max_limit=4))
+        llm = ResilientLLM(FakeChatModel(), ResiliencePolicy(attempt_timeout=None), limiter=limiter)
+
+        for _ in range(20):
+            llm.invoke("Hello")
+
+        self.assertEqual(limiter.limit, 4)
+
+    def test_token_rate_stays_within_the_quota(self):
+        message = "x" * 800  # 200 tokens
+        # at most burst + 1s of refill = 1000 tokens in any 1s window
+        limiter = AdaptiveLimiter("fake", LimiterPolicy(tokens_per_minute=30000, token_burst=500, output_tokens_estimate=0))
+        fake = FakeChatModel(token_quota=1000, quota_window=1.0)
+        llm = ResilientLLM(fake, ResiliencePolicy(attempt_timeout=None, max_attempts=1), limiter=limiter)
+
+        self.run_concurrently(llm, 8, message)
+
+        self.assertEqual(fake.rate_limited, 0)
+
+        unlimited = FakeChatModel(token_quota=1000, quota_window=1.0)
+        with self.assertRaises(FakeProviderError):
+            self.run_concurrently(ResilientLLM(unlimited, ResiliencePolicy(attempt_timeout=None, max_attempts=1)), 8, message)
+
+    def test_workers_share_the_lock_file(self):
+        path = os.path.join(tempfile.mkdtemp(), "fake.limiter.json")
+        policy = LimiterPolicy(initial_limit=2, max_limit=2, decrease=0.5, cooldown=0.0)
+        worker_a = AdaptiveLimiter("fake", policy, FileLimiterState(path))
+        worker_b = AdaptiveLimiter("fake", policy, FileLimiterState(path))
+
+        tokens = [worker_a.acquire("Hello"), worker_a.acquire("Hello")]
+        with self.assertRaises(TimeoutError):
+            worker_b.acquire("Hello", deadline=time.monotonic() + 0.05)
+
+        worker_a.release(tokens[0], 0.1, FakeProviderError("Rate limit exceeded", 429))
+        self.assertEqual(worker_b.limit, 1)
+        with self.assertRaises(TimeoutError):
+            worker_b.acquire("Hello", deadline=time.monotonic() + 0.05)
+
+        worker_a.release(tokens[1], 0.1)
+        worker_b.acquire("Hello", deadline=time.monotonic() + 0.05)
+
+    def test_async_acquire_does_not_block_the_event_loop(self):
+        import fcntl
+
+        path = os.path.join(tempfile.mkdtemp(), "fake.limiter.json")
+        limiter = AdaptiveLimiter("fake", LimiterPolicy(initial_limit=1, max_limit=1), FileLimiterState(path))
+        llm = ResilientLLM(FakeChatModel(), ResiliencePolicy(attempt_timeout=None), limiter=limiter)
+
+        async def run() -> int:
+            ticks = 0
+            call = asyncio.ensure_future(llm.ainvoke("Hello"))
+            while not call.done():
+                await asyncio.sleep(0.01)
+                ticks += 1
+            await call
+            return ticks
+
+        # another worker holds the lock file for 0.3s
+        with open(path, "a+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            threading.Timer(0.3, fcntl.flock, (file, fcntl.LOCK_UN)).start()
+            ticks = asyncio.run(run())
+
+        self.assertGreater(ticks, 10)
+        self.assertEqual(limiter.limit, 1)
+        limiter.acquire("Hello", deadline=time.monotonic() + 0.05)
+
+class TestLocalInferenceServer(unittest.TestCase):
+    """
+    TestCase Class used to test the 'ollama' provider of the on-prem nodes.
+    ---
+    A local stand-in server speaks the OpenAI-compatible API, no model is downloaded.
+    """
+
+    def test_chat_over_persistent_connections(self):
+        with FakeInferenceServer(parallel=2, latency=0.05) as server, \
+                mock.patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url, "OLLAMA_NUM_PARALLEL": "2", "OLLAMA_QUEUE_DEPTH": "0", "OLLAMA_KEEP_ALIVE": "-1"}):
+            llm = get_llm("tutor", {"tutor": "ollama:test-chat"})
+
+            self.assertEqual(llm.invoke("Hello").content, server.response)
+            self.assertEqual(llm.invoke("Hello").content, server.response)
+            self.assertEqual(server.connections, 1)
+            # the value is sent; whether the model stays loaded is up to the server (Ollama ignores it on /v1)
+            self.assertEqual(server.keep_alive, -1)
+
+            cut_off = llm.invoke("Hello", **output_limit_kwargs(llm, 3))
+            self.assertEqual(cut_off.content, " ".join(server.response.split()[:3]))
+            self.assertEqual(cut_off.response_metadata["finish_reason"], "length")
+
+            # the requests are limited to the parallel slots of the server
+            self.assertEqual(llm.limiter.limit, 2)
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                list(executor.map(lambda _: llm.invoke("Hello"), range(6)))
+            self.assertEqual(server.peak_concurrency, 2)
+            self.assertLessEqual(server.connections, 2)
+
+    def test_preload(self):
+        with FakeInferenceServer(load_latency=0.3) as server, mock.patch.dict(os.environ, {"OLLAMA_BASE_URL": server.url}):
+            routes = {"tutor": "ollama:test-preload", "summariser": "ollama:test-preload"}
+            self.assertEqual(preload_local_models([routes]), ["ollama:test-preload"])
+            self.assertEqual(server.preloads, 1)
+            self.assertEqual(server.keep_alive, "30m")
+
+            start_time = time.perf_counter()
+            get_llm("tutor", routes).invoke("Hello")
+            self.assertLess(time.perf_counter() - start_time, 0.3)
@@ -1,11 +1,13 @@
+import os
+
 try:
-    from ..llm_factory import OpenAILLMs
+    from ..llm_factory import get_llm
     from .student_prompts import \
         base_student_persona, curious_student_persona, contradicting_student_persona, reliant_student_persona, confused_student_persona, unrelated_student_persona, \
         process_prompt
     from ..utils.types import InvokeAgentResponseType
 except ImportError:
-    from src.agents.llm_factory import OpenAILLMs
+    from src.agents.llm_factory import get_llm
     from src.agents.student_agent.student_prompts import \
         base_student_persona, curious_student_persona, contradicting_student_persona, reliant_student_persona, confused_student_persona, unrelated_student_persona, \
         process_prompt
@@ -25,6 +27,7 @@ Student agent for synthetic evaluation of the other LLM tutors. This agent is de
 This agent is designed to:
 - [role_prompt]             role of a student to ask questions on the topic  
 - [student_type]            student's learning profile and comprehension level [many profiles can be chosen from the student_prompts.py]
+- [history_window]          only the latest messages are sent to the LLM (STUDENT_HISTORY_WINDOW, 0 for all), the earlier ones are covered by the tutor's summary
 """
 
 ValidMessageTypes: TypeAlias = SystemMessage | HumanMessage | AIMessage
@@ -35,12 +38,12 @@ class State(TypedDict):
     summary: str
 
 class StudentAgent:
-    def __init__(self, student_type: str):
-        llm = OpenAILLMs(temperature=0.75)
-        self.llm = llm.get_llm()
+    def __init__(self, student_type: str, routes: dict | None = None):
+        self.llm = get_llm("student", routes)
         self.summary = ""
         self.conversationalStyle = ""
         self.type = student_type
+        self.history_window = int(os.environ.get("STUDENT_HISTORY_WINDOW", "10"))
 
         # Define Agent's specific Personas
         self.role_prompt = process_prompt
@@ -124,15 +127,18 @@ class StudentAgent:
     def pretty_response_value(self, event: dict) -> str:
         return event["messages"][-1].content
     
-def invoke_student_agent(query: str, conversation_history: list, summary: str, student_type:str, question_response_details: str, session_id: str) -> InvokeAgentResponseType:
+def invoke_student_agent(query: str, conversation_history: list, summary: str, student_type:str, question_response_details: str, session_id: str, routes: dict | None = None) -> InvokeAgentResponseType:
     """
     Call a base student agents that forms a basic conversation with the tutor agent.
     """
     print(f'in invoke_student_agent(), student_type: {student_type}')
-    agent = StudentAgent(student_type=student_type)
+    agent = StudentAgent(student_type=student_type, routes=routes)
+
+    # Bounded prompt in long conversations: the messages outside the window are covered by the summary
+    history_window = conversation_history[-agent.history_window:] if agent.history_window > 0 else conversation_history
 
     config = {"configurable": {"thread_id": session_id, "summary": summary, "question_response_details": question_response_details}}
-    response_events = agent.app.invoke({"messages": conversation_history + [AIMessage(content=query)]}, config=config, stream_mode="values") #updates
+    response_events = agent.app.invoke({"messages": history_window + [AIMessage(content=query)]}, config=config, stream_mode="values") #updates
     pretty_printed_response = agent.pretty_response_value(response_events) # get last event/ai answer in the response
 
     # Gather Metadata from the agent
@@ -0,0 +1,42 @@
+import os
+import unittest
+from unittest import mock
+
+try:
+    from .student_agent import StudentAgent, invoke_student_agent
+except ImportError:
+    from src.agents.student_agent.student_agent import StudentAgent, invoke_student_agent
+
+FAKE_ROUTES = {"student": "fake"}
+
+class TestStudentAgentHistoryWindow(unittest.TestCase):
+    """
+    TestCase Class used to test that the student prompt stays bounded in long conversations.
+    """
+
+    def sent_messages(self, nr_messages: int) -> list:
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(nr_messages)]
+        sent = []
+        with mock.patch.object(StudentAgent, "check_for_valid_messages", autospec=True, side_effect=lambda agent, messages: sent.append(messages) or messages):
+            invoke_student_agent("tutor question", history, "summary", "base", "", "window-test", FAKE_ROUTES)
+        return sent[0]
+
+    def test_long_history_is_windowed(self):
+        with mock.patch.dict(os.environ, {"STUDENT_HISTORY_WINDOW": "4"}):
+            messages = self.sent_messages(40)
+
+        # system prompt, the last 4 messages and the tutor question
+        self.assertEqual(len(messages), 6)
+        self.assertEqual(messages[1].content, "message 36")
+        self.assertEqual(messages[-1].content, "tutor question")
+        self.assertIn("summary", messages[0].content)
+
+    def test_window_disabled(self):
+        with mock.patch.dict(os.environ, {"STUDENT_HISTORY_WINDOW": "0"}):
+            messages = self.sent_messages(40)
+
+        self.assertEqual(len(messages), 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
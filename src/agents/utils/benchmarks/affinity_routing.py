@@ -0,0 +1,120 @@
+"""
+Throughput and cache locality of the chat workers behind the affinity router (router.py).
+---
+Conversations about a few questions are sent concurrently to:
+- 1 worker
+- N workers, round-robin dispatch
+- N workers, conversation and question affinity dispatch
+
+The tutor LLM is the offline fake provider with --latency seconds per call, and the response cache is
+enabled with the fake embedding, so a student message already answered for the question on the same
+worker is served without the LLM call. Round-robin spreads each question over all the workers' caches,
+the affinity dispatch keeps it on one worker (spilling over when it is saturated).
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.affinity_routing --workers 4 --conversations 160 --questions 32 --turns 4 --latency 1.0
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from ....router import AffinityRouter
+except ImportError:
+    from router import AffinityRouter
+
+STUDENT_MESSAGES = [
+    "How do I start?",
+    "Can I have a hint?",
+    "What is the first step?",
+    "Is my answer correct?",
+    "Can you explain the worked solution?",
+    "What formula should I use here?",
+]
+
+
+def conversation_requests(conversation: int, nr_questions: int, nr_turns: int, rng: random.Random) -> list[dict]:
+    """Handler events of the turns of a conversation (full history resent on every turn)."""
+    question_number = conversation % nr_questions
+    question = {
+        "questionTitle": f"Question {question_number}",
+        "questionContent": f"Benchmark question {question_number}.",
+        "parts": [{"publishedPartId": f"question-{question_number}-part-0", "publishedPartPosition": 0, "publishedPartContent": "Compute the result."}],
+    }
+    history, events = [], []
+    for _ in range(nr_turns):
+        message = rng.choice(STUDENT_MESSAGES)
+        history = history + [{"type": "user", "content": message}]
+        params = {
+            "conversation_id": f"benchmark-{conversation}",
+            "conversation_history": history,
+            "question_response_details": {"questionInformation": question, "questionAccessInformation": {"currentPart": {"id": f"question-{question_number}-part-0", "position": 0}}},
+        }
+        events.append({"body": json.dumps({"message": message, "params": params})})
+        history = history + [{"type": "ai", "content": "What do you think the first step should be?"}]
+    return events
+
+
+def run(router: AffinityRouter, conversations: list[list[dict]], concurrency: int) -> dict:
+    """Send the conversations concurrently, the turns of each conversation in order."""
+
+    def converse(events: list[dict]) -> list[float]:
+        latencies = []
+        for event in events:
+            start_time = time.perf_counter()
+            response = router.handle(event)
+            if response["statusCode"] != 200:
+                raise RuntimeError(f"Request failed: {response}")
+            latencies.append(time.perf_counter() - start_time)
+        return latencies
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(latency for result in pool.map(converse, conversations) for latency in result)
+    total_time = time.perf_counter() - start_time
+
+    return {
+        "throughput": len(latencies) / total_time,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        **router.stats(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--conversations", type=int, default=160)
+    parser.add_argument("--questions", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32, help="conversations in flight")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake tutor LLM latency in seconds")
+    parser.add_argument("--max-pending", type=int, default=16, help="requests in flight per worker")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # inherited by the worker processes
+    os.environ.update({
+        "LLM_ROUTE_TUTOR": f"fake:{args.latency}",
+        "LLM_ROUTE_SUMMARISER": f"fake:{args.latency}",
+        "LLM_ROUTE_STYLE_ANALYSER": f"fake:{args.latency}",
+        "EMBEDDING_PROVIDER": "fake",
+        "RESPONSE_CACHE": "true",
+        "RESPONSE_CACHE_MAX_TURNS": str(args.turns),
+        "RESPONSE_CACHE_THRESHOLD": "0.99",
+    })
+    rng = random.Random(args.seed)
+    conversations = [conversation_requests(conversation, args.questions, args.turns, rng) for conversation in range(args.conversations)]
+
+    print(f"{len(conversations) * args.turns} requests, {args.conversations} conversations about {args.questions} questions, fake LLM latency {args.latency}s")
+    print(f"{'setup':>22} | {'req/s':>7} {'p50 s':>6} {'p95 s':>6} | {'conv. locality':>14} {'question locality':>17} {'spill-overs':>11}")
+    for name, workers, policy in [("1 worker", 1, "affinity"), (f"{args.workers} workers round-robin", args.workers, "round_robin"), (f"{args.workers} workers affinity", args.workers, "affinity")]:
+        with AffinityRouter(workers, max_pending=args.max_pending, policy=policy) as router:
+            stats = run(router, conversations, args.concurrency)
+        print(f"{name:>22} | {stats['throughput']:>7.2f} {stats['p50']:>6.2f} {stats['p95']:>6.2f} | "
+              f"{stats['conversation_locality']:>14.2f} {stats['question_locality']:>17.2f} {stats['spill_overs']:>11}")
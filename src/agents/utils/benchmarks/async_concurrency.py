@@ -0,0 +1,66 @@
+"""
+Concurrency benchmark of the sync vs async agent invocation.
+The tutor and summarisation LLMs are replaced by a FakeChatModel with a fixed latency, so the
+benchmark measures how many conversations one process can serve while waiting on the LLM.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.async_concurrency --requests 200 --concurrency 100 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_MODEL", "benchmark")
+
+try:
+    from ...base_agent import base_agent
+    from ..fake_llm import FakeChatModel
+except ImportError:
+    from src.agents.base_agent import base_agent
+    from src.agents.utils.fake_llm import FakeChatModel
+
+
+def _history(turn: int) -> list:
+    return [{"type": "user", "content": f"How do I start part (a)? [{turn}]"}]
+
+def run_sync(nr_requests: int) -> float:
+    start_time = time.perf_counter()
+    for i in range(nr_requests):
+        base_agent.invoke_base_agent(f"q{i}", _history(i), "", "", "", f"sync-{i}")
+    return time.perf_counter() - start_time
+
+async def run_async(nr_requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await base_agent.ainvoke_base_agent(f"q{i}", _history(i), "", "", "", f"async-{i}")
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(nr_requests)))
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    parser.add_argument("--sync-requests", type=int, default=10, help="requests for the (slow) sequential baseline")
+    args = parser.parse_args()
+
+    base_agent.agent.llm = FakeChatModel(latency=args.latency)
+    base_agent.agent.summarisation_llm = FakeChatModel(latency=args.latency)
+    base_agent.agent.style_llm = FakeChatModel(latency=args.latency)
+
+    sync_time = run_sync(args.sync_requests)
+    async_time = asyncio.run(run_async(args.requests, args.concurrency))
+
+    sync_throughput = args.sync_requests / sync_time
+    async_throughput = args.requests / async_time
+    print(f"sync  handler path: {args.sync_requests} requests in {sync_time:.2f}s -> {sync_throughput:.1f} req/s")
+    print(f"async handler path: {args.requests} requests in {async_time:.2f}s (concurrency {args.concurrency}) -> {async_throughput:.1f} req/s")
+    print(f"throughput gain: x{async_throughput / sync_throughput:.1f}")
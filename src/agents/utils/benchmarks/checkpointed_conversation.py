@@ -0,0 +1,78 @@
+"""
+Request payload size and handling time across a long conversation, stateless vs checkpointed.
+- stateless:    the client resends the full conversation_history, summary and conversational_style on every turn
+- checkpointed: the agent restores the conversation from its checkpointer, the client only sends the latest message
+
+Both modes send the same question_response_details. The LLMs are replaced by the offline fake provider,
+so the handling time covers the request parsing, the graph and the state (de)serialisation.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.checkpointed_conversation --turns 40 --checkpointer sqlite:///tmp/checkpoints.db
+"""
+
+import argparse
+import json
+import time
+
+try:
+    from ...base_agent.base_agent import BaseAgent, invoke_base_agent
+    from ..checkpointers import get_checkpointer
+except ImportError:
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+    from src.agents.utils.checkpointers import get_checkpointer
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+
+def run_conversation(agent: BaseAgent, nr_turns: int, question_response_details: dict, checkpointed: bool) -> list[dict]:
+    conversation_history = []
+    summary = ""
+    conversational_style = ""
+    stats = []
+    for turn in range(nr_turns):
+        message = f"Student message {turn}: could you check my working for this part of the question?"
+        params = {"conversation_id": f"benchmark-{'checkpointed' if checkpointed else 'stateless'}", "question_response_details": question_response_details}
+        if not checkpointed:
+            conversation_history.append({"type": "user", "content": message})
+            params.update({"conversation_history": conversation_history, "summary": summary, "conversational_style": conversational_style})
+        body = json.dumps({"message": message, "params": params})
+
+        start_time = time.perf_counter()
+        request = json.loads(body)
+        response = invoke_base_agent(
+            query=request["message"],
+            conversation_history=request["params"].get("conversation_history", []),
+            summary=request["params"].get("summary", ""),
+            conversationalStyle=request["params"].get("conversational_style", ""),
+            question_response_details="",
+            session_id=request["params"]["conversation_id"],
+            base_agent=agent,
+        )
+        elapsed = time.perf_counter() - start_time
+
+        if not checkpointed:
+            conversation_history.append({"type": "ai", "content": response["output"]})
+            summary, conversational_style = response["intermediate_steps"][0], response["intermediate_steps"][1]
+        stats.append({"turn": turn + 1, "payload_bytes": len(body.encode("utf-8")), "time": elapsed})
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--checkpointer", default="memory", help="checkpointer URL, see checkpointers.py")
+    parser.add_argument("--input", default="src/agents/utils/example_inputs/example_input_1.json")
+    args = parser.parse_args()
+
+    with open(args.input, "r") as file:
+        question_response_details = json.load(file)["params"].get("question_response_details", {})
+
+    stateless = run_conversation(BaseAgent(routes=FAKE_ROUTES), args.turns, question_response_details, checkpointed=False)
+    checkpointed = run_conversation(BaseAgent(routes=FAKE_ROUTES, checkpointer=get_checkpointer(args.checkpointer)), args.turns, question_response_details, checkpointed=True)
+
+    print(f"{'turn':>5} | {'stateless bytes':>15} {'ms':>7} | {'checkpointed bytes':>18} {'ms':>7}")
+    for a, b in zip(stateless, checkpointed):
+        if a["turn"] == 1 or a["turn"] % 10 == 0:
+            print(f"{a['turn']:>5} | {a['payload_bytes']:>15} {a['time'] * 1000:>7.2f} | {b['payload_bytes']:>18} {b['time'] * 1000:>7.2f}")
+    print(f"total | {sum(s['payload_bytes'] for s in stateless):>15} {sum(s['time'] for s in stateless) * 1000:>7.1f} | "
+          f"{sum(s['payload_bytes'] for s in checkpointed):>18} {sum(s['time'] for s in checkpointed) * 1000:>7.1f}")
@@ -0,0 +1,114 @@
+"""
+Cold vs warm first-request latency of the chat function container, run locally with the Lambda RIE.
+- cold: WARM_UP=false, the first request pays the lazy imports, first graph run and tokenizer loading
+- warm: WARM_UP=true, these costs move to the init phase (and would be captured by a SnapStart snapshot)
+
+Each run starts a fresh container, times the first request and a few follow-up requests, and reads the
+init and invocation durations from the RIE REPORT log lines. The LLM roles are routed to the offline
+fake provider by default, so only the function's own overhead is measured.
+
+Build the image first, then run from the repository root:
+$ docker build -t llm_chat .
+$ python -m src.agents.utils.benchmarks.cold_start --image llm_chat --runs 5
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+MODES = {"cold": "false", "warm": "true"}
+FAKE_ROUTES = {"LLM_ROUTE_TUTOR": "fake", "LLM_ROUTE_SUMMARISER": "fake", "LLM_ROUTE_STYLE_ANALYSER": "fake"}
+INVOCATION_PATH = "/2015-03-31/functions/function/invocations"
+REPORT_PATTERN = re.compile(r"REPORT RequestId: \S+\s+(?:Init Duration: (?P<init>[\d.]+) ms\s+)?Duration: (?P<duration>[\d.]+) ms")
+
+EVENT = {
+    "message": "Hi, how do I start?",
+    "params": {"conversation_id": "cold-start", "conversation_history": [{"type": "user", "content": "Hi, how do I start?"}]},
+}
+
+
+def invoke(url: str, timeout: float = 120) -> float:
+    request = urllib.request.Request(url, data=json.dumps(EVENT).encode("utf-8"), headers={"Content-Type": "application/json"})
+    start_time = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+    return time.perf_counter() - start_time
+
+def wait_for_container(url: str, timeout: float = 60) -> None:
+    """The RIE accepts connections before the function is initialised, wait until its port answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url.replace(INVOCATION_PATH, "/"), timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise TimeoutError(f"Container not reachable at {url}")
+
+def run(image: str, port: int, warm_up: str, follow_up_requests: int, environment: dict) -> dict:
+    command = ["docker", "run", "-d", "--rm", "-p", f"{port}:8080", "-e", f"WARM_UP={warm_up}"]
+    for key, value in environment.items():
+        command += ["-e", f"{key}={value}"]
+    container = subprocess.run(command + [image], check=True, capture_output=True, text=True).stdout.strip()
+    url = f"http://localhost:{port}{INVOCATION_PATH}"
+    try:
+        wait_for_container(url)
+        first_request = invoke(url)
+        follow_ups = [invoke(url) for _ in range(follow_up_requests)]
+        logs = subprocess.run(["docker", "logs", container], capture_output=True, text=True)
+    finally:
+        subprocess.run(["docker", "stop", container], capture_output=True)
+
+    reports = [match.groupdict() for match in REPORT_PATTERN.finditer(logs.stdout + logs.stderr)]
+    return {
+        "first_request": first_request,
+        "follow_up_mean": statistics.mean(follow_ups) if follow_ups else None,
+        "init_duration": float(reports[0]["init"]) / 1000 if reports and reports[0]["init"] else None,
+        "first_invocation_duration": float(reports[0]["duration"]) / 1000 if reports else None,
+    }
+
+def summary(values: list) -> str:
+    values = [v for v in values if v is not None]
+    return f"{statistics.mean(values) * 1000:8.1f}ms" if values else "     n/a"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", default="llm_chat")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--runs", type=int, default=5, help="fresh containers per mode")
+    parser.add_argument("--follow-up-requests", type=int, default=3)
+    parser.add_argument("--real-llm", action="store_true", help="use the configured LLM routes instead of the fake provider (needs the API keys in --env-file)")
+    parser.add_argument("--env-file", help="dotenv file whose variables are passed to the container")
+    parser.add_argument("--output", help="JSON file for the per-run results")
+    args = parser.parse_args()
+
+    environment = {} if args.real_llm else dict(FAKE_ROUTES)
+    if args.env_file:
+        with open(args.env_file) as file:
+            for line in file:
+                key, sep, value = line.strip().partition("=")
+                if sep and not key.startswith("#"):
+                    environment.setdefault(key, value.strip('"'))
+
+    results = {mode: [] for mode in MODES}
+    for i in range(args.runs):
+        for mode, warm_up in MODES.items():
+            results[mode].append(run(args.image, args.port, warm_up, args.follow_up_requests, environment))
+            print(f"run {i + 1} {mode}: {results[mode][-1]}")
+
+    print(f"{'':>5}  {'first req':>10}  {'follow-up':>10}  {'init':>10}  {'1st invoke':>10}")
+    for mode, runs in results.items():
+        print(f"{mode:>5}  {summary([r['first_request'] for r in runs])}  {summary([r['follow_up_mean'] for r in runs])}  "
+              f"{summary([r['init_duration'] for r in runs])}  {summary([r['first_invocation_duration'] for r in runs])}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,114 @@
+"""
+Throughput and latency of the tutor LLM on a local inference server (the 'ollama' provider of the on-prem nodes).
+- first request with and without preloading the model (preload_local_models(), run by the warm-up)
+- requests limited to the server's parallel slots and queue (the provider's limiter, OLLAMA_QUEUE_DEPTH) against an
+  unlimited client, per client concurrency: throughput, p50/p95 latency and the TCP connections the server accepted
+
+By default the requests go to a local OpenAI-compatible stand-in server (FakeInferenceServer) with the given parallel
+slots, model load time and generation speed. Pass --base-url to benchmark a running server instead (Ollama, llama.cpp, vLLM),
+the server counters are then not reported.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.local_model --parallel 4 --queue-depth 4 --concurrency 1 4 8 16 --requests 48
+$ python -m src.agents.utils.benchmarks.local_model --base-url http://localhost:11434 --model llama3.1:8b --parallel 4
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+try:
+    from ...llm_factory import OllamaLLMs, get_llm, preload_local_models, with_resilience
+    from ..fake_llm import FakeInferenceServer
+except ImportError:
+    from src.agents.llm_factory import OllamaLLMs, get_llm, preload_local_models, with_resilience
+    from src.agents.utils.fake_llm import FakeInferenceServer
+
+QUESTION = "How do I find the dot product of two vectors?"
+
+
+def stand_in(args: argparse.Namespace):
+    if args.base_url:
+        return nullcontext(None)
+    return FakeInferenceServer(parallel=args.parallel, load_latency=args.load_latency, latency=args.latency, tokens_per_second=args.tokens_per_second)
+
+def first_request(args: argparse.Namespace, preload: bool) -> tuple[float, float]:
+    """Seconds of the preload (0 without) and of the first request on a fresh server."""
+    with stand_in(args) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url if server else args.base_url
+        route = f"ollama:{args.model}"
+        preload_time = 0.0
+        if preload:
+            start_time = time.perf_counter()
+            preload_local_models([{"tutor": route}])
+            preload_time = time.perf_counter() - start_time
+        # a client of its own, not shared with the other runs
+        llm = with_resilience(OllamaLLMs(model=args.model).get_llm())
+        start_time = time.perf_counter()
+        llm.invoke(QUESTION)
+        return preload_time, time.perf_counter() - start_time
+
+def run(args: argparse.Namespace, concurrency: int, limited: bool) -> dict:
+    with stand_in(args) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url if server else args.base_url
+        # a model name per run, so each run has its own client, connection pool and limiter
+        model = args.model if args.base_url else f"{args.model}-{concurrency}-{limited}"
+        if limited:
+            llm = get_llm("tutor", {"tutor": f"ollama:{model}"})
+        else:
+            llm = with_resilience(OllamaLLMs(model=model).get_llm())
+        llm.invoke(QUESTION)
+        connections = server.connections if server else None
+
+        def call(_) -> float:
+            start_time = time.perf_counter()
+            llm.invoke(QUESTION)
+            return time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(call, range(args.requests)))
+        total_time = time.perf_counter() - start_time
+
+    return {
+        "throughput": args.requests / total_time,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "connections": None if server is None else server.connections - connections,
+    }
+
+def report(name: str, stats: dict) -> None:
+    connections = "" if stats["connections"] is None else f", {stats['connections']} new connections"
+    print(f"{name:>24}: {stats['throughput']:.2f} req/s, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s{connections}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="running local inference server (default: the stand-in server)")
+    parser.add_argument("--model", default="stand-in")
+    parser.add_argument("--parallel", type=int, default=4, help="parallel slots of the server (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--queue-depth", type=int, default=None, help="requests waiting in the server (OLLAMA_QUEUE_DEPTH, default: --parallel)")
+    parser.add_argument("--load-latency", type=float, default=2.0, help="stand-in: seconds to load the model")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in: seconds per request")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="stand-in: generation speed per slot")
+    parser.add_argument("--requests", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    os.environ["OLLAMA_NUM_PARALLEL"] = str(args.parallel)
+    if args.queue_depth is not None:
+        os.environ["OLLAMA_QUEUE_DEPTH"] = str(args.queue_depth)
+    os.environ.setdefault("OLLAMA_MODEL", args.model)
+
+    print("first request:")
+    for preload in (False, True):
+        preload_time, latency = first_request(args, preload)
+        print(f"{'preloaded' if preload else 'cold':>24}: {latency:.2f}s" + (f" (preload {preload_time:.2f}s at init)" if preload else ""))
+
+    for concurrency in args.concurrency:
+        print(f"concurrency {concurrency} ({args.requests} requests, {args.parallel} parallel slots):")
+        report("limited", run(args, concurrency, limited=True))
+        report("unlimited", run(args, concurrency, limited=False))
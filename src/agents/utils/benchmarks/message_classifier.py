@@ -0,0 +1,129 @@
+"""
+Precision and latency of the message pre-classifier (src/agents/utils/message_classifier.py).
+
+The labelled corpus is synthetic: greetings, acknowledgements, off-topic requests and tutoring messages
+(including near misses such as "hi, how do I start?" or an "ok" answering the tutor's question), asked
+about each question of the example inputs. For each label the precision (share of the fast-path answers
+that were right, the number that matters as a wrong fast path answers a real question with a template),
+the recall and the classification time per message are reported.
+
+With --conversations, the student messages of the synthetic conversations generated by
+synthetic_conversation_generation.py are classified too, reporting per student persona the share of the
+messages that would take the fast path, with examples to review.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.message_classifier [--conversations src/agents/utils/synthetic_conversations/]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from collections import Counter, defaultdict
+
+try:
+    from ..message_classifier import LABELS, classify_message
+except ImportError:
+    from src.agents.utils.message_classifier import LABELS, classify_message
+
+EXAMPLE_INPUTS = "src/agents/utils/example_inputs"
+TUTOR_QUESTION = [{"role": "assistant", "content": "What do you get when you multiply the first components?"}]
+TUTOR_STATEMENT = [{"role": "assistant", "content": "Exactly, that is the dot product."}]
+
+CORPUS = {
+    "greeting": ["hi", "Hi!", "hello", "hey there", "Hiii", "good morning", "Good evening!", "hello again", "hey", "howdy"],
+    "acknowledgement": ["ok", "okay thanks", "Thanks!", "thank you so much", "got it", "that makes sense", "cool, thanks", "perfect", "I see", "understood", "alright", "ty", "great thanks", "sounds good", "awesome"],
+    "off_topic": [
+        "tell me a joke", "what's the weather like today?", "who won the football last night", "what is your favourite movie",
+        "can you recommend a good netflix series", "what should I have for dinner", "write me a poem about cats", "how old are you?",
+        "do you like music", "what's your name", "I love playing minecraft", "any holiday plans?", "are you a human",
+        "my dog is so cute", "who is the best basketball player",
+    ],
+    "tutor": [
+        "hi, how do I start?", "hello, I don't understand part b", "thanks, but why do we square the components?", "ok so is the answer 5?",
+        "got it, what about the second part?", "How do I compute the {topic}?", "I don't understand the question.", "Can I have a hint?",
+        "what is the formula for the {topic}", "is my answer right?", "I got 12, is that correct?", "why is the angle 90 degrees",
+        "what does orthogonal mean", "can you explain the first step again", "I think I need to multiply them", "no",
+        "yes", "I'm confused", "where did the 2 come from?", "what is your favourite way to solve the {topic}?",
+        "write the {topic} step by step", "how long should this take me", "can we move to the next part", "I'm stuck",
+        "is this like a movie where the vectors move? I mean how do they change over time in {topic}",
+    ],
+}
+
+
+def labelled_corpus() -> list[tuple[str, str, list, dict]]:
+    """(label, message, history, question information) of every corpus message for every example question."""
+    corpus = []
+    for name in sorted(os.listdir(EXAMPLE_INPUTS)):
+        with open(os.path.join(EXAMPLE_INPUTS, name), "r") as file:
+            question_information = json.load(file)["params"]["question_response_details"]["questionInformation"]
+        topic = (question_information.get("questionTitle") or "question").lower()
+        for label, messages in CORPUS.items():
+            for message in messages:
+                corpus.append((label, message.format(topic=topic), TUTOR_STATEMENT, question_information))
+        # an acknowledgement answering a question of the tutor is a tutoring message
+        for message in ["ok", "yes ok", "sure", "got it"]:
+            corpus.append(("tutor", message, TUTOR_QUESTION, question_information))
+    return corpus
+
+def classify_timed(message: str, history: list, question_information: dict, repeat: int) -> tuple[str, float]:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        message_class = classify_message(message, history, question_information)
+    return message_class.label, (time.perf_counter() - start_time) / repeat
+
+def report_corpus(repeat: int) -> None:
+    predictions, timings = [], []
+    for label, message, history, question_information in labelled_corpus():
+        predicted, elapsed = classify_timed(message, history, question_information, repeat)
+        predictions.append((label, predicted, message))
+        timings.append(elapsed)
+
+    print(f"{'label':>16} {'messages':>9} {'predicted':>10} {'precision':>10} {'recall':>8}")
+    for label in LABELS:
+        actual = sum(1 for expected, _, _ in predictions if expected == label)
+        predicted = sum(1 for _, got, _ in predictions if got == label)
+        correct = sum(1 for expected, got, _ in predictions if expected == got == label)
+        precision = f"{correct / predicted:.3f}" if predicted else "n/a"
+        print(f"{label:>16} {actual:>9} {predicted:>10} {precision:>10} {correct / actual if actual else 0:>8.3f}")
+    errors = [(expected, got, message) for expected, got, message in predictions if expected != got]
+    for expected, got, message in errors[:10]:
+        print(f"  {expected} -> {got}: {message!r}")
+
+    timings.sort()
+    print(f"classification time: {statistics.median(timings) * 1e6:.1f}µs median, {timings[int(len(timings) * 0.99)] * 1e6:.1f}µs p99, {timings[-1] * 1e6:.1f}µs max")
+
+def report_conversations(folder: str) -> None:
+    per_persona: dict[str, Counter] = defaultdict(Counter)
+    examples: dict[str, list] = defaultdict(list)
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith("_conversation.json"):
+            continue
+        with open(os.path.join(folder, filename), "r") as file:
+            conversation = json.load(file)
+        persona = conversation.get("student_agent_type", "unknown")
+        history = conversation["conversation"]
+        for i, message in enumerate(history):
+            if message.get("role") == "user":
+                label = classify_message(message["content"], history[:i + 1]).label
+                per_persona[persona][label] += 1
+                if label != "tutor" and len(examples[persona]) < 3:
+                    examples[persona].append(f"{label}: {message['content'][:80]!r}")
+
+    for persona, counts in per_persona.items():
+        total = sum(counts.values())
+        print(f"{persona:>14}: {total} student messages, {1 - counts['tutor'] / total:.1%} fast path {dict(counts)}")
+        for example in examples[persona]:
+            print(f"{'':>16}{example}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", help="folder of synthetic conversations (*_conversation.json)")
+    parser.add_argument("--repeat", type=int, default=200, help="classifications per message for the timing")
+    args = parser.parse_args()
+
+    report_corpus(args.repeat)
+    if args.conversations:
+        report_conversations(args.conversations)
@@ -0,0 +1,79 @@
+"""
+Offline benchmark of the per-request handling of long conversation histories.
+- legacy:     the dict history is coerced by the add_messages reducer and the nodes filtered it again with the former
+              BaseAgent.check_for_valid_messages() (should_summarize, call_model and twice in summarize_conversation)
+- normalised: normalise_messages() converts, validates and assigns ids once, the nodes use the state messages as is
+
+Both pipelines run on the same histories; then the full base agent graph is timed with the stub LLM.
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.message_normalisation --messages 200 --requests 500
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+
+from langchain_core.messages import HumanMessage
+from langgraph.graph.message import add_messages
+
+try:
+    from ...base_agent.base_agent import BaseAgent, invoke_base_agent
+    from ..fake_llm import FakeChatModel
+    from ..message_normalisation import normalise_messages
+except ImportError:
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.utils.message_normalisation import normalise_messages
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+
+def history(nr_messages: int) -> list[dict]:
+    return [{"type": "user" if i % 2 == 0 else "ai", "content": f"message {i} " * 20} for i in range(nr_messages)]
+
+def check_for_valid_messages(messages: list) -> list:
+    """The former BaseAgent.check_for_valid_messages(): removing the RemoveMessage() from the list of messages."""
+    return [message for message in messages if message.type != 'remove']
+
+def legacy_pipeline(agent: BaseAgent, conversation: list[dict]) -> None:
+    messages = add_messages([], conversation)
+    check_for_valid_messages(messages)  # should_summarize
+    check_for_valid_messages(messages[:-1] + [HumanMessage(content="summary task")])  # summarize_conversation
+    check_for_valid_messages(messages[:-1] + [HumanMessage(content="style task")])
+    check_for_valid_messages([HumanMessage(content="system prompt")] + messages[-3:])  # call_model
+
+def normalised_pipeline(agent: BaseAgent, conversation: list[dict]) -> None:
+    messages = add_messages([], normalise_messages(conversation))
+    history = messages[:-1]
+    history + [HumanMessage(content="summary task")]
+    history + [HumanMessage(content="style task")]
+    [HumanMessage(content="system prompt")] + messages[-3:]
+
+def timed(function, requests: int) -> list[float]:
+    timings = []
+    for _ in range(requests):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200, help="messages in the conversation history")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=None)
+    agent.llm = FakeChatModel(response="tutor answer")
+    agent.summarisation_llm = FakeChatModel(response="summary")
+    agent.style_llm = FakeChatModel(response="style")
+    conversation = history(args.messages)
+
+    for name, pipeline in [("legacy", legacy_pipeline), ("normalised", normalised_pipeline)]:
+        timings = timed(lambda: pipeline(agent, conversation), args.requests)
+        print(f"{name:>10}: {statistics.mean(timings) * 1000:.3f}ms mean, {statistics.median(timings) * 1000:.3f}ms median message handling per request")
+
+    timings = timed(lambda: invoke_base_agent("next question", conversation, "", "", "", str(uuid.uuid4()), base_agent=agent), max(1, args.requests // 10))
+    print(f"full graph: {statistics.mean(timings) * 1000:.1f}ms mean per request with {args.messages} messages (stub LLM)")
@@ -0,0 +1,52 @@
+"""
+Recording and export cost of the metrics registry (src/agents/utils/metrics.py).
+- counter increment and histogram observation, with and without labels
+- EMF flush of one invocation's metrics (the handler's per-request cost)
+- Prometheus rendering of the registry
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.metrics_overhead --iterations 200000
+"""
+
+import argparse
+import time
+
+try:
+    from ..metrics import MetricsRegistry, TOKEN_BUCKETS
+except ImportError:
+    from src.agents.utils.metrics import MetricsRegistry, TOKEN_BUCKETS
+
+
+def per_call(function, iterations: int) -> float:
+    """Mean time per call in microseconds."""
+    start_time = time.perf_counter()
+    for index in range(iterations):
+        function(index)
+    return (time.perf_counter() - start_time) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", labels=("status_code",))
+    summarisations = registry.counter("summarisations")
+    latency = registry.histogram("request_latency")
+    prompt_tokens = registry.histogram("prompt_tokens", unit="Count", buckets=TOKEN_BUCKETS)
+
+    print(f"{'counter inc':>28}: {per_call(lambda i: summarisations.inc(), args.iterations):.3f} µs")
+    print(f"{'counter inc (labelled)':>28}: {per_call(lambda i: requests.inc(status_code=200), args.iterations):.3f} µs")
+    print(f"{'histogram observe':>28}: {per_call(lambda i: latency.observe(i % 3000), args.iterations):.3f} µs")
+    registry.emf_documents()
+
+    def invocation(index: int) -> None:
+        requests.inc(status_code=200)
+        latency.observe(index % 3000)
+        prompt_tokens.observe(index % 20000)
+        summarisations.inc()
+        registry.emf_documents()
+
+    print(f"{'invocation + EMF documents':>28}: {per_call(invocation, args.iterations // 10):.3f} µs")
+    print(f"{'prometheus text':>28}: {per_call(lambda i: registry.prometheus_text(), 1000):.3f} µs")
@@ -0,0 +1,61 @@
+"""
+Offline benchmark of the up-front validation of the chat requests.
+For each example input, times validate_chat_request() (the handler fast path) against the parsing of the
+question details into the tutor prompt (parse_json_to_prompt, the first step of the chat module), and
+reports the validation throughput of a single core. An invalid request is timed too, as it returns early.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.params_validation --requests 20000
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import time
+
+try:
+    from ..params_validation import validate_chat_request
+    from ..parse_json_context_to_prompt import parse_json_to_prompt
+except ImportError:
+    from src.agents.utils.params_validation import validate_chat_request
+    from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
+
+EXAMPLE_INPUTS = "src/agents/utils/example_inputs"
+
+
+def per_call(function, requests: int) -> float:
+    """Mean seconds per call over the requests."""
+    start_time = time.perf_counter()
+    for _ in range(requests):
+        function()
+    return (time.perf_counter() - start_time) / requests
+
+def parse(params: dict) -> str:
+    details = params.get("question_response_details", {})
+    return parse_json_to_prompt(details.get("questionSubmissionSummary", []), details.get("questionInformation", {}), details.get("questionAccessInformation", {}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    requests = {}
+    for name in sorted(os.listdir(EXAMPLE_INPUTS)):
+        with open(os.path.join(EXAMPLE_INPUTS, name), "r") as file:
+            requests[name] = json.load(file)
+    invalid = copy.deepcopy(requests[name])
+    invalid["params"]["conversation_history"].append({"type": "bot", "content": "?"})
+    requests["invalid history"] = invalid
+
+    print(f"{'request':>22} {'size':>9} {'validate':>10} {'parse':>10} {'validations/s':>14}")
+    for name, request in requests.items():
+        assert (validate_chat_request(request["message"], request["params"]) is None) == (name != "invalid history")
+        validate_time = per_call(lambda: validate_chat_request(request["message"], request["params"]), args.requests)
+        with contextlib.redirect_stdout(io.StringIO()):
+            parse_time = per_call(lambda: parse(request["params"]), max(1, args.requests // 10))
+        size = len(json.dumps(request)) / 1024
+        print(f"{name:>22} {size:>7.1f}KB {validate_time * 1e6:>8.1f}µs {parse_time * 1e6:>8.1f}µs {1 / validate_time:>14,.0f}")
@@ -0,0 +1,86 @@
+"""
+Offline benchmark of the gzip/base64 request and response bodies of index.handler at several payload sizes.
+
+Each payload is example_input_3.json (question with worked solutions and tutorials) with a synthetic
+conversation history of N messages. For the plain and the compressed encoding, the benchmark reports the
+body size, the client encoding time, the handler decoding time (parse_event) and the end-to-end time
+including the transfer at the given bandwidth. Responses (which echo the history when include_test_data
+is set) are measured the same way through build_response and a client-side decode.
+
+Run from the repository root:
+$ python -m src.agents.utils.benchmarks.payload_compression --messages 0 20 100 400 --bandwidth-mbps 10
+"""
+
+import argparse
+import base64
+import contextlib
+import gzip
+import io
+import json
+import statistics
+import time
+
+# run from the repository root, where index.py is importable
+from index import build_response, decode_body, parse_event
+
+EXAMPLE_INPUT = "src/agents/utils/example_inputs/example_input_3.json"
+
+
+def payload(example: dict, nr_messages: int) -> dict:
+    history = [{"type": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about the dot product of the two vectors. " * 8} for i in range(nr_messages)]
+    return {"message": example["message"], "params": {**example["params"], "conversation_history": history + example["params"]["conversation_history"]}}
+
+def encode_request(request: dict, compressed: bool) -> dict:
+    body = json.dumps(request)
+    if not compressed:
+        return {"body": body}
+    return {"body": base64.b64encode(gzip.compress(body.encode("utf-8"), compresslevel=6)).decode("ascii"), "isBase64Encoded": True, "headers": {"Content-Encoding": "gzip"}}
+
+def timed(function, repeat: int) -> tuple[float, object]:
+    timings, result = [], None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings), result
+
+def measure(request: dict, response: dict, compressed: bool, bandwidth: float, repeat: int) -> dict:
+    encode_time, event = timed(lambda: encode_request(request, compressed), repeat)
+    decode_time, _ = timed(lambda: parse_event(event), repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_time, handler_response = timed(lambda: build_response(response, "gzip" if compressed else None), repeat)
+    client_time, _ = timed(lambda: json.loads(decode_body(handler_response)), repeat)
+
+    request_bytes, response_bytes = len(event["body"]), len(handler_response["body"])
+    return {
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+        "request_encode": encode_time,
+        "request_decode": decode_time,
+        "response_encode": build_time,
+        "response_decode": client_time,
+        "end_to_end": encode_time + decode_time + build_time + client_time + (request_bytes + response_bytes) / bandwidth,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[0, 20, 100, 400], help="conversation history lengths")
+    parser.add_argument("--bandwidth-mbps", type=float, default=10.0, help="client link bandwidth used for the transfer time")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(EXAMPLE_INPUT, "r") as file:
+        example = json.load(file)
+    bandwidth = args.bandwidth_mbps * 1e6 / 8
+
+    print(f"{'messages':>8} {'encoding':>10} {'request':>10} {'response':>10} {'enc+dec':>10} {'end-to-end':>11}")
+    for nr_messages in args.messages:
+        request = payload(example, nr_messages)
+        # the response echoes the history in its metadata when include_test_data is set
+        response = {"chatbot_response": "What do you think the first step should be?", "metadata": {"conversation_history": request["params"]["conversation_history"]}}
+        for compressed in (False, True):
+            result = measure(request, response, compressed, bandwidth, args.repeat)
+            codec_time = result["request_encode"] + result["request_decode"] + result["response_encode"] + result["response_decode"]
+            print(f"{nr_messages:>8} {'gzip' if compressed else 'plain':>10} {result['request_bytes'] / 1024:>8.1f}KB {result['response_bytes'] / 1024:>8.1f}KB "
+                  f"{codec_time * 1000:>8.2f}ms {result['end_to_end'] * 1000:>9.2f}ms")
@@ -0,0 +1,58 @@
+"""
+Throughput comparison of the long-lived server mode (`server.py`) against the Lambda RIE container.
+Both expose the RIE invocation path, so the same event is sent to each target with a pool of concurrent clients.
+
+Start the targets first, e.g.:
+$ docker run --env-file .env -p 8080:8080 llm_chat                                    # RIE container
+$ docker run --env-file .env -p 8081:8081 --entrypoint python llm_chat server.py --host 0.0.0.0 --port 8081 --workers 4
+
+Then run from the repository root:
+$ python -m src.agents.utils.benchmarks.server_throughput --target rie=http://localhost:8080 --target server=http://localhost:8081 --requests 50 --concurrency 10
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+RIE_INVOCATION_PATH = "/2015-03-31/functions/function/invocations"
+
+
+def _post(url: str, payload: bytes) -> float:
+    start_time = time.perf_counter()
+    request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - start_time
+
+def run_target(base_url: str, payload: bytes, nr_requests: int, concurrency: int) -> dict:
+    url = base_url.rstrip("/") + RIE_INVOCATION_PATH
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: _post(url, payload), range(nr_requests)))
+    total_time = time.perf_counter() - start_time
+
+    return {
+        "throughput": nr_requests / total_time,
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="name=base_url of a running chat function")
+    parser.add_argument("--input", default="src/agents/utils/example_inputs/example_input_1.json")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.input, "r") as file:
+        payload = json.dumps({"body": file.read()}).encode("utf-8")
+
+    for target in args.target:
+        name, base_url = target.split("=", 1)
+        stats = run_target(base_url, payload, args.requests, args.concurrency)
+        print(f"{name:>10}: {stats['throughput']:.2f} req/s, p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s")
@@ -0,0 +1,93 @@
+"""
+Offline comparison of the summarisation modes of the base agent over synthetic conversations.
+- separate: one call for the summary and one for the conversational style (the conversation is sent twice)
+- combined: one structured-output call returning both, with a fallback to the separate calls
+
+For each conversation the summarisation node runs in both modes; the LLM calls, input/output tokens,
+latency and the outputs are reported side by side.
+
+Generate conversations with synthetic_conversation_generation.py first, then run from the repository root:
+$ python -m src.agents.utils.benchmarks.summary_modes --conversations src/agents/utils/synthetic_conversations/ --output summary_modes.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import uuid
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import convert_to_messages
+
+try:
+    from ...base_agent.base_agent import BaseAgent
+    from ...llm_factory import latency_budget
+except ImportError:
+    from src.agents.base_agent.base_agent import BaseAgent
+    from src.agents.llm_factory import latency_budget
+
+MODES = ["separate", "combined"]
+
+
+def load_conversations(folder: str) -> list[dict]:
+    conversations = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith("_conversation.json"):
+            with open(os.path.join(folder, filename), "r") as file:
+                conversations.append(json.load(file))
+    return conversations
+
+def summarise(agent: BaseAgent, conversation: list[dict]) -> dict:
+    messages = convert_to_messages(conversation)
+    for message in messages:
+        message.id = message.id or str(uuid.uuid4())
+    state = {"messages": messages, "summary": "", "conversationalStyle": ""}
+    config = {"configurable": {"summary": "", "conversational_style": ""}}
+
+    start_time = time.perf_counter()
+    with get_usage_metadata_callback() as usage, latency_budget() as llm_attempts:
+        update = agent.summarize_conversation(state, config)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "latency": elapsed,
+        "llm_calls": len(llm_attempts),
+        "input_tokens": sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values()),
+        "output_tokens": sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values()),
+        "summary": update["summary"],
+        "conversational_style": update["conversationalStyle"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", default="src/agents/utils/synthetic_conversations/")
+    parser.add_argument("--routes", default="{}", help="JSON model routes of the agents, e.g. '{\"summariser\": \"openai:gpt-4o-mini\"}'")
+    parser.add_argument("--output", help="JSON file for the per-conversation results")
+    args = parser.parse_args()
+
+    routes = json.loads(args.routes)
+    agents = {mode: BaseAgent(routes=routes, summary_mode=mode) for mode in MODES}
+    conversations = load_conversations(args.conversations)
+    if not conversations:
+        raise SystemExit(f"No *_conversation.json files in {args.conversations}")
+
+    results = []
+    for conversation in conversations:
+        print(f"Summarising {conversation['conversation_id']}")
+        results.append({
+            "conversation_id": conversation["conversation_id"],
+            **{mode: summarise(agent, conversation["conversation"]) for mode, agent in agents.items()},
+        })
+
+    for mode in MODES:
+        latencies = [r[mode]["latency"] for r in results]
+        print(f"{mode:>9}: {statistics.mean(latencies):.2f}s mean latency, "
+              f"{statistics.mean(r[mode]['llm_calls'] for r in results):.1f} LLM calls, "
+              f"{statistics.mean(r[mode]['input_tokens'] for r in results):.0f} input tokens, "
+              f"{statistics.mean(r[mode]['output_tokens'] for r in results):.0f} output tokens per conversation")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
@@ -0,0 +1,207 @@
+"""
+Record/replay cassettes for the LLM clients built in 'llm_factory.py'.
+---
+In record mode every LLM call is stored in a cassette file: the fingerprint of the request (client,
+messages and call arguments), the response (with its usage metadata) and the original latency.
+In replay mode the recorded responses are returned without any network access, optionally after
+the original latency, so the testbench, the tests and the benchmarks can be rerun offline on real
+recorded traffic.
+
+Configured with environment variables (read when the LLM clients are created):
+- LLM_CASSETTE           cassette file (JSON lines, gzip compressed if the name ends with .gz)
+- LLM_CASSETTE_MODE      record | replay | auto (replay what is recorded, record the rest; default)
+- LLM_CASSETTE_LATENCY   factor applied to the recorded latency when replaying (default 0: no delay)
+
+A request recorded several times is replayed in the recorded order, cycling when exhausted.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import AsyncCallbackManager, CallbackManager
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_messages, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import RunnableConfig, ensure_config
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+
+class CassetteMissError(LookupError):
+    """No recorded response for a request in replay mode."""
+    # not retried by the resilience layer, as a provider 4xx error
+    status_code = 404
+
+
+def _messages(input: Any) -> list[BaseMessage]:
+    if isinstance(input, PromptValue):
+        return input.to_messages()
+    if isinstance(input, (str, BaseMessage)):
+        return convert_to_messages([input])
+    return convert_to_messages(input)
+
+def request_fingerprint(client: str, input: Any, kwargs: dict) -> str:
+    """Fingerprint of an LLM request, ignoring the message ids (they are random per run) and the request timeout."""
+    messages = _messages(input)
+    request = {
+        "client": client,
+        "messages": [(m.type, m.content, getattr(m, "tool_calls", None) or None) for m in messages],
+        "kwargs": {key: value for key, value in kwargs.items() if key != "timeout"},
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _encode(output: Any) -> Any:
+    if isinstance(output, BaseMessage):
+        return {"__message__": message_to_dict(output)}
+    if isinstance(output, BaseException):
+        return {"__error__": f"{type(output).__name__}: {output}"}
+    if isinstance(output, dict):
+        return {key: _encode(value) for key, value in output.items()}
+    if isinstance(output, list):
+        return [_encode(value) for value in output]
+    return output
+
+def _decode(output: Any) -> Any:
+    if isinstance(output, dict):
+        if "__message__" in output:
+            return messages_from_dict([output["__message__"]])[0]
+        if "__error__" in output:
+            return ValueError(output["__error__"])
+        return {key: _decode(value) for key, value in output.items()}
+    if isinstance(output, list):
+        return [_decode(value) for value in output]
+    return output
+
+
+class Cassette:
+    """On-disk store of the recorded LLM interactions, shared by all the wrapped clients of the process."""
+
+    def __init__(self, path: str, mode: str = "auto", latency_factor: float = 0.0):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Known modes: {', '.join(CASSETTE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self.latency_factor = latency_factor
+        self._lock = threading.Lock()
+        self._interactions: dict[str, list[dict]] = {}
+        self._replayed: dict[str, int] = {}
+        if mode != "record" and os.path.exists(path):
+            with self._open("rt") as file:
+                for line in file:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._interactions.setdefault(interaction["key"], []).append(interaction)
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def __len__(self) -> int:
+        return sum(len(interactions) for interactions in self._interactions.values())
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Next recorded interaction of a request, None if it has to be recorded."""
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if self.mode == "record" or not interactions:
+                if self.mode == "replay":
+                    raise CassetteMissError(f"No recorded LLM response for request {key[:12]} in {self.path}")
+                return None
+            n = self._replayed.get(key, 0)
+            self._replayed[key] = n + 1
+            return interactions[n % len(interactions)]
+
+    def record(self, key: str, client: str, output: Any, latency: float) -> None:
+        interaction = {"key": key, "client": client, "latency": round(latency, 4), "output": _encode(output)}
+        with self._lock:
+            self._interactions.setdefault(key, []).append(interaction)
+            with self._open("at") as file:
+                file.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+
+
+class CassetteLLM(Runnable):
+    """
+    Runnable wrapper recording or replaying the calls of an LLM client (invoke and ainvoke).
+    Replayed responses are reported to the callbacks, so usage metadata handlers still see their token usage.
+    """
+
+    def __init__(self, llm: Runnable, cassette: Cassette, client: str):
+        self.llm = llm
+        self.cassette = cassette
+        self.client = client
+
+    def __getattr__(self, attribute: str) -> Any:
+        # expose the attributes of the wrapped client (e.g. model_name)
+        if attribute == "llm":
+            raise AttributeError(attribute)
+        return getattr(self.llm, attribute)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> "CassetteLLM":
+        schema_name = getattr(schema, "__name__", None) or json.dumps(schema, sort_keys=True, default=str)
+        return CassetteLLM(self.llm.with_structured_output(schema, **kwargs), self.cassette, f"{self.client}:structured:{schema_name}:{sorted(kwargs.items())}")
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = request_fingerprint(self.client, input, kwargs)
+        interaction = self.cassette.lookup(key)
+        if interaction is None:
+            start_time = time.monotonic()
+            output = self.llm.invoke(input, config, **kwargs)
+            self.cassette.record(key, self.client, output, time.monotonic() - start_time)
+            return output
+
+        if self.cassette.latency_factor:
+            time.sleep(interaction["latency"] * self.cassette.latency_factor)
+        output = _decode(interaction["output"])
+        message = self._message(output)
+        if message is not None:
+            run_manager = CallbackManager.configure(ensure_config(config).get("callbacks")).on_chat_model_start({"name": self.client}, [_messages(input)])[0]
+            run_manager.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+        return output
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = request_fingerprint(self.client, input, kwargs)
+        interaction = self.cassette.lookup(key)
+        if interaction is None:
+            start_time = time.monotonic()
+            output = await self.llm.ainvoke(input, config, **kwargs)
+            self.cassette.record(key, self.client, output, time.monotonic() - start_time)
+            return output
+
+        if self.cassette.latency_factor:
+            await asyncio.sleep(interaction["latency"] * self.cassette.latency_factor)
+        output = _decode(interaction["output"])
+        message = self._message(output)
+        if message is not None:
+            run_managers = await AsyncCallbackManager.configure(ensure_config(config).get("callbacks")).on_chat_model_start({"name": self.client}, [_messages(input)])
+            await run_managers[0].on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+        return output
+
+    @staticmethod
+    def _message(output: Any) -> Optional[AIMessage]:
+        """Response message of a plain (AIMessage) or structured (include_raw dict) output."""
+        if isinstance(output, AIMessage):
+            return output
+        if isinstance(output, dict) and isinstance(output.get("raw"), AIMessage):
+            return output["raw"]
+        return None
+
+
+_cassettes: dict[tuple, Cassette] = {}
+
+def get_cassette() -> Optional[Cassette]:
+    """Cassette configured by LLM_CASSETTE, LLM_CASSETTE_MODE and LLM_CASSETTE_LATENCY, None if not set."""
+    path = os.environ.get("LLM_CASSETTE")
+    if not path:
+        return None
+    key = (path, os.environ.get("LLM_CASSETTE_MODE", "auto"), float(os.environ.get("LLM_CASSETTE_LATENCY", "0")))
+    if key not in _cassettes:
+        _cassettes[key] = Cassette(*key)
+    return _cassettes[key]
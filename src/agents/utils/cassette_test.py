@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import AIMessage, HumanMessage
+
+try:
+    from .cassette import Cassette, CassetteLLM, CassetteMissError
+    from .fake_llm import FakeChatModel
+    from ..llm_factory import ResiliencePolicy, ResilientLLM
+except ImportError:
+    from src.agents.utils.cassette import Cassette, CassetteLLM, CassetteMissError
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.llm_factory import ResiliencePolicy, ResilientLLM
+
+class UsageFakeChatModel(FakeChatModel):
+    """Fake provider reporting a token usage, as the real providers do."""
+
+    def _result(self, messages):
+        result = super()._result(messages)
+        result.generations[0].message.usage_metadata = {"input_tokens": 7, "output_tokens": 3, "total_tokens": 10}
+        result.generations[0].message.response_metadata = {"model_name": "fake-model"}
+        return result
+
+class TestCassette(unittest.TestCase):
+    """
+    TestCase Class used to test the record/replay of the LLM calls.
+    ---
+    Calls are recorded from the offline fake provider, the replays use a provider that always fails.
+    """
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl.gz")
+        self.messages = [HumanMessage(content="What is a dot product?")]
+
+    def record(self, latency: float = 0.0) -> AIMessage:
+        llm = CassetteLLM(UsageFakeChatModel(response="recorded answer", latency=latency), Cassette(self.path, "record"), "fake")
+        return llm.invoke(self.messages)
+
+    def replayer(self, mode: str = "replay", latency_factor: float = 0.0) -> tuple[CassetteLLM, FakeChatModel]:
+        broken = FakeChatModel(error_rate=1.0, error_status_code=500)
+        return CassetteLLM(broken, Cassette(self.path, mode, latency_factor), "fake"), broken
+
+    def test_replays_without_calling_the_provider(self):
+        self.record()
+        llm, broken = self.replayer()
+
+        # message ids are random per run and not part of the fingerprint
+        with get_usage_metadata_callback() as usage:
+            response = llm.invoke([HumanMessage(content="What is a dot product?", id="another-id")])
+
+        self.assertEqual(response.content, "recorded answer")
+        self.assertEqual(response.usage_metadata["total_tokens"], 10)
+        self.assertEqual(sum(u["total_tokens"] for u in usage.usage_metadata.values()), 10)
+        self.assertEqual(broken.calls, 0)
+
+    def test_replay_miss_is_not_retried(self):
+        self.record()
+        llm, broken = self.replayer()
+        resilient = ResilientLLM(llm, ResiliencePolicy(max_attempts=3, backoff_base=0.0))
+
+        with self.assertRaises(CassetteMissError):
+            resilient.invoke("Unrecorded question")
+        self.assertEqual(broken.calls, 0)
+
+    def test_auto_mode_records_the_misses(self):
+        self.record()
+        llm, broken = self.replayer(mode="auto")
+
+        with self.assertRaises(Exception):
+            llm.invoke("Unrecorded question")
+        self.assertEqual(llm.invoke(self.messages).content, "recorded answer")
+        self.assertEqual(broken.calls, 1)
+
+    def test_original_latency_emulation(self):
+        self.record(latency=0.2)
+        llm, _ = self.replayer(latency_factor=1.0)
+
+        start_time = time.monotonic()
+        asyncio.run(llm.ainvoke(self.messages))
+
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.2)
+
+    def test_structured_output(self):
+        recorder = CassetteLLM(FakeChatModel(structured_response={"summary": "s"}), Cassette(self.path, "record"), "fake")
+        recorder.with_structured_output(dict, include_raw=True).invoke(self.messages)
+        llm, _ = self.replayer()
+
+        response = llm.with_structured_output(dict, include_raw=True).invoke(self.messages)
+
+        self.assertEqual(response["parsed"], {"summary": "s"})
+        self.assertIsInstance(response["raw"], AIMessage)
@@ -0,0 +1,180 @@
+"""
+Persistent LangGraph checkpointers, keyed by the conversation id (thread_id).
+With a checkpointer, the agent restores the (summarised and trimmed) conversation state itself,
+so a request only needs to carry the latest message.
+
+The backend is selected by a URL, e.g. from the CHECKPOINTER_URL environment variable:
+- memory                        in-process only (tests, single long-lived worker)
+- sqlite:///tmp/checkpoints.db  local SQLite file (requires langgraph-checkpoint-sqlite)
+- redis://host:6379             Redis (requires langgraph-checkpoint-redis)
+Other backends (e.g. DynamoDB) can be plugged in with register_checkpointer_backend().
+
+The memory and sqlite backends keep only the latest checkpoint of each conversation (the agent never goes back
+to an earlier step) and the CHECKPOINTER_MAX_THREADS most recently updated conversations, the older ones are
+deleted. Without this, a long-lived server would keep every step of every conversation.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+_backends: dict[str, Callable[[str], BaseCheckpointSaver]] = {}
+
+def register_checkpointer_backend(scheme: str, factory: Callable[[str], BaseCheckpointSaver]) -> None:
+    """Register a checkpointer factory for a URL scheme. The factory receives the URL without the '<scheme>:' prefix."""
+    _backends[scheme] = factory
+
+def get_checkpointer(url: Optional[str]) -> Optional[BaseCheckpointSaver]:
+    """Checkpointer for the given URL, None (stateless agent) if no URL is given."""
+    if not url:
+        return None
+    scheme, _, location = url.partition(":")
+    if scheme not in _backends:
+        raise ValueError(f"Unknown checkpointer backend '{scheme}'. Known backends: {', '.join(_backends)}")
+    return _backends[scheme](location)
+
+
+def checkpointer_max_threads() -> int:
+    """Conversations kept by the memory and sqlite checkpointers (CHECKPOINTER_MAX_THREADS, 0 for no limit)."""
+    return int(os.environ.get("CHECKPOINTER_MAX_THREADS") or 10000)
+
+
+class RetainingInMemorySaver(InMemorySaver):
+    """InMemorySaver keeping the latest checkpoint of each conversation, for the max_threads most recently updated ones."""
+
+    def __init__(self, max_threads: int = 0):
+        super().__init__()
+        self.max_threads = max_threads
+        self._threads: OrderedDict[str, None] = OrderedDict()
+        self._retention_lock = threading.Lock()
+
+    def put(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._retention_lock:
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            kept_versions = self._channel_versions(checkpoints[checkpoint["id"]][0])
+            for checkpoint_id in [checkpoint_id for checkpoint_id in checkpoints if checkpoint_id != checkpoint["id"]]:
+                self._drop(thread_id, checkpoint_ns, checkpoint_id, checkpoints.pop(checkpoint_id)[0], kept_versions)
+
+            self._threads.pop(thread_id, None)
+            self._threads[thread_id] = None
+            while self.max_threads and len(self._threads) > self.max_threads:
+                evicted, _ = self._threads.popitem(last=False)
+                for evicted_ns, evicted_checkpoints in self.storage.pop(evicted, {}).items():
+                    for checkpoint_id, (saved, _, _) in evicted_checkpoints.items():
+                        self._drop(evicted, evicted_ns, checkpoint_id, saved, {})
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._retention_lock:
+            self._threads.pop(thread_id, None)
+            super().delete_thread(thread_id)
+
+    def _channel_versions(self, saved: Any) -> dict:
+        return self.serde.loads_typed(saved)["channel_versions"]
+
+    def _drop(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, saved: Any, kept_versions: dict) -> None:
+        """Delete the pending writes and the channel values of a removed checkpoint, except the values still kept."""
+        self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        for channel, version in self._channel_versions(saved).items():
+            if kept_versions.get(channel) != version:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+
+def _memory_checkpointer(location: str) -> BaseCheckpointSaver:
+    return RetainingInMemorySaver(max_threads=checkpointer_max_threads())
+
+def _sqlite_checkpointer(location: str) -> BaseCheckpointSaver:
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        raise ImportError("The sqlite checkpointer requires langgraph-checkpoint-sqlite: pip install langgraph-checkpoint-sqlite")
+
+    class ThreadedSqliteSaver(SqliteSaver):
+        """
+        SqliteSaver whose async methods run the sync ones in a worker thread, so the same saver serves invoke() and ainvoke().
+        Each write deletes the earlier checkpoints of the conversation; every EVICT_EVERY writes, the conversations
+        beyond the max_threads most recently updated ones are deleted.
+        """
+
+        EVICT_EVERY = 64
+
+        def __init__(self, conn: sqlite3.Connection, max_threads: int = 0):
+            super().__init__(conn)
+            self.max_threads = max_threads
+            self._writes_since_eviction = 0
+
+        def setup(self) -> None:
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS thread_updates (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS thread_updates_updated_at ON thread_updates (updated_at);
+                """
+            )
+
+        def put(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = str(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+            with self.cursor() as cur:
+                # checkpoint ids grow with time, the new checkpoint is the latest
+                for table in ("checkpoints", "writes"):
+                    cur.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", (thread_id, checkpoint_ns, checkpoint["id"]))
+                cur.execute("INSERT INTO thread_updates (thread_id, updated_at) VALUES (?, ?) ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at", (thread_id, time.time()))
+                self._writes_since_eviction += 1
+                if self.max_threads and self._writes_since_eviction >= self.EVICT_EVERY:
+                    self._writes_since_eviction = 0
+                    cur.execute("SELECT thread_id FROM thread_updates ORDER BY updated_at DESC LIMIT -1 OFFSET ?", (self.max_threads,))
+                    for (evicted,) in cur.fetchall():
+                        for table in ("checkpoints", "writes", "thread_updates"):
+                            cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (evicted,))
+            return next_config
+
+        def delete_thread(self, thread_id: str) -> None:
+            super().delete_thread(thread_id)
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM thread_updates WHERE thread_id = ?", (str(thread_id),))
+
+        async def aget_tuple(self, config: Any) -> Any:
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config: Any, **kwargs: Any) -> AsyncIterator[Any]:
+            for checkpoint_tuple in await asyncio.to_thread(lambda: list(self.list(config, **kwargs))):
+                yield checkpoint_tuple
+
+        async def aput(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config: Any, writes: Any, task_id: str, task_path: str = "") -> None:
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    path = location[2:] if location.startswith("//") else location
+    return ThreadedSqliteSaver(sqlite3.connect(path or ":memory:", check_same_thread=False), max_threads=checkpointer_max_threads())
+
+def _redis_checkpointer(location: str) -> BaseCheckpointSaver:
+    try:
+        from langgraph.checkpoint.redis import RedisSaver
+    except ImportError:
+        raise ImportError("The redis checkpointer requires langgraph-checkpoint-redis: pip install langgraph-checkpoint-redis")
+    saver = RedisSaver(redis_url=f"redis:{location}")
+    saver.setup()
+    return saver
+
+register_checkpointer_backend("memory", _memory_checkpointer)
+register_checkpointer_backend("sqlite", _sqlite_checkpointer)
+register_checkpointer_backend("redis", _redis_checkpointer)
@@ -0,0 +1,321 @@
+"""
+Offline stand-in for the chat models built in 'llm_factory.py'.
+Used by tests, warm-ups and benchmarks so the agent graphs can run without network access or API keys.
+FakeInferenceServer stands in for the local inference server of the on-prem nodes (the 'ollama' provider).
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import PrivateAttr
+
+
+class FakeProviderError(Exception):
+    """Error raised by the fake provider, carrying an HTTP-like status code as the real provider SDKs do."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with a fixed response after a configurable latency (in seconds).
+    Errors and slow (tail latency) responses can be injected with a seeded rate to exercise retries and timeouts.
+    Like a real provider, it can enforce quotas (concurrent requests, tokens per quota window) by answering 429,
+    and a max_tokens call argument cuts the response off (finish_reason "length").
+    """
+
+    response: str = "What do you think the first step should be?"
+    latency: float = 0.0
+    error_rate: float = 0.0
+    error_status_code: int = 503
+    slow_rate: float = 0.0
+    slow_latency: float = 0.0
+    seed: Optional[int] = None
+    structured_response: Optional[dict] = None
+    max_concurrency: Optional[int] = None
+    token_quota: Optional[int] = None
+    quota_window: float = 60.0
+
+    _rng: random.Random = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _in_flight: int = PrivateAttr(default=0)
+    _tokens: deque = PrivateAttr(default_factory=deque)
+    _rate_limited: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def calls(self) -> int:
+        """Number of requests received by the fake provider."""
+        return self._calls
+
+    @property
+    def rate_limited(self) -> int:
+        """Number of requests rejected with a 429 by the quotas."""
+        return self._rate_limited
+
+    def _admit(self, messages: list[BaseMessage]) -> None:
+        """Reserve a concurrency slot and the request tokens (4 characters per token), or reject the request with a 429."""
+        tokens = sum(len(str(message.content)) for message in messages) // 4
+        with self._lock:
+            now = time.monotonic()
+            while self._tokens and self._tokens[0][0] <= now - self.quota_window:
+                self._tokens.popleft()
+            over_concurrency = self.max_concurrency is not None and self._in_flight >= self.max_concurrency
+            over_tokens = self.token_quota is not None and sum(t for _, t in self._tokens) + tokens > self.token_quota
+            if over_concurrency or over_tokens:
+                self._rate_limited += 1
+                raise FakeProviderError("Rate limit exceeded", 429)
+            self._in_flight += 1
+            self._tokens.append((now, tokens))
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def get_token_ids(self, text: str) -> list[int]:
+        """Whitespace tokenizer, so token counts need no tokenizer download."""
+        return list(range(len(text.split())))
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        latency, error = self._next_call()
+        self._admit(messages)
+        try:
+            if latency:
+                time.sleep(latency)
+        finally:
+            self._release()
+        if error:
+            raise error
+        return self._limit(self._result(messages), kwargs.get("max_tokens"))
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        latency, error = self._next_call()
+        self._admit(messages)
+        try:
+            if latency:
+                await asyncio.sleep(latency)
+        finally:
+            self._release()
+        if error:
+            raise error
+        return self._limit(self._result(messages), kwargs.get("max_tokens"))
+
+    def _next_call(self) -> tuple[float, Optional[FakeProviderError]]:
+        """Draw the latency and the (optional) error of the next request."""
+        self._calls += 1
+        latency = self.latency
+        if self.slow_rate and self._rng.random() < self.slow_rate:
+            latency = self.slow_latency
+        error = None
+        if self.error_rate and self._rng.random() < self.error_rate:
+            error = FakeProviderError(f"Injected error {self.error_status_code}", self.error_status_code)
+        return latency, error
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        """Structured output returning structured_response, a parsing error is reported if it is not set."""
+
+        def parse(raw: AIMessage) -> dict:
+            if self.structured_response is None:
+                error = ValueError("Fake provider has no structured_response")
+                if include_raw:
+                    return {"raw": raw, "parsed": None, "parsing_error": error}
+                raise error
+            if include_raw:
+                return {"raw": raw, "parsed": dict(self.structured_response), "parsing_error": None}
+            return dict(self.structured_response)
+
+        return self | RunnableLambda(parse)
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    @staticmethod
+    def _limit(result: ChatResult, max_tokens: Optional[int]) -> ChatResult:
+        """Cut the response off after max_tokens (whitespace) tokens, as a provider enforcing the output limit."""
+        message = result.generations[0].message
+        words = str(message.content).split()
+        cut_off = max_tokens is not None and len(words) > max_tokens
+        if cut_off:
+            message.content = " ".join(words[:max_tokens])
+        message.response_metadata["finish_reason"] = "length" if cut_off else "stop"
+        return result
+
+
+class FakeInferenceServer:
+    """
+    Local inference server speaking the OpenAI-compatible chat completions API, as Ollama, llama.cpp or vLLM do.
+    - parallel:             requests generated at once (the server's parallel slots), the others wait for a slot
+    - load_latency:         seconds to load the model into memory, paid by the first request unless preloaded
+    - latency:              seconds per request, plus the response tokens at tokens_per_second
+    - error_rate:           share of the chat requests answered with error_status_code (seeded)
+    - max_concurrency:      quota of chat requests in flight, the requests over it are answered 429 with a Retry-After
+    POST /api/generate without a prompt preloads the model (Ollama's preload request).
+    The server counts the requests, the TCP connections opened and the peak of concurrently generated requests, and
+    records the last keep_alive it received. Unlike Ollama, it does not unload the model: keep_alive is only recorded.
+
+    with FakeInferenceServer(parallel=4) as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url
+    """
+
+    def __init__(self, parallel: int = 4, load_latency: float = 0.0, latency: float = 0.0, tokens_per_second: Optional[float] = None,
+                 response: str = FakeChatModel.model_fields["response"].default, error_rate: float = 0.0, error_status_code: int = 503,
+                 seed: Optional[int] = None, max_concurrency: Optional[int] = None):
+        self.parallel = parallel
+        self.load_latency = load_latency
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response = response
+        self.error_rate = error_rate
+        self.error_status_code = error_status_code
+        self.max_concurrency = max_concurrency
+        self.rate_limited = 0
+        self._in_flight = 0
+        self._rng = random.Random(seed)
+        self.requests = 0
+        self.connections = 0
+        self.preloads = 0
+        self.peak_concurrency = 0
+        self.keep_alive: Any = None
+        self._slots = threading.Semaphore(parallel)
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._load_lock = threading.Lock()
+        self._generating = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeInferenceServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeInferenceServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _load(self) -> None:
+        with self._load_lock:
+            if not self._loaded.is_set():
+                time.sleep(self.load_latency)
+                self._loaded.set()
+
+    def _admit(self) -> Optional[int]:
+        """Error status of the next chat request, None to serve it (under the lock)."""
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return self.error_status_code
+        if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+            self.rate_limited += 1
+            return 429
+        self._in_flight += 1
+        return None
+
+    def _complete(self, request: dict) -> dict:
+        self._load()
+        words = self.response.split()
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+        cut_off = max_tokens is not None and len(words) > max_tokens
+        if cut_off:
+            words = words[:max_tokens]
+        with self._slots:
+            with self._lock:
+                self._generating += 1
+                self.peak_concurrency = max(self.peak_concurrency, self._generating)
+            try:
+                time.sleep(self.latency + (len(words) / self.tokens_per_second if self.tokens_per_second else 0))
+            finally:
+                with self._lock:
+                    self._generating -= 1
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+        return {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "length" if cut_off else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)},
+        }
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps the connection open between requests
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _reply(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self) -> None:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if self.path == "/v1/chat/completions":
+                    with server._lock:
+                        server.requests += 1
+                        server.keep_alive = request.get("keep_alive", server.keep_alive)
+                        status = server._admit()
+                    if status is not None:
+                        self._reply(status, {"error": {"message": f"Injected error {status}", "type": "server_error", "code": status}},
+                                    {"Retry-After": "1"} if status == 429 else None)
+                        return
+                    try:
+                        response = server._complete(request)
+                    finally:
+                        with server._lock:
+                            server._in_flight -= 1
+                    self._reply(200, response)
+                elif self.path == "/api/generate" and not request.get("prompt"):
+                    server._load()
+                    with server._lock:
+                        server.preloads += 1
+                        server.keep_alive = request.get("keep_alive")
+                    self._reply(200, {"model": request.get("model", ""), "response": "", "done": True, "done_reason": "load"})
+                else:
+                    self._reply(404, {"error": f"Unknown endpoint {self.path}"})
+
+        return Handler
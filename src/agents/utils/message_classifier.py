@@ -0,0 +1,110 @@
+"""
+Local pre-classification of the student's message, before the agent graph.
+---
+Greetings ("hi"), acknowledgements ("ok thanks", "got it") and clearly off-topic requests ("tell me a joke")
+do not need the tutor LLM and the whole question context. classify_message() recognises them with
+precompiled patterns in a few microseconds and returns a templated response; every other message (label
+"tutor") goes to the agent as before.
+
+The rules favour precision over recall, as a misclassified question would get a templated answer:
+- greetings and acknowledgements must be the whole message (a greeting followed by a question is a question)
+- an acknowledgement answering a question of the tutor ("ok" after "shall we try part b?") goes to the tutor
+- an off-topic request must match an off-topic pattern and share no word with the question, nor contain maths
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+LABELS = ("greeting", "acknowledgement", "off_topic", "tutor")
+
+_GREETING = re.compile(r"(hi+|hello|hey+|hiya|yo|howdy|greetings|good (morning|afternoon|evening))( there| again)?( tutor| everyone)?")
+_ACKNOWLEDGEMENT_PHRASE = (
+    r"(ok(ay)?|k|kk|alright|all right|thanks?( you)?( so much| a lot| very much)?|thank you( so much| a lot| very much)?|ty|thx|cheers"
+    r"|cool|great|nice|perfect|awesome|brilliant|lovely|got it|gotcha|i see|makes sense|that makes sense|understood|sounds good|will do)"
+)
+_ACKNOWLEDGEMENT = re.compile(rf"{_ACKNOWLEDGEMENT_PHRASE}( {_ACKNOWLEDGEMENT_PHRASE})*")
+_OFF_TOPIC = re.compile(
+    r"\b(tell me a joke|jokes?|weather|who won|football|soccer|basketball|nba|premier league|cricket|tennis"
+    r"|movies?|films?|netflix|tv shows?|songs?|music|singer|band|recipes?|pizza|burger|dinner|lunch|breakfast"
+    r"|your favou?rite|what'?s your name|what is your name|how old are you|where do you live|are you (a )?human"
+    r"|girlfriend|boyfriend|dating|video games?|fortnite|minecraft|roblox|holiday|vacation|birthday|pets?|my dog|my cat"
+    r"|write (me )?a (poem|story|song))\b"
+)
+_MATHS = re.compile(r"[0-9=+*/^<>\\]|\b(sin|cos|tan|log|sqrt|vector|matrix|equation|integral|derivative)\b")
+_WORD = re.compile(r"[a-z]{4,}")
+# words of the off-topic patterns that do not make a message on-topic when they appear in the question
+_STOPWORDS = {"what", "your", "with", "this", "that", "have", "there", "where", "when", "which", "about", "would", "could", "should", "tell", "write", "from", "does", "like", "know", "want"}
+
+GREETING_RESPONSES = (
+    "Hi! What would you like to work on in this question?",
+    "Hello! Where would you like to start with this question?",
+)
+ACKNOWLEDGEMENT_RESPONSES = (
+    "You're welcome! What would you like to look at next?",
+    "Great! Is there anything in this question you would like to go through next?",
+)
+OFF_TOPIC_RESPONSE = "I'm not familiar with that topic, but I can help you with {topic}. What would you like to work on?"
+
+
+@dataclass
+class MessageClass:
+    """Label of a message and, except for "tutor", the templated response."""
+    label: str
+    response: Optional[str] = None
+
+
+def message_classifier_enabled() -> bool:
+    return os.environ.get("MESSAGE_CLASSIFIER", "").lower() in ("1", "true", "yes")
+
+def _normalise(message: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9'=+*/^<>\\ ]+", " ", message.lower()).split())
+
+def _message_type(message: Any) -> Optional[str]:
+    if isinstance(message, dict):
+        return message.get("type", message.get("role"))
+    return getattr(message, "type", None)
+
+def _content(message: Any) -> Any:
+    return message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+
+def _tutor_asked_question(conversation_history: list) -> bool:
+    """Whether the last tutor message of the history ends with a question."""
+    for message in reversed(conversation_history or []):
+        if _message_type(message) in ("ai", "assistant"):
+            content = _content(message)
+            return isinstance(content, str) and content.rstrip().endswith("?")
+    return False
+
+def _question_words(question_information: dict) -> set:
+    texts = [question_information.get("questionTitle"), question_information.get("questionContent")]
+    for part in question_information.get("parts") or []:
+        texts.append(part.get("publishedPartContent"))
+    return set(_WORD.findall(" ".join(str(text) for text in texts if text).lower())) - _STOPWORDS
+
+def _is_off_topic(text: str, question_information: Optional[dict]) -> bool:
+    if not _OFF_TOPIC.search(text) or _MATHS.search(text):
+        return False
+    # the question vocabulary is only built for the few messages matching an off-topic pattern
+    return not (set(_WORD.findall(text)) - _STOPWORDS) & _question_words(question_information or {})
+
+def classify_message(message: Any, conversation_history: Optional[list] = None, question_information: Optional[dict] = None) -> MessageClass:
+    """Classify the student's message, with the templated response of the greetings, acknowledgements and off-topic messages."""
+    if not isinstance(message, str):
+        return MessageClass("tutor")
+    text = _normalise(message)
+    if not text or len(text) > 200:
+        return MessageClass("tutor")
+    variant = len(conversation_history or []) // 2
+
+    if _GREETING.fullmatch(text):
+        return MessageClass("greeting", GREETING_RESPONSES[variant % len(GREETING_RESPONSES)])
+    if _ACKNOWLEDGEMENT.fullmatch(text):
+        if _tutor_asked_question(conversation_history):
+            return MessageClass("tutor")
+        return MessageClass("acknowledgement", ACKNOWLEDGEMENT_RESPONSES[variant % len(ACKNOWLEDGEMENT_RESPONSES)])
+    if _is_off_topic(text, question_information):
+        topic = (question_information or {}).get("questionTitle") or "this question"
+        return MessageClass("off_topic", OFF_TOPIC_RESPONSE.format(topic=topic if topic == "this question" else f"'{topic}'"))
+    return MessageClass("tutor")
@@ -0,0 +1,48 @@
+import unittest
+
+try:
+    from .message_classifier import classify_message
+except ImportError:
+    from src.agents.utils.message_classifier import classify_message
+
+QUESTION = {"questionTitle": "Dot Product", "questionContent": "Compute the dot product of the vectors a and b.", "parts": [{"publishedPartContent": "Find the angle between a and b."}]}
+
+class TestMessageClassifier(unittest.TestCase):
+    """
+    TestCase Class used to test the pre-classification of the student's messages.
+    """
+
+    def label(self, message: str, history: list | None = None) -> str:
+        return classify_message(message, history, QUESTION).label
+
+    def test_greetings_and_acknowledgements(self):
+        self.assertEqual(self.label("Hi there!"), "greeting")
+        self.assertEqual(self.label("hey there tutor"), "greeting")
+        self.assertEqual(self.label("good morning"), "greeting")
+        self.assertEqual(self.label("Ok, thanks!"), "acknowledgement")
+        self.assertEqual(self.label("got it, that makes sense"), "acknowledgement")
+
+    def test_questions_go_to_the_tutor(self):
+        self.assertEqual(self.label("hi, how do I compute the dot product?"), "tutor")
+        self.assertEqual(self.label("thanks, but why is the angle 90 degrees?"), "tutor")
+        self.assertEqual(self.label("is a.b = 3?"), "tutor")
+
+    def test_acknowledgement_answering_the_tutor(self):
+        history = [{"role": "assistant", "content": "Shall we try the next part?"}, {"role": "user", "content": "ok"}]
+
+        self.assertEqual(self.label("ok", history), "tutor")
+        self.assertEqual(self.label("ok", [{"role": "assistant", "content": "Well done."}]), "acknowledgement")
+
+    def test_off_topic(self):
+        off_topic = classify_message("Tell me a joke", [], QUESTION)
+
+        self.assertEqual(off_topic.label, "off_topic")
+        self.assertIn("'Dot Product'", off_topic.response)
+        self.assertEqual(self.label("what's your favourite movie?"), "off_topic")
+        # sharing the question vocabulary or containing maths keeps it on-topic
+        self.assertEqual(self.label("what is your favourite way to find the angle between vectors"), "tutor")
+        self.assertEqual(self.label("write a song about 2+2"), "tutor")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Single-pass normalisation of the incoming conversation history.
+---
+The request carries the history as dicts ({"type" or "role", "content"}) or LangChain messages.
+normalise_messages() converts, validates, assigns stable ids and drops RemoveMessage once per request,
+so the graph nodes can use the state messages as they are instead of filtering them again.
+"""
+
+import hashlib
+from typing import Any, Iterable
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+MESSAGE_TYPES: dict[str, type[BaseMessage]] = {
+    "human": HumanMessage,
+    "user": HumanMessage,
+    "ai": AIMessage,
+    "assistant": AIMessage,
+    "system": SystemMessage,
+}
+VALID_TYPES = {"human", "ai", "system"}
+REMOVE_TYPE = "remove"
+
+def message_id(position: int, message_type: str, content: Any) -> str:
+    """Stable id of a message from its position and content, so the same history always gets the same ids."""
+    return hashlib.blake2b(f"{position}:{message_type}:{content}".encode("utf-8"), digest_size=16).hexdigest()
+
+def normalise_messages(conversation_history: Iterable[Any] | None) -> list[BaseMessage]:
+    """
+    Convert the conversation history into Human/AI/System messages with ids, dropping RemoveMessage.
+    Raises a ValueError naming the position of the first invalid message.
+    """
+    messages: list[BaseMessage] = []
+    for position, item in enumerate(conversation_history or []):
+        if isinstance(item, BaseMessage):
+            if item.type == REMOVE_TYPE:
+                continue
+            if item.type not in VALID_TYPES:
+                raise ValueError(f"conversation_history[{position}]: unsupported message type '{item.type}'")
+            if not item.id:
+                item = item.model_copy(update={"id": message_id(position, item.type, item.content)})
+            messages.append(item)
+            continue
+
+        if not isinstance(item, dict):
+            raise ValueError(f"conversation_history[{position}]: expected an object with 'type' and 'content', got {type(item).__name__}")
+        message_type = item.get("type", item.get("role"))
+        if message_type == REMOVE_TYPE:
+            continue
+        if message_type not in MESSAGE_TYPES:
+            raise ValueError(f"conversation_history[{position}]: unsupported message type '{message_type}'")
+        content = item.get("content")
+        if not isinstance(content, (str, list)):
+            raise ValueError(f"conversation_history[{position}]: 'content' must be a string or a list")
+        messages.append(MESSAGE_TYPES[message_type](content=content, id=item.get("id") or message_id(position, message_type, content)))
+    return messages
@@ -0,0 +1,47 @@
+import unittest
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage
+
+try:
+    from .message_normalisation import normalise_messages
+except ImportError:
+    from src.agents.utils.message_normalisation import normalise_messages
+
+class TestNormaliseMessages(unittest.TestCase):
+    """
+    TestCase Class used to test the single-pass normalisation of the conversation history.
+    """
+
+    def test_converts_dicts_and_messages(self):
+        history = [
+            {"type": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+            {"type": "system", "content": "Be brief"},
+            HumanMessage(content="Thanks", id="kept-id"),
+        ]
+
+        messages = normalise_messages(history)
+
+        self.assertEqual([type(m) for m in messages], [HumanMessage, AIMessage, SystemMessage, HumanMessage])
+        self.assertEqual(messages[3].id, "kept-id")
+        self.assertTrue(all(m.id for m in messages))
+
+    def test_ids_are_stable(self):
+        history = [{"type": "user", "content": "Hi"}, {"type": "ai", "content": "Hi"}]
+
+        first, second = normalise_messages(history), normalise_messages(history)
+
+        self.assertEqual([m.id for m in first], [m.id for m in second])
+        self.assertNotEqual(first[0].id, first[1].id)
+
+    def test_drops_remove_messages(self):
+        history = [{"type": "user", "content": "Hi"}, RemoveMessage(id="old"), {"type": "remove", "content": "", "id": "older"}]
+
+        self.assertEqual(len(normalise_messages(history)), 1)
+
+    def test_rejects_invalid_messages(self):
+        for history in ([{"type": "tool", "content": "x"}], [{"type": "user"}], ["Hi"]):
+            with self.subTest(history=history):
+                with self.assertRaises(ValueError) as cm:
+                    normalise_messages(history)
+                self.assertIn("conversation_history[0]", str(cm.exception))
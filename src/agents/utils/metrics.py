@@ -0,0 +1,253 @@
+"""
+In-process metrics registry: counters and histograms with optional labels.
+---
+Recording is a dictionary update under a lock (about a microsecond). The values are exported two ways:
+- CloudWatch Embedded Metric Format (EMF): flush_emf() prints one JSON log line per label set with the
+  values recorded since the previous flush. The handler flushes once per invocation (METRICS_EMF enabled,
+  by default in Lambda), and CloudWatch Logs extracts the metrics from the log lines, no API call needed.
+  Without a flush (EMF disabled, e.g. in server mode) a histogram keeps at most EMF_MAX_PENDING values per label set.
+- Prometheus text exposition: prometheus_text() renders the cumulative values since the process started,
+  served by the server mode at GET /metrics.
+
+Metrics of the chat function (see the README for their meaning):
+requests{status_code}, request_latency, prompt_tokens{variant}, output_tokens{variant}, agent_latency{variant},
+summarisations, tutor_replies{source}, llm_attempts{outcome}, output_cut_offs
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+EMF_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ReflectiveChat")
+EMF_MAX_VALUES = 100  # values per metric in an EMF document
+EMF_MAX_PENDING = 1000  # histogram values kept per label set until the next flush, later ones are only counted
+
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+OUTPUT_TOKEN_BUCKETS = (25, 50, 100, 200, 400, 800, 1600, 3200)
+
+_PROMETHEUS_UNITS = {"Milliseconds": "_milliseconds", "Count": ""}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    def __init__(self, name: str, unit: str, labels: tuple[str, ...], help: str):
+        self.name = name
+        self.unit = unit
+        self.labels = labels
+        self.help = help
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(Metric):
+    """Monotonic count, e.g. requests by status code."""
+
+    def __init__(self, name: str, unit: str = "Count", labels: tuple[str, ...] = (), help: str = ""):
+        super().__init__(name, unit, labels, help)
+        self._totals: dict[tuple, float] = {}
+        self._pending: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._totals[key] = self._totals.get(key, 0) + amount
+            self._pending[key] = self._pending.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._totals.get(self._key(labels), 0)
+
+    def take_pending(self) -> dict[tuple, list[float]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return {key: [amount] for key, amount in pending.items()}
+
+    def prometheus_lines(self) -> list[str]:
+        name = f"{self.name}_total"
+        with self._lock:
+            totals = dict(self._totals)
+        return [f"# HELP {name} {self.help}", f"# TYPE {name} counter"] + [f"{name}{self._label_text(key)} {total:g}" for key, total in totals.items()]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets (Prometheus) and raw values (EMF), e.g. latencies."""
+
+    def __init__(self, name: str, unit: str = "Milliseconds", labels: tuple[str, ...] = (), help: str = "", buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, unit, labels, help)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts (+Inf last), sum, count]
+        self._totals: dict[tuple, list] = {}
+        self._pending: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            totals[0][index] += 1
+            totals[1] += value
+            totals[2] += 1
+            pending = self._pending.setdefault(key, [])
+            if len(pending) < EMF_MAX_PENDING:
+                pending.append(value)
+
+    def count(self, **labels: str) -> int:
+        totals = self._totals.get(self._key(labels))
+        return totals[2] if totals else 0
+
+    def take_pending(self) -> dict[tuple, list[float]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def prometheus_lines(self) -> list[str]:
+        name = f"{self.name}{_PROMETHEUS_UNITS.get(self.unit, '')}"
+        with self._lock:
+            totals = {key: (list(counts), total, count) for key, (counts, total, count) in self._totals.items()}
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        for key, (counts, total, count) in totals.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_label = f'le="{le}"'
+                lines.append(f"{name}_bucket{self._label_text(key, bucket_label)} {cumulative}")
+            lines.append(f"{name}_sum{self._label_text(key)} {total:g}")
+            lines.append(f"{name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of the process, exported as EMF log lines (per invocation) and Prometheus text (cumulative)."""
+
+    def __init__(self, namespace: str = EMF_NAMESPACE, service: str = "reflectiveChatFunction"):
+        self.namespace = namespace
+        self.service = service
+        self._metrics: dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labels != metric.labels:
+                raise ValueError(f"Metric '{metric.name}' is already registered with another type or labels")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, unit: str = "Count", labels: tuple[str, ...] = (), help: str = "") -> Counter:
+        return self._register(Counter(name, unit, labels, help))
+
+    def histogram(self, name: str, unit: str = "Milliseconds", labels: tuple[str, ...] = (), help: str = "", buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, unit, labels, help, buckets))
+
+    def emf_documents(self, timestamp: Optional[float] = None) -> list[dict]:
+        """EMF documents of the values recorded since the previous call, one per label set (and per 100 values)."""
+        timestamp_ms = int((timestamp if timestamp is not None else time.time()) * 1000)
+        groups: dict[tuple, list[tuple[Metric, list[float]]]] = {}
+        for metric in self._metrics.values():
+            for key, values in metric.take_pending().items():
+                groups.setdefault((metric.labels, key), []).append((metric, values))
+
+        documents = []
+        for (labels, key), entries in groups.items():
+            dimensions = {"Service": self.service, **dict(zip(labels, key))}
+            for offset in range(0, max(len(values) for _, values in entries), EMF_MAX_VALUES):
+                chunk = [(metric, values[offset:offset + EMF_MAX_VALUES]) for metric, values in entries if values[offset:offset + EMF_MAX_VALUES]]
+                document = {
+                    "_aws": {
+                        "Timestamp": timestamp_ms,
+                        "CloudWatchMetrics": [{
+                            "Namespace": self.namespace,
+                            "Dimensions": [list(dimensions)],
+                            "Metrics": [{"Name": metric.name, "Unit": metric.unit} for metric, _ in chunk],
+                        }],
+                    },
+                    **dimensions,
+                }
+                for metric, values in chunk:
+                    document[metric.name] = values[0] if len(values) == 1 else values
+                documents.append(document)
+        return documents
+
+    def flush_emf(self, write: Callable[[str], None] = print) -> int:
+        """Write the EMF documents as JSON log lines. Returns the number of lines written."""
+        documents = self.emf_documents()
+        for document in documents:
+            write(json.dumps(document, separators=(",", ":")))
+        return len(documents)
+
+    def reset(self) -> None:
+        """Clear all the recorded values, e.g. those of the warm-up pass."""
+        for metric in self._metrics.values():
+            with metric._lock:
+                metric._totals, metric._pending = {}, {}
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+
+def merge_prometheus_text(texts: dict[str, str], label: str = "worker") -> str:
+    """
+    Merge the Prometheus texts of several processes (e.g. the workers behind the affinity router) into one,
+    each sample labelled with its process, under a single HELP and TYPE line per metric.
+    """
+    families: dict[str, list[str]] = {}
+    for process, text in texts.items():
+        pair = f'{label}="{_escape(str(process))}"'
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                lines = families.setdefault(family, [])
+                if line not in lines:
+                    lines.append(line)
+            elif line and family is not None:
+                name, _, value = line.rpartition(" ")
+                name = name.replace("{", "{" + pair + ",", 1) if "{" in name else name + "{" + pair + "}"
+                families[family].append(f"{name} {value}")
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+def emf_enabled() -> bool:
+    setting = os.environ.get("METRICS_EMF")
+    if setting is not None:
+        return setting.lower() in ("1", "true", "yes")
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter("requests", labels=("status_code",), help="Handler responses by status code.")
+REQUEST_LATENCY = metrics.histogram("request_latency", help="Handler time per request.")
+PROMPT_TOKENS = metrics.histogram("prompt_tokens", unit="Count", labels=("variant",), help="Estimated input tokens of the tutor LLM call, by agent variant.", buckets=TOKEN_BUCKETS)
+OUTPUT_TOKENS = metrics.histogram("output_tokens", unit="Count", labels=("variant",), help="Output tokens of the tutor LLM reply, by agent variant.", buckets=OUTPUT_TOKEN_BUCKETS)
+AGENT_LATENCY = metrics.histogram("agent_latency", labels=("variant",), help="Agent invocation time, by agent variant.")
+SUMMARISATIONS = metrics.counter("summarisations", help="Conversation summarisations triggered.")
+TUTOR_REPLIES = metrics.counter("tutor_replies", labels=("source",), help="Tutor replies by source: llm, response_cache, opening_turn, fast_path.")
+LLM_ATTEMPTS = metrics.counter("llm_attempts", labels=("outcome",), help="LLM call attempts by outcome: ok, error, timeout.")
+OUTPUT_CUT_OFFS = metrics.counter("output_cut_offs", help="Tutor replies cut off by the output budget.")
+
+def record_request(status_code: int, latency: float) -> None:
+    """Record a handler response (latency in seconds) and, with METRICS_EMF, flush the invocation's metrics."""
+    REQUESTS.inc(status_code=status_code)
+    REQUEST_LATENCY.observe(latency * 1000)
+    if emf_enabled():
+        metrics.flush_emf()
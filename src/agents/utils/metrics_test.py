@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+try:
+    from .metrics import EMF_MAX_PENDING, MetricsRegistry, REQUESTS, merge_prometheus_text, metrics
+    from ...index import handler
+except ImportError:
+    from src.agents.utils.metrics import EMF_MAX_PENDING, MetricsRegistry, REQUESTS, merge_prometheus_text, metrics
+    from index import handler
+
+def emf_lines(output: str) -> list[dict]:
+    """EMF documents among the log lines."""
+    documents = []
+    for line in output.splitlines():
+        if line.startswith("{"):
+            document = json.loads(line)
+            if "_aws" in document:
+                documents.append(document)
+    return documents
+
+class TestMetrics(unittest.TestCase):
+    """
+    TestCase Class used to test the metrics registry and its EMF and Prometheus outputs.
+    """
+
+    def test_emf_documents(self):
+        registry = MetricsRegistry(namespace="Test")
+        requests = registry.counter("requests", labels=("status_code",))
+        latency = registry.histogram("request_latency")
+        requests.inc(status_code=200)
+        requests.inc(status_code=200)
+        requests.inc(status_code=400)
+        for value in range(150):
+            latency.observe(value)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            registry.flush_emf()
+        documents = emf_lines(output.getvalue())
+
+        by_status = {document["status_code"]: document for document in documents if "status_code" in document}
+        self.assertEqual(by_status["200"]["requests"], 2)
+        self.assertEqual(by_status["400"]["requests"], 1)
+        directive = by_status["200"]["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(directive["Namespace"], "Test")
+        self.assertEqual(directive["Dimensions"], [["Service", "status_code"]])
+        self.assertEqual(directive["Metrics"], [{"Name": "requests", "Unit": "Count"}])
+
+        # at most 100 values per document
+        latencies = [document["request_latency"] for document in documents if "request_latency" in document]
+        self.assertEqual([len(values) for values in latencies], [100, 50])
+
+        # the values are only flushed once
+        self.assertEqual(registry.emf_documents(), [])
+        self.assertEqual(requests.value(status_code=200), 2)
+
+    def test_pending_values_are_capped(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("request_latency")
+        for value in range(EMF_MAX_PENDING * 5):
+            latency.observe(value)
+
+        self.assertEqual(latency.count(), EMF_MAX_PENDING * 5)
+        self.assertEqual(sum(len(values) for values in latency.take_pending().values()), EMF_MAX_PENDING)
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter("replies", labels=("source",), help="Replies.").inc(source="llm")
+        latency = registry.histogram("latency", buckets=(10, 100))
+        latency.observe(5)
+        latency.observe(50)
+        latency.observe(500)
+
+        text = registry.prometheus_text()
+        self.assertIn('replies_total{source="llm"} 1', text)
+        self.assertIn('latency_milliseconds_bucket{le="10"} 1', text)
+        self.assertIn('latency_milliseconds_bucket{le="100"} 2', text)
+        self.assertIn('latency_milliseconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("latency_milliseconds_sum 555", text)
+        self.assertIn("latency_milliseconds_count 3", text)
+
+    def test_merge_worker_texts(self):
+        texts = {}
+        for worker in ("0", "1"):
+            registry = MetricsRegistry()
+            registry.counter("replies", labels=("source",), help="Replies.").inc(source="llm")
+            registry.counter("summarisations", help="Summarisations.").inc()
+            texts[worker] = registry.prometheus_text()
+
+        text = merge_prometheus_text(texts)
+        self.assertEqual(text.count("# TYPE replies_total counter"), 1)
+        self.assertIn('replies_total{worker="0",source="llm"} 1', text)
+        self.assertIn('replies_total{worker="1",source="llm"} 1', text)
+        self.assertIn('summarisations_total{worker="1"} 1', text)
+
+    def test_handler_flushes_per_invocation(self):
+        metrics.emf_documents()
+        before = REQUESTS.value(status_code=400)
+        output = io.StringIO()
+        with patch.dict(os.environ, {"METRICS_EMF": "true"}), contextlib.redirect_stdout(output):
+            response = handler({"body": "not json"}, None)
+
+        self.assertEqual(response["statusCode"], 400)
+        self.assertEqual(REQUESTS.value(status_code=400), before + 1)
+        documents = emf_lines(output.getvalue())
+        self.assertIn({"Service": "reflectiveChatFunction", "status_code": "400", "requests": 1}, [{k: v for k, v in document.items() if k != "_aws"} for document in documents])
+        self.assertTrue(any("request_latency" in document for document in documents))
+
+if __name__ == "__main__":
+    unittest.main()
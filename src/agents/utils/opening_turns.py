@@ -0,0 +1,177 @@
+"""
+Precomputed opening tutor turns per question part.
+---
+The first message of most conversations is one of a few openers ("hi", "how do I start?", "I don't
+understand the question", "can I have a hint?") and its answer only depends on the tutor role prompt and
+the question context. The precomputation job generates the answer of each opener intent for each part
+of each question with the base agent, ahead of time, and stores them in a JSON file keyed by
+(question version, part, intent).
+
+At runtime (OPENING_TURNS_PATH set), a first turn whose message matches an opener intent, for a part the
+student has not submitted anything to yet, is answered from the store without an LLM call. Any other
+request, or a key missing from the store (e.g. a question edited since the precomputation), falls back
+to the live generation.
+
+Precompute the store from request JSON files (as in example_inputs/), with the configured LLM routes:
+$ python -m src.agents.utils.opening_turns src/agents/utils/example_inputs/*.json --output opening_turns.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Optional
+
+try:
+    from .semantic_cache import cache_scope
+except ImportError:
+    from src.agents.utils.semantic_cache import cache_scope
+
+# Opener intents: the canonical message used for the precomputation and the patterns of the matching messages
+OPENER_INTENTS: dict[str, tuple[str, re.Pattern]] = {
+    "greeting": ("Hi", re.compile(r"(hi|hello|hey|hiya|good (morning|afternoon|evening))( there)?")),
+    "how_to_start": ("How do I start?", re.compile(
+        r"(how (do|should|can|would) i (start|begin|approach)( this| it)?( question| problem| part)?"
+        r"|where (do|should|can) i (start|begin)( with this| from)?"
+        r"|what (do|should) i do first"
+        r"|i (do not|dont|don't) know (how|where) to (start|begin))"
+    )),
+    "explain_question": ("I don't understand the question.", re.compile(
+        r"(i (do not|dont|don't) (understand|get) (the|this) (question|problem|part)"
+        r"|what (is|does) (the|this) (question|problem|part) (asking( me)?( to do)?|mean)"
+        r"|(can|could) you explain (the|this) (question|problem|part))"
+    )),
+    "hint": ("Can I have a hint?", re.compile(r"((can|could) i (have|get) a hint|(give me|i need) a hint|any hints?|hint)( please)?")),
+}
+
+_MAX_OPENER_WORDS = 12
+
+def match_opener_intent(message: Any) -> Optional[str]:
+    """Opener intent of a short message that is entirely one of the opener phrasings, None otherwise."""
+    if not isinstance(message, str):
+        return None
+    text = " ".join(re.sub(r"[^a-z' ]+", " ", message.lower()).split())
+    if not text or len(text.split()) > _MAX_OPENER_WORDS:
+        return None
+    for intent, (_, pattern) in OPENER_INTENTS.items():
+        if pattern.fullmatch(text):
+            return intent
+    return None
+
+def opening_turn_key(question_information: dict, part_id: Optional[str], intent: str) -> str:
+    """Store key of an opening turn: the question version and part (as the response cache scope) and the intent."""
+    return f"{cache_scope(question_information, part_id)}:{intent}"
+
+def _has_submissions(question_submission_summary: Optional[list], part_id: Optional[str]) -> bool:
+    return any(
+        str(area.get("publishedPartId")) == str(part_id) and (area.get("totalSubmissions") or area.get("latestSubmission"))
+        for area in question_submission_summary or []
+    )
+
+def opening_request_key(message: Any, question_submission_summary: Optional[list], question_information: dict, question_access_information: Optional[dict]) -> Optional[str]:
+    """
+    Store key of the opening turn answering this request, None if the message is not an opener or the student
+    already has submissions for the current part (the precomputed answers assume a fresh start).
+    """
+    intent = match_opener_intent(message)
+    if intent is None or not question_information:
+        return None
+    part_id = ((question_access_information or {}).get("currentPart") or {}).get("id")
+    if _has_submissions(question_submission_summary, part_id):
+        return None
+    return opening_turn_key(question_information, part_id, intent)
+
+
+class OpeningTurnStore:
+    """Precomputed opening turns, kept in memory and saved as a JSON file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.turns: dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as file:
+                self.turns = json.load(file)["turns"]
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """Precomputed response of a key, None if it is not in the store."""
+        turn = self.turns.get(key) if key else None
+        return turn["response"] if turn else None
+
+    def put(self, key: str, response: str, **details: Any) -> None:
+        with self._lock:
+            self.turns[key] = {"response": response, "created": round(time.time()), **details}
+
+    def save(self) -> None:
+        with self._lock:
+            with open(self.path, "w") as file:
+                json.dump({"version": 1, "turns": self.turns}, file, indent=2)
+
+
+def precompute_opening_turns(question_information: dict, store: OpeningTurnStore, base_agent: Any = None, intents: Optional[list[str]] = None, refresh: bool = False) -> int:
+    """
+    Generate the opening turns of every part of the question with the base agent (the module agent by default),
+    as for a student starting the part. Keys already in the store are kept unless refresh is set.
+    Returns the number of generated turns.
+    """
+    try:
+        from ..base_agent.base_agent import invoke_base_agent
+        from .parse_json_context_to_prompt import parse_json_to_prompt
+    except ImportError:
+        from src.agents.base_agent.base_agent import invoke_base_agent
+        from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
+
+    generated = 0
+    for part in question_information.get("parts") or []:
+        part_id = part.get("publishedPartId")
+        access_information = {"currentPart": {"id": part_id, "position": part.get("publishedPartPosition")}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            question_prompt = parse_json_to_prompt([], question_information, access_information)
+        for intent in intents or list(OPENER_INTENTS):
+            key = opening_turn_key(question_information, part_id, intent)
+            if not refresh and store.get(key) is not None:
+                continue
+            message = OPENER_INTENTS[intent][0]
+            response = invoke_base_agent(message, [{"type": "user", "content": message}], "", "", question_prompt, f"opening-{key}", base_agent=base_agent)
+            store.put(key, response["output"], intent=intent, part_id=part_id)
+            generated += 1
+    return generated
+
+
+_store: Optional[OpeningTurnStore] = None
+
+def get_opening_turn_store() -> Optional[OpeningTurnStore]:
+    """Process-wide store loaded from OPENING_TURNS_PATH, None if it is not set."""
+    global _store
+    path = os.environ.get("OPENING_TURNS_PATH")
+    if not path:
+        return None
+    if _store is None or _store.path != path:
+        _store = OpeningTurnStore(path)
+    return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("requests", nargs="+", help="request JSON files with params.question_response_details.questionInformation")
+    parser.add_argument("--output", default="opening_turns.json", help="store file, updated if it exists")
+    parser.add_argument("--intents", nargs="+", choices=list(OPENER_INTENTS), help="opener intents to precompute (default: all)")
+    parser.add_argument("--refresh", action="store_true", help="regenerate the turns already in the store")
+    args = parser.parse_args()
+
+    store = OpeningTurnStore(args.output)
+    for path in args.requests:
+        with open(path, "r") as file:
+            question_information = json.load(file)["params"]["question_response_details"]["questionInformation"]
+        start_time = time.perf_counter()
+        generated = precompute_opening_turns(question_information, store, intents=args.intents, refresh=args.refresh)
+        print(f"{path}: {generated} opening turns generated in {time.perf_counter() - start_time:.1f}s")
+        store.save()
+    print(f"{len(store)} opening turns in {args.output}")
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    from .opening_turns import OpeningTurnStore, match_opener_intent, opening_request_key, precompute_opening_turns
+    from .fake_llm import FakeChatModel
+    from ..base_agent.base_agent import BaseAgent, invoke_base_agent
+except ImportError:
+    from src.agents.utils.opening_turns import OpeningTurnStore, match_opener_intent, opening_request_key, precompute_opening_turns
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+
+EXAMPLE_INPUT = os.path.join(os.path.dirname(__file__), "example_inputs", "example_input_1.json")
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+class TestOpeningTurns(unittest.TestCase):
+    """
+    TestCase Class used to test the precomputed opening tutor turns.
+    """
+
+    def setUp(self):
+        with open(EXAMPLE_INPUT, "r") as file:
+            self.details = json.load(file)["params"]["question_response_details"]
+        self.question = self.details["questionInformation"]
+        self.part_id = self.question["parts"][0]["publishedPartId"]
+        self.access = {"currentPart": {"id": self.part_id, "position": 0}}
+        self.agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=None, opening_turns=OpeningTurnStore(os.path.join(tempfile.mkdtemp(), "opening_turns.json")))
+        self.agent.llm = FakeChatModel(response="What is the question asking you to find?")
+
+    def test_match_opener_intent(self):
+        self.assertEqual(match_opener_intent("Hello!"), "greeting")
+        self.assertEqual(match_opener_intent("how do i start"), "how_to_start")
+        self.assertEqual(match_opener_intent("Where should I begin?"), "how_to_start")
+        self.assertEqual(match_opener_intent("I don't understand the question"), "explain_question")
+        self.assertEqual(match_opener_intent("hint please"), "hint")
+        self.assertIsNone(match_opener_intent("how do I start computing the cross product of a and b"))
+        self.assertIsNone(match_opener_intent("hi, is 42 the answer?"))
+
+    def test_precomputed_first_turn_is_served(self):
+        store = self.agent.opening_turns
+        generated = precompute_opening_turns(self.question, store, base_agent=self.agent)
+        self.assertEqual(generated, 4 * len(self.question["parts"]))
+        self.assertEqual(precompute_opening_turns(self.question, store, base_agent=self.agent), 0)
+        store.save()
+        self.assertEqual(len(OpeningTurnStore(store.path)), generated)
+
+        calls = self.agent.llm.calls
+        key = opening_request_key("How should I start?", [], self.question, self.access)
+        response = invoke_base_agent("How should I start?", [{"type": "user", "content": "How should I start?"}], "", "", "", "opening-test", base_agent=self.agent, opening_turn_key=key)
+        self.assertEqual(response["output"], "What is the question asking you to find?")
+        self.assertEqual(self.agent.llm.calls, calls)
+
+        # later turns fall back to the live generation
+        history = [{"type": "user", "content": "hi"}, {"type": "ai", "content": "hello"}, {"type": "user", "content": "How should I start?"}]
+        invoke_base_agent("How should I start?", history, "", "", "", "opening-test", base_agent=self.agent, opening_turn_key=key)
+        self.assertEqual(self.agent.llm.calls, calls + 1)
+
+    def test_no_key_after_submissions_or_for_other_messages(self):
+        submissions = [{"publishedPartId": self.part_id, "totalSubmissions": 2}]
+
+        self.assertIsNone(opening_request_key("How do I start?", submissions, self.question, self.access))
+        self.assertIsNone(opening_request_key("Is the answer 3?", [], self.question, self.access))
+        self.assertIsNotNone(opening_request_key("How do I start?", [], self.question, self.access))
+
+
+if __name__ == "__main__":
+    unittest.main()
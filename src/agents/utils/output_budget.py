@@ -0,0 +1,119 @@
+"""
+Per-request output-length budget of the tutor reply.
+---
+The length of the reply dominates the generation latency, and without a limit it is left to the model.
+With OUTPUT_BUDGET enabled, the tutor call gets a max_tokens budget computed from:
+- the message type: checking an answer needs less than explaining a concept
+- the conversational style of the student: shorter for "concise/brief", longer for "detailed/step by step"
+- the latency target: OUTPUT_LATENCY_TARGET seconds (capped by the remaining request budget) times the
+  tokens per second observed for the model (initially LLM_TOKENS_PER_SECOND)
+
+The achieved tokens per second and whether the reply was cut off by the budget are reported for each reply.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+MESSAGE_TYPE_BUDGETS = {
+    "answer_check": 200,
+    "short_question": 250,
+    "question": 350,
+    "explanation": 500,
+}
+
+_ANSWER_CHECK = re.compile(r"[0-9=]|\b(is (it|this|that|my answer) (right|correct)|did i get|check my|correct\?)")
+_EXPLANATION = re.compile(r"\b(explain|why|derive|derivation|prove|proof|step by step|walk me through|in detail|intuition)\b")
+_CONCISE_STYLE = re.compile(r"\b(concise|brief|short|succinct|direct|to the point|quick)\b")
+_DETAILED_STYLE = re.compile(r"\b(detailed|thorough|in-depth|in depth|step[- ]by[- ]step|elaborate|comprehensive|long)\b")
+# finish reasons of a reply cut off by the output limit (OpenAI/Azure, Google, Anthropic, Ollama)
+_CUT_OFF_REASONS = {"length", "MAX_TOKENS", "max_tokens"}
+
+
+@dataclass
+class OutputBudget:
+    max_tokens: int
+    message_type: str
+    style_factor: float
+    latency_target: Optional[float] = None
+
+
+def output_budget_enabled() -> bool:
+    return os.environ.get("OUTPUT_BUDGET", "").lower() in ("1", "true", "yes")
+
+def message_type(message: Any) -> str:
+    """Type of the student's message deciding its base budget (see MESSAGE_TYPE_BUDGETS)."""
+    text = message.lower() if isinstance(message, str) else ""
+    if _EXPLANATION.search(text):
+        return "explanation"
+    if _ANSWER_CHECK.search(text):
+        return "answer_check"
+    return "short_question" if len(text.split()) <= 12 else "question"
+
+def style_factor(conversational_style: Optional[str]) -> float:
+    """Budget factor of the student's conversational style, 1 if it expresses no length preference."""
+    text = (conversational_style or "").lower()
+    concise, detailed = bool(_CONCISE_STYLE.search(text)), bool(_DETAILED_STYLE.search(text))
+    if concise and not detailed:
+        return 0.6
+    if detailed and not concise:
+        return 1.4
+    return 1.0
+
+def output_budget(message: Any, conversational_style: Optional[str], latency_target: Optional[float] = None, tokens_per_second: Optional[float] = None) -> OutputBudget:
+    """Output budget of a reply, between OUTPUT_MIN_TOKENS (default 64) and OUTPUT_MAX_TOKENS (default 1024)."""
+    kind, factor = message_type(message), style_factor(conversational_style)
+    max_tokens = MESSAGE_TYPE_BUDGETS[kind] * factor
+    if latency_target is not None and tokens_per_second:
+        max_tokens = min(max_tokens, latency_target * tokens_per_second)
+    min_tokens, limit = int(os.environ.get("OUTPUT_MIN_TOKENS", "64")), int(os.environ.get("OUTPUT_MAX_TOKENS", "1024"))
+    return OutputBudget(int(max(min_tokens, min(limit, max_tokens))), kind, factor, latency_target)
+
+def reply_tokens(response: Any) -> int:
+    """Output tokens of a reply: from the provider usage if reported, else estimated (4 characters per token)."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or len(str(getattr(response, "content", ""))) // 4
+
+def output_stats(response: Any, budget: OutputBudget, latency: float) -> dict:
+    """Output tokens, achieved tokens per second and cut-off of a reply generated with the budget."""
+    output_tokens = reply_tokens(response)
+    metadata = getattr(response, "response_metadata", None) or {}
+    finish_reason = metadata.get("finish_reason") or metadata.get("done_reason") or metadata.get("stop_reason")
+    return {
+        "max_tokens": budget.max_tokens,
+        "message_type": budget.message_type,
+        "output_tokens": output_tokens,
+        "tokens_per_second": round(output_tokens / latency, 1) if latency > 0 else None,
+        "cut_off": finish_reason in _CUT_OFF_REASONS,
+    }
+
+
+class ThroughputTracker:
+    """Moving average of the output tokens per second of each model, used for the latency-target budgets."""
+
+    def __init__(self, initial: float, weight: float = 0.2):
+        self.initial = initial
+        self.weight = weight
+        self._lock = threading.Lock()
+        self._tokens_per_second: dict[str, float] = {}
+
+    def tokens_per_second(self, name: str) -> float:
+        return self._tokens_per_second.get(name, self.initial)
+
+    def observe(self, name: str, tokens_per_second: Optional[float]) -> None:
+        if not tokens_per_second:
+            return
+        with self._lock:
+            previous = self._tokens_per_second.get(name)
+            self._tokens_per_second[name] = tokens_per_second if previous is None else (1 - self.weight) * previous + self.weight * tokens_per_second
+
+
+throughput = ThroughputTracker(float(os.environ.get("LLM_TOKENS_PER_SECOND", "50")))
+
+def latency_target(remaining_budget: Optional[float]) -> Optional[float]:
+    """OUTPUT_LATENCY_TARGET seconds, capped by the remaining latency budget of the request."""
+    target = os.environ.get("OUTPUT_LATENCY_TARGET")
+    targets = [value for value in (float(target) if target else None, remaining_budget) if value is not None]
+    return min(targets) if targets else None
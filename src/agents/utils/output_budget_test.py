@@ -0,0 +1,69 @@
+import os
+import unittest
+from unittest.mock import patch
+
+try:
+    from .output_budget import ThroughputTracker, message_type, output_budget, style_factor
+    from .fake_llm import FakeChatModel
+    from ..base_agent.base_agent import BaseAgent, invoke_base_agent
+except ImportError:
+    from src.agents.utils.output_budget import ThroughputTracker, message_type, output_budget, style_factor
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+class TestOutputBudget(unittest.TestCase):
+    """
+    TestCase Class used to test the per-request output budget of the tutor reply.
+    """
+
+    def test_budget_from_message_style_and_latency(self):
+        self.assertEqual(message_type("Can you explain why the cross product is perpendicular?"), "explanation")
+        self.assertEqual(message_type("Is my answer correct? I got x = 4"), "answer_check")
+        self.assertEqual(message_type("what is a vector?"), "short_question")
+        self.assertEqual(style_factor("Prefers concise, direct answers"), 0.6)
+        self.assertEqual(style_factor("Asks for detailed step by step explanations"), 1.4)
+        self.assertEqual(style_factor(""), 1.0)
+
+        explanation = output_budget("Explain why this works", "")
+        self.assertGreater(explanation.max_tokens, output_budget("Explain why this works", "concise").max_tokens)
+        self.assertGreater(explanation.max_tokens, output_budget("I got x = 4", "").max_tokens)
+        # 2 seconds at 40 tokens per second
+        self.assertEqual(output_budget("Explain why this works", "", latency_target=2, tokens_per_second=40).max_tokens, 80)
+        self.assertEqual(output_budget("Explain why this works", "", latency_target=0.1, tokens_per_second=40).max_tokens, 64)
+
+    def test_throughput_moving_average(self):
+        tracker = ThroughputTracker(initial=50, weight=0.5)
+        self.assertEqual(tracker.tokens_per_second("model"), 50)
+        tracker.observe("model", 100)
+        tracker.observe("model", 60)
+        tracker.observe("model", None)
+        self.assertEqual(tracker.tokens_per_second("model"), 80)
+
+    @patch.dict(os.environ, {"OUTPUT_BUDGET": "true", "OUTPUT_MIN_TOKENS": "4", "OUTPUT_MAX_TOKENS": "1024"})
+    def test_reply_is_limited_and_reported(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=None)
+        agent.llm = FakeChatModel(response=" ".join(["word"] * 400))
+
+        response = invoke_base_agent("hi", [{"type": "user", "content": "hi"}], "", "Prefers concise answers", "", "budget-test", base_agent=agent)
+        stats = response["llm_output"]
+        self.assertEqual(stats["max_tokens"], 150)
+        self.assertTrue(stats["cut_off"])
+        self.assertEqual(len(response["output"].split()), 150)
+        self.assertIsNotNone(stats["tokens_per_second"])
+
+        agent.llm = FakeChatModel(response="What do you think?")
+        stats = invoke_base_agent("hi", [{"type": "user", "content": "hi"}], "", "", "", "budget-test", base_agent=agent)["llm_output"]
+        self.assertFalse(stats["cut_off"])
+
+    def test_no_budget_when_disabled(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=None)
+        agent.llm = FakeChatModel(response=" ".join(["word"] * 400))
+        with patch.dict(os.environ, {"OUTPUT_BUDGET": ""}):
+            response = invoke_base_agent("hi", [{"type": "user", "content": "hi"}], "", "", "", "budget-test", base_agent=agent)
+        self.assertNotIn("llm_output", response)
+        self.assertEqual(len(response["output"].split()), 400)
+
+if __name__ == "__main__":
+    unittest.main()
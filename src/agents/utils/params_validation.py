@@ -0,0 +1,218 @@
+"""
+Up-front validation of the chat request (message + params), run by the handler before any LLM work.
+---
+The schema is compiled once into nested checker closures, so a validation is a single walk over the
+request with no object construction or copying. A checker returns None if the value is valid, otherwise
+the path (relative to the value) and the error of the first invalid value; the paths are only built on
+the way back from an error, giving messages such as:
+
+params.question_response_details.questionInformation.parts[0].publishedResponseAreas: expected a list or null, got object
+
+Only the fields read by the chat function are checked. Unknown fields are accepted (and left untouched),
+so new fields sent by the platform do not break the requests; the parser classes ignore them as well.
+The fields the question details parser dereferences (part and response area positions, the current part,
+the worked solution and tutorial sections) are required and not nullable, so any request that passes the
+validation can be parsed. Without server-side conversation state (CHECKPOINTER_URL), the conversation
+history must contain at least one message.
+"""
+
+import os
+from typing import Any, Callable, Optional
+
+try:
+    from .message_normalisation import MESSAGE_TYPES, REMOVE_TYPE
+    from ..agent_registry import agent_variant_names
+except ImportError:
+    from src.agents.utils.message_normalisation import MESSAGE_TYPES, REMOVE_TYPE
+    from src.agents.agent_registry import agent_variant_names
+
+# None if the value is valid, else (relative JSON path, error)
+Checker = Callable[[Any], Optional[tuple[str, str]]]
+
+_JSON_TYPE_NAMES = {dict: "object", list: "list", str: "string", bool: "boolean", int: "integer", float: "number", type(None): "null"}
+
+
+def _type_name(value: Any) -> str:
+    return _JSON_TYPE_NAMES.get(type(value), type(value).__name__)
+
+def _expected(expected: str, value: Any) -> tuple[str, str]:
+    return "", f"expected {expected}, got {_type_name(value)}"
+
+def scalar(*types: type, nullable: bool = True, name: str = "") -> Checker:
+    """Value of one of the types (bool is not accepted as an integer)."""
+    accepted = tuple(types) + ((type(None),) if nullable else ())
+    expected = name or " or ".join(_JSON_TYPE_NAMES.get(t, t.__name__) for t in types) + (" or null" if nullable else "")
+    accepts_bool = bool in types
+
+    def check(value: Any) -> Optional[tuple[str, str]]:
+        if not isinstance(value, accepted) or (value is True or value is False) and not accepts_bool:
+            return _expected(expected, value)
+        return None
+    return check
+
+def list_of(item: Checker, nullable: bool = True) -> Checker:
+    """List whose items all pass the item checker."""
+    expected = "a list or null" if nullable else "a list"
+
+    def check(value: Any) -> Optional[tuple[str, str]]:
+        if value is None and nullable:
+            return None
+        if not isinstance(value, list):
+            return _expected(expected, value)
+        for index, element in enumerate(value):
+            error = item(element)
+            if error:
+                return f"[{index}]{error[0]}", error[1]
+        return None
+    return check
+
+def obj(fields: dict[str, Checker], required: tuple[str, ...] = (), nullable: bool = True) -> Checker:
+    """Object with the given (optional unless required) fields, other keys are accepted."""
+    expected = "an object or null" if nullable else "an object"
+    fields = tuple(fields.items())
+
+    def check(value: Any) -> Optional[tuple[str, str]]:
+        if value is None and nullable:
+            return None
+        if not isinstance(value, dict):
+            return _expected(expected, value)
+        for key in required:
+            if key not in value:
+                return "", f"missing required field '{key}'"
+        for key, field in fields:
+            if key in value:
+                error = field(value[key])
+                if error:
+                    return f".{key}{error[0]}", error[1]
+        return None
+    return check
+
+def _message(value: Any) -> Optional[tuple[str, str]]:
+    if not isinstance(value, dict):
+        # LangChain messages are accepted when the chat module is called directly
+        return None if hasattr(value, "type") and hasattr(value, "content") else _expected("a message object", value)
+    message_type = value.get("type", value.get("role"))
+    if message_type == REMOVE_TYPE:
+        return None
+    if message_type not in MESSAGE_TYPES:
+        return ".type", f"unsupported message type {message_type!r}, expected one of {', '.join([*MESSAGE_TYPES, REMOVE_TYPE])}"
+    if not isinstance(value.get("content"), (str, list)):
+        return ".content", _expected("a string or a list", value.get("content"))[1]
+    return None
+
+def _agent_type(value: Any) -> Optional[tuple[str, str]]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return _expected("a string or null", value)
+    names = agent_variant_names()
+    if value not in names:
+        return "", f"unknown agent type {value!r}, expected one of {', '.join(names)}"
+    return None
+
+
+_string = scalar(str)
+_integer = scalar(int)
+_number = scalar(int, float)
+_boolean = scalar(bool)
+_position = scalar(int, nullable=False)
+_sections = list_of(obj({"id": _string, "title": _string, "content": scalar(str, nullable=False), "position": _integer}, nullable=False))
+
+LATEST_SUBMISSION = obj({
+    "universalResponseAreaId": _string,
+    "feedback": _string,
+    "rawResponse": obj({}),
+})
+
+SUBMISSION_SUMMARY = obj({
+    "publishedPartId": _string,
+    "publishedPartPosition": _integer,
+    "publishedResponseAreaId": _string,
+    "publishedResponseAreaPosition": _integer,
+    "responseAreaUniversalId": _string,
+    "publishedResponseAreaPreResponseText": _string,
+    "publishedResponseType": _string,
+    "publishedResponseConfig": obj({}),
+    "totalSubmissions": _integer,
+    "totalWrongSubmissions": _integer,
+    "latestSubmission": LATEST_SUBMISSION,
+}, nullable=False)
+
+RESPONSE_AREA = obj({
+    "id": _string,
+    "position": _position,
+    "universalResponseAreaId": _string,
+    "preResponseText": _string,
+    "responseType": _string,
+    "Response": obj({}),
+}, required=("position",), nullable=False)
+
+PART = obj({
+    "publishedPartId": _string,
+    "publishedPartPosition": _position,
+    "publishedPartContent": _string,
+    "publishedPartAnswerContent": _string,
+    "publishedWorkedSolutionSections": _sections,
+    "publishedStructuredTutorialSections": _sections,
+    "publishedResponseAreas": list_of(RESPONSE_AREA),
+}, required=("publishedPartPosition",), nullable=False)
+
+QUESTION_INFORMATION = obj({
+    "setName": _string,
+    "setDescription": _string,
+    "questionTitle": _string,
+    "questionGuidance": _string,
+    "questionContent": _string,
+    "durationLowerBound": _number,
+    "durationUpperBound": _number,
+    "parts": list_of(PART),
+})
+
+QUESTION_ACCESS_INFORMATION = obj({
+    "estimatedMinimumTime": _string,
+    "estimaredMaximumTime": _string,
+    "timeTaken": _string,
+    "accessStatus": _string,
+    "markedDone": _string,
+    "currentPart": obj({"id": _string, "position": _position}, required=("position",), nullable=False),
+}, required=("currentPart",))
+
+PARAMS = obj({
+    "conversation_id": scalar(str, int, nullable=False, name="a string or an integer"),
+    "include_test_data": _boolean,
+    "conversation_history": list_of(_message),
+    "summary": _string,
+    "conversational_style": _string,
+    "agent_type": _agent_type,
+    "response_cache": _boolean,
+    "question_response_details": obj({
+        "questionSubmissionSummary": list_of(SUBMISSION_SUMMARY),
+        "questionInformation": QUESTION_INFORMATION,
+        "questionAccessInformation": QUESTION_ACCESS_INFORMATION,
+    }, nullable=False),
+}, required=("conversation_id",), nullable=False)
+
+
+def _has_message(conversation_history: Any) -> bool:
+    """Whether the (valid) history has a message left once the RemoveMessage entries are dropped."""
+    for message in conversation_history or []:
+        message_type = message.get("type", message.get("role")) if isinstance(message, dict) else message.type
+        if message_type != REMOVE_TYPE:
+            return True
+    return False
+
+
+def validate_chat_request(message: Any, params: Any) -> Optional[str]:
+    """
+    Validate the message and params of a chat request.
+    Returns None if the request is valid, otherwise the error message for the 400 response.
+    """
+    if not isinstance(message, str):
+        return f"message: {_expected('a string', message)[1]}"
+    error = PARAMS(params)
+    if error:
+        return f"params{error[0]}: {error[1]}"
+    if not os.environ.get("CHECKPOINTER_URL") and not _has_message(params.get("conversation_history")):
+        # without a checkpointer the agent only sees the messages of the request
+        return "params.conversation_history: expected at least one message, including the latest student message"
+    return None
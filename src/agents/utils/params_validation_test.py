@@ -0,0 +1,98 @@
+import copy
+import json
+import os
+import unittest
+
+try:
+    from .params_validation import validate_chat_request
+    from .parse_json_context_to_prompt import parse_json_to_prompt
+except ImportError:
+    from src.agents.utils.params_validation import validate_chat_request
+    from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
+
+EXAMPLE_INPUTS = os.path.join(os.path.dirname(__file__), "example_inputs")
+
+class TestParamsValidation(unittest.TestCase):
+    """
+    TestCase Class used to test the up-front validation of the chat requests.
+    """
+
+    def setUp(self):
+        self.examples = []
+        for name in sorted(os.listdir(EXAMPLE_INPUTS)):
+            with open(os.path.join(EXAMPLE_INPUTS, name), "r") as file:
+                self.examples.append(json.load(file))
+
+    def test_example_inputs_are_valid(self):
+        for example in self.examples:
+            self.assertIsNone(validate_chat_request(example["message"], example["params"]))
+
+    def test_error_names_the_path(self):
+        params = copy.deepcopy(self.examples[2]["params"])
+        params["question_response_details"]["questionInformation"]["parts"][1]["publishedResponseAreas"] = {"id": "a"}
+
+        error = validate_chat_request("Hi", params)
+
+        self.assertEqual(error, "params.question_response_details.questionInformation.parts[1].publishedResponseAreas: expected a list or null, got object")
+
+    def test_invalid_requests(self):
+        self.assertIn("message", validate_chat_request(None, {"conversation_id": "1"}))
+        self.assertIn("missing required field 'conversation_id'", validate_chat_request("Hi", {}))
+        self.assertIn("params: expected an object", validate_chat_request("Hi", ["conversation_id"]))
+        self.assertIn("params.include_test_data", validate_chat_request("Hi", {"conversation_id": "1", "include_test_data": 1}))
+        self.assertIn("params.conversation_history[1].content", validate_chat_request("Hi", {"conversation_id": "1", "conversation_history": [{"type": "user", "content": "Hi"}, {"role": "ai"}]}))
+
+    def test_fields_the_parser_dereferences_are_required(self):
+        params = self.examples[2]["params"]
+        history_error = "params.conversation_history: expected at least one message"
+        cases = [
+            (history_error, lambda p: p.update(conversation_history=[])),
+            (history_error, lambda p: p.update(conversation_history=None)),
+            (history_error, lambda p: p.update(conversation_history=[{"type": "remove", "content": ""}])),
+            ("params.question_response_details: expected an object, got null", lambda p: p.update(question_response_details=None)),
+            ("params.question_response_details.questionAccessInformation.currentPart: expected an object, got null",
+                lambda p: p["question_response_details"]["questionAccessInformation"].update(currentPart=None)),
+            ("params.question_response_details.questionAccessInformation: missing required field 'currentPart'",
+                lambda p: p["question_response_details"]["questionAccessInformation"].pop("currentPart")),
+            ("params.question_response_details.questionInformation.parts[0]: missing required field 'publishedPartPosition'",
+                lambda p: p["question_response_details"]["questionInformation"]["parts"][0].pop("publishedPartPosition")),
+            ("params.question_response_details.questionInformation.parts[0].publishedWorkedSolutionSections[0]: expected an object, got null",
+                lambda p: p["question_response_details"]["questionInformation"]["parts"][0].update(publishedWorkedSolutionSections=[None])),
+            ("params.question_response_details.questionInformation.parts[0].publishedResponseAreas[0].position: expected integer, got null",
+                lambda p: p["question_response_details"]["questionInformation"]["parts"][0]["publishedResponseAreas"][0].update(position=None)),
+        ]
+        for expected, mutate in cases:
+            with self.subTest(expected=expected):
+                invalid = copy.deepcopy(params)
+                mutate(invalid)
+                self.assertTrue(validate_chat_request("Hi", invalid).startswith(expected))
+
+    def test_valid_requests_can_be_parsed(self):
+        # the optional fields of the question details can be left out or null
+        for mutate in (
+            lambda d: d.update(questionSubmissionSummary=None, questionAccessInformation=None),
+            lambda d: d.update(questionInformation=None),
+            lambda d: d["questionInformation"].update(parts=None),
+            lambda d: d["questionInformation"]["parts"][0].update(publishedWorkedSolutionSections=None, publishedResponseAreas=None, publishedPartContent=None),
+        ):
+            params = copy.deepcopy(self.examples[2]["params"])
+            details = params["question_response_details"]
+            mutate(details)
+            self.assertIsNone(validate_chat_request("Hi", params))
+            self.assertIsInstance(parse_json_to_prompt(details.get("questionSubmissionSummary"), details.get("questionInformation"), details.get("questionAccessInformation")), str)
+
+    def test_unknown_fields_are_accepted_and_parsed(self):
+        params = copy.deepcopy(self.examples[2]["params"])
+        details = params["question_response_details"]
+        params["new_platform_field"] = {"anything": [1, 2]}
+        details["questionInformation"]["parts"][0]["publishedPartHint"] = "new"
+        details["questionAccessInformation"]["currentPart"]["newField"] = True
+        details["questionSubmissionSummary"][0]["latestSubmission"]["newField"] = 1
+
+        self.assertIsNone(validate_chat_request("Hi", params))
+        prompt = parse_json_to_prompt(details["questionSubmissionSummary"], details["questionInformation"], details["questionAccessInformation"])
+        self.assertIn(details["questionInformation"]["questionTitle"], prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
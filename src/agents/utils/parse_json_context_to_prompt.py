@@ -1,8 +1,11 @@
 """
 Refactored JSON to prompt parser using improved, clearer structure.
+Unknown keys in the JSON are ignored, so new fields sent by the platform do not break the parsing.
+The rendering time is linear in the size of the question details (the submissions are indexed by response area once),
+and the answers and submissions are capped in the prompt (see PromptFormatter.format_value()).
 """
 
-from typing import List, Optional, Dict, Any, Union
+from typing import Iterable, List, Optional, Dict, Any, Union
 from .prompt_context_templates import PromptFormatter
 
 # Definitions questionSubmissionSummary type
@@ -14,6 +17,7 @@ class StudentLatestSubmission:
         submission: Optional[str] = None,
         feedback: Optional[str] = None,
         rawResponse: Optional[dict] = None,
+        **_unknown: Any,
     ):
         self.universalResponseAreaId = universalResponseAreaId
         self.answer = answer
@@ -35,6 +39,7 @@ class StudentWorkResponseArea:
         totalSubmissions: Optional[int] = None,
         totalWrongSubmissions: Optional[int] = None,
         latestSubmission: Optional[StudentLatestSubmission] = None,
+        **_unknown: Any,
     ):
         self.publishedPartId = publishedPartId
         self.publishedPartPosition = publishedPartPosition
@@ -59,6 +64,7 @@ class ResponseAreaDetails:
         responseType: Optional[str] = None,
         answer: Optional[dict] = None,
         Response: Optional[dict] = None,
+        **_unknown: Any,
     ):
         self.id = id
         self.position = position
@@ -78,6 +84,7 @@ class PartDetails:
         publishedWorkedSolutionSections: Optional[List[dict]] = [],
         publishedStructuredTutorialSections: Optional[List[dict]] = [],
         publishedResponseAreas: Optional[List[Optional[ResponseAreaDetails]]] = [],
+        **_unknown: Any,
     ):
         self.publishedPartId = publishedPartId
         self.publishedPartPosition = publishedPartPosition
@@ -85,7 +92,7 @@ class PartDetails:
         self.publishedPartAnswerContent = publishedPartAnswerContent
         self.publishedWorkedSolutionSections = publishedWorkedSolutionSections
         self.publishedStructuredTutorialSections = publishedStructuredTutorialSections
-        self.publishedResponseAreas = [ResponseAreaDetails(**publishedResponseArea) for publishedResponseArea in publishedResponseAreas]
+        self.publishedResponseAreas = [ResponseAreaDetails(**publishedResponseArea) for publishedResponseArea in publishedResponseAreas or []]
 
 class QuestionDetails:
     def __init__(
@@ -100,6 +107,7 @@ class QuestionDetails:
         durationLowerBound: Optional[int] = None,
         durationUpperBound: Optional[int] = None,
         parts: Optional[List[PartDetails]] = [],
+        **_unknown: Any,
     ):
         self.setNumber = setNumber
         self.setName = setName
@@ -110,7 +118,7 @@ class QuestionDetails:
         self.questionContent = questionContent
         self.durationLowerBound = durationLowerBound
         self.durationUpperBound = durationUpperBound
-        self.parts = [PartDetails(**part) for part in parts] 
+        self.parts = [PartDetails(**part) for part in parts or []]
 
 # questionAccessInformation type
 class CurrentPart:
@@ -120,7 +128,8 @@ class CurrentPart:
         position: int = None, 
         universalPartId: Optional[str] = None,
         timeTakenPart: Optional[str] = None, 
-        markedDonePart: Optional[str] = None
+        markedDonePart: Optional[str] = None,
+        **_unknown: Any,
     ):
         self.id = id
         self.position = position
@@ -137,19 +146,26 @@ class QuestionAccessInformation:
         accessStatus: Optional[str] = None,
         markedDone: Optional[str] = None,
         currentPart: Optional[Dict[str, Union[str, int]]] = {},
+        **_unknown: Any,
     ):
         self.estimatedMinimumTime = estimatedMinimumTime
         self.estimaredMaximumTime = estimaredMaximumTime
         self.timeTaken = timeTaken
         self.accessStatus = accessStatus
         self.markedDone = markedDone
-        self.currentPart = CurrentPart(**currentPart)
+        self.currentPart = CurrentPart(**(currentPart or {}))
+
+
+def section_key(part_id: Optional[str], kind: str, section: dict) -> str:
+    """Identifier of a worked solution ('worked_solution') or tutorial ('tutorial') section within a question."""
+    return f"{part_id}:{kind}:{section.get('id') or section.get('position', 0)}"
 
 
 def parse_json_to_structured_prompt(
     question_submission_summary: Optional[List[StudentWorkResponseArea]],
     question_information: Optional[QuestionDetails],
-    question_access_information: Optional[QuestionAccessInformation]
+    question_access_information: Optional[QuestionAccessInformation],
+    selected_sections: Optional[set] = None
 ) -> Optional[str]:
     """
     Parse JSON data into a well-structured, LLM-friendly prompt.
@@ -158,6 +174,7 @@ def parse_json_to_structured_prompt(
         question_submission_summary: Student's work and submissions
         question_information: Question details and structure
         question_access_information: Current progress and timing info
+        selected_sections: If given, only the worked solution and tutorial sections with these section_key() are included
         
     Returns:
         Formatted prompt string or error message
@@ -167,7 +184,7 @@ def parse_json_to_structured_prompt(
         return PromptFormatter.format_error_message()
     
     # Convert to proper objects
-    submission_summary = [StudentWorkResponseArea(**summary) for summary in question_submission_summary]
+    submission_summary = _index_submissions(StudentWorkResponseArea(**summary) for summary in question_submission_summary or [])
     question_info = QuestionDetails(**question_information)
     access_info = QuestionAccessInformation(**question_access_information) if question_access_information else None
     
@@ -219,7 +236,8 @@ def parse_json_to_structured_prompt(
         sections.append(_format_single_part(
             part, 
             access_info.currentPart if access_info else None,
-            submission_summary
+            submission_summary,
+            selected_sections
         ))
     
     # 4. Combine into final prompt
@@ -229,7 +247,8 @@ def parse_json_to_structured_prompt(
 def _format_single_part(
     part: PartDetails, 
     current_part: Optional[CurrentPart],
-    submissions: List[StudentWorkResponseArea]
+    submissions: Dict[Optional[str], StudentWorkResponseArea],
+    selected_sections: Optional[set] = None
 ) -> str:
     """Format a single part with all its components."""
     
@@ -274,6 +293,8 @@ def _format_single_part(
     solutions_data = []
     if part.publishedWorkedSolutionSections:
         for ws in part.publishedWorkedSolutionSections:
+            if selected_sections is not None and section_key(part.publishedPartId, 'worked_solution', ws) not in selected_sections:
+                continue
             solutions_data.append({
                 'title': ws.get('title', ''),
                 'content': ws.get('content', ''),
@@ -284,6 +305,8 @@ def _format_single_part(
     tutorial_data = []
     if part.publishedStructuredTutorialSections:
         for ts in part.publishedStructuredTutorialSections:
+            if selected_sections is not None and section_key(part.publishedPartId, 'tutorial', ts) not in selected_sections:
+                continue
             tutorial_data.append({
                 'title': ts.get('title', ''),
                 'content': ts.get('content', ''),
@@ -296,23 +319,31 @@ def _format_single_part(
     return "\n".join(part_sections) + "\n---\n"
 
 
+def _index_submissions(submissions: Iterable[StudentWorkResponseArea]) -> Dict[Optional[str], StudentWorkResponseArea]:
+    """First submission with a latest submission of each response area, by response area id."""
+    
+    index = {}
+    for submission in submissions:
+        if submission.latestSubmission and submission.publishedResponseAreaId not in index:
+            index[submission.publishedResponseAreaId] = submission
+    return index
+
+
 def _extract_student_work_for_area(
     response_area: ResponseAreaDetails, 
-    submissions: List[StudentWorkResponseArea]
+    submissions: Dict[Optional[str], StudentWorkResponseArea]
 ) -> Dict[str, Any]:
     """Extract student work data for a specific response area."""
     
-    for submission in submissions:
-        if (submission.publishedResponseAreaId == response_area.id and 
-            submission.latestSubmission):
-            
-            return {
-                'has_submissions': True,
-                'latest_response': submission.latestSubmission.submission,
-                'latest_feedback': submission.latestSubmission.feedback,
-                'total_submissions': submission.totalSubmissions,
-                'total_wrong': submission.totalWrongSubmissions
-            }
+    submission = submissions.get(response_area.id)
+    if submission:
+        return {
+            'has_submissions': True,
+            'latest_response': submission.latestSubmission.submission,
+            'latest_feedback': submission.latestSubmission.feedback,
+            'total_submissions': submission.totalSubmissions,
+            'total_wrong': submission.totalWrongSubmissions
+        }
     
     return {'has_submissions': False}
 
@@ -321,7 +352,8 @@ def _extract_student_work_for_area(
 def parse_json_to_prompt(
     questionSubmissionSummary: Optional[List[StudentWorkResponseArea]],
     questionInformation: Optional[QuestionDetails],
-    questionAccessInformation: Optional[QuestionAccessInformation]
+    questionAccessInformation: Optional[QuestionAccessInformation],
+    selected_sections: Optional[set] = None
 ) -> Optional[str]:
     """
     Legacy wrapper for backward compatibility.
@@ -330,5 +362,6 @@ def parse_json_to_prompt(
     return parse_json_to_structured_prompt(
         questionSubmissionSummary,
         questionInformation,
-        questionAccessInformation
+        questionAccessInformation,
+        selected_sections
     )
@@ -0,0 +1,141 @@
+import random
+import string
+import time
+import unittest
+
+try:
+    from .parse_json_context_to_prompt import parse_json_to_structured_prompt
+    from .prompt_context_templates import PromptFormatter, VALUE_MAX_CHARS
+except ImportError:
+    from src.agents.utils.parse_json_context_to_prompt import parse_json_to_structured_prompt
+    from src.agents.utils.prompt_context_templates import PromptFormatter, VALUE_MAX_CHARS
+
+ANSWER_PREFIX = "- Expected Answer (confidential): "
+
+
+def random_text(rng: random.Random, max_length: int = 40) -> str:
+    return "".join(rng.choice(string.ascii_letters + string.digits + " $\\{}'\"") for _ in range(rng.randint(0, max_length)))
+
+def random_value(rng: random.Random, depth: int = 0):
+    """Random JSON value of a response area answer or config, with nested dicts and lists."""
+    kind = rng.choice(["text", "number", "bool", "null", "dict", "list"] if depth < 4 else ["text", "number"])
+    if kind == "text":
+        return random_text(rng)
+    if kind == "number":
+        return rng.choice([rng.randint(-1000, 1000), rng.uniform(-1, 1)])
+    if kind == "bool":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    if kind == "dict":
+        return {random_text(rng, 10): random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 5))]
+
+def random_payload(rng: random.Random, nr_parts: int, nr_areas: int = 2, nr_sections: int = 2, answer=None, section_length: int = 200) -> tuple:
+    """Valid question details (submission summary, question information, access information) of the given size."""
+    parts, submissions = [], []
+    for p in range(nr_parts):
+        areas = []
+        for a in range(nr_areas):
+            area_id = f"area-{p}-{a}"
+            areas.append({"id": area_id, "position": a, "preResponseText": random_text(rng), "responseType": "EXPRESSION",
+                          "answer": answer if answer is not None else random_value(rng)})
+            if rng.random() < 0.7:
+                submissions.append({"publishedPartId": f"part-{p}", "publishedResponseAreaId": area_id, "publishedResponseConfig": random_value(rng),
+                                    "totalSubmissions": rng.randint(1, 9), "totalWrongSubmissions": rng.randint(0, 9),
+                                    "latestSubmission": {"submission": random_value(rng), "feedback": random_text(rng)}})
+        parts.append({
+            "publishedPartId": f"part-{p}",
+            "publishedPartPosition": p,
+            "publishedPartContent": random_text(rng, 200),
+            "publishedPartAnswerContent": random_text(rng),
+            "publishedWorkedSolutionSections": [{"id": f"ws-{p}-{s}", "position": s, "title": f"Step {s}", "content": "x" * section_length} for s in range(nr_sections)],
+            "publishedStructuredTutorialSections": [{"id": f"ts-{p}-{s}", "position": s, "title": f"Hint {s}", "content": "y" * section_length} for s in range(nr_sections)],
+            "publishedResponseAreas": areas,
+        })
+    rng.shuffle(submissions)
+    question = {"setNumber": 0, "setName": "Vectors", "questionNumber": 0, "questionTitle": "Dot product", "questionGuidance": "",
+                "questionContent": random_text(rng, 200), "durationLowerBound": 5, "durationUpperBound": 10, "parts": parts}
+    access = {"timeTaken": "10 minutes", "currentPart": {"id": "part-0", "position": 0}}
+    return submissions, question, access
+
+def render_time(payload: tuple) -> float:
+    """Best of three render times."""
+    times = []
+    for _ in range(3):
+        start_time = time.perf_counter()
+        parse_json_to_structured_prompt(*payload)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+class TestQuestionContextParser(unittest.TestCase):
+    """
+    TestCase Class used to test the question details parser on generated payloads.
+    ---
+    Random valid payloads (seeded) check the properties of the prompt; large ones check its render time and size.
+    """
+
+    def test_random_payloads(self):
+        for seed in range(100):
+            rng = random.Random(seed)
+            payload = random_payload(rng, nr_parts=rng.randint(1, 30), nr_areas=rng.randint(0, 4), nr_sections=rng.randint(0, 3))
+            prompt = parse_json_to_structured_prompt(*payload)
+
+            for part in payload[1]["parts"]:
+                letter = PromptFormatter.get_part_letter(part["publishedPartPosition"])
+                self.assertIn(f"## Part ({letter})", prompt)
+            self.assertEqual(prompt.count("#### Response Area "), sum(len(part["publishedResponseAreas"]) for part in payload[1]["parts"]))
+            for line in prompt.splitlines():
+                if line.startswith(ANSWER_PREFIX):
+                    self.assertLessEqual(len(line), len(ANSWER_PREFIX) + VALUE_MAX_CHARS + len("... [truncated]"))
+
+    def test_small_values_render_as_str(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            value = random_value(rng)
+            if len(str(value)) <= VALUE_MAX_CHARS:
+                self.assertEqual(PromptFormatter.format_value(value), str(value))
+
+    def test_oversized_values_are_capped(self):
+        nested = {"value": 1}
+        for _ in range(5000):
+            nested = {"child": nested}
+        wide = {f"key-{i}": list(range(100)) for i in range(100000)}
+
+        for value in (nested, wide, ["x" * 10 ** 6], "y" * 10 ** 6):
+            start_time = time.perf_counter()
+            text = PromptFormatter.format_value(value)
+            self.assertLess(time.perf_counter() - start_time, 0.1)
+            self.assertLessEqual(len(text), VALUE_MAX_CHARS + len("... [truncated]"))
+        self.assertIn("{...}", PromptFormatter.format_value(nested))
+        self.assertIn("(+99950 more)", PromptFormatter.format_value(wide, max_chars=10 ** 6))
+
+        prompt = parse_json_to_structured_prompt(*random_payload(random.Random(0), nr_parts=1, nr_areas=1, answer=wide))
+        self.assertLess(len(prompt), 10000)
+
+    def test_part_letters(self):
+        self.assertEqual([PromptFormatter.get_part_letter(position) for position in (0, 1, 25, 26, 27, 701, 702)], ["a", "b", "z", "aa", "ab", "zz", "aaa"])
+
+    def test_render_time_is_linear(self):
+        rng = random.Random(0)
+        # parts, response areas and submissions grow together
+        small, large = random_payload(rng, nr_parts=100, nr_areas=4), random_payload(rng, nr_parts=800, nr_areas=4)
+        self.assertLess(render_time(large) / render_time(small), 8 * 2.5)
+
+        # large worked solutions
+        small, large = random_payload(rng, nr_parts=10, section_length=10 ** 4), random_payload(rng, nr_parts=10, section_length=8 * 10 ** 4)
+        self.assertLess(render_time(large) / render_time(small), 8 * 2.5)
+
+    def test_output_size_is_bounded(self):
+        rng = random.Random(1)
+        submissions, question, access = random_payload(rng, nr_parts=500, nr_areas=4, nr_sections=3)
+        prompt = parse_json_to_structured_prompt(submissions, question, access)
+
+        content_size = sum(len(part["publishedPartContent"]) + len(part["publishedPartAnswerContent"]) + sum(len(section["content"]) for section in part["publishedWorkedSolutionSections"] + part["publishedStructuredTutorialSections"])
+                           for part in question["parts"])
+        nr_areas = sum(len(part["publishedResponseAreas"]) for part in question["parts"])
+        # the content itself, a bounded rendering per response area and a constant overhead per part and section
+        self.assertLess(len(prompt), content_size + nr_areas * 3 * (VALUE_MAX_CHARS + 200) + len(question["parts"]) * 1000)
+
+if __name__ == "__main__":
+    unittest.main()
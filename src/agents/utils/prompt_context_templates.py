@@ -1,12 +1,77 @@
 """
 Improved prompt templates with clearer structure for LLM consumption.
 Uses hierarchical organization and consistent formatting.
+Answers and student work are rendered with format_value(), which caps their size (PROMPT_VALUE_MAX_CHARS),
+so an oversized or deeply nested answer config cannot blow up the prompt.
 """
 
+import itertools
+import os
 from typing import Optional, List, Dict, Any
 
+# rendering limits of an answer or a student submission
+VALUE_MAX_CHARS = int(os.environ.get("PROMPT_VALUE_MAX_CHARS") or 2000)
+VALUE_MAX_DEPTH = 8
+VALUE_MAX_ITEMS = 50
+
 class PromptFormatter:
     """Centralized prompt formatting with clear structure."""
+
+    @staticmethod
+    def format_value(value: Any, max_chars: int = VALUE_MAX_CHARS) -> str:
+        """
+        Render a value as str() does, within max_chars characters.
+        Larger values are summarised: containers deeper than VALUE_MAX_DEPTH or longer than VALUE_MAX_ITEMS
+        are elided and the text is cut off at max_chars, in time bounded by max_chars rather than the value size.
+        """
+        if isinstance(value, str):
+            text = value
+        else:
+            parts: List[str] = []
+            PromptFormatter._render(value, parts, 0, [max_chars + 1])
+            text = "".join(parts)
+        if len(text) <= max_chars:
+            return text
+        return f"{text[:max_chars]}... [truncated]"
+
+    @staticmethod
+    def _render(value: Any, parts: List[str], depth: int, budget: List[int]) -> None:
+        """Append the repr of a JSON value to parts until the character budget is spent."""
+        if budget[0] <= 0:
+            return
+        if isinstance(value, dict):
+            items = [(f"{key!r}: ", item) for key, item in itertools.islice(value.items(), VALUE_MAX_ITEMS)]
+            brackets = "{}"
+        elif isinstance(value, list):
+            items = [("", item) for item in value[:VALUE_MAX_ITEMS]]
+            brackets = "[]"
+        else:
+            text = repr(value[:budget[0]]) if isinstance(value, str) else str(value)
+            text = text[:budget[0]]
+            budget[0] -= len(text)
+            parts.append(text)
+            return
+
+        if depth >= VALUE_MAX_DEPTH and value:
+            text = f"{brackets[0]}...{brackets[1]}"
+            budget[0] -= len(text)
+            parts.append(text)
+            return
+        parts.append(brackets[0])
+        budget[0] -= 1
+        for index, (prefix, item) in enumerate(items):
+            if budget[0] <= 0:
+                return
+            separator = ", " if index else ""
+            parts.append(separator + prefix)
+            budget[0] -= len(separator) + len(prefix)
+            PromptFormatter._render(item, parts, depth + 1, budget)
+        if len(value) > VALUE_MAX_ITEMS:
+            text = f", ... (+{len(value) - VALUE_MAX_ITEMS} more)"
+            parts.append(text)
+            budget[0] -= len(text)
+        parts.append(brackets[1])
+        budget[0] -= 1
     
     @staticmethod
     def format_error_message() -> str:
@@ -157,7 +222,7 @@ Use British English spellings.
         task_text = f"- Task: {task_description}" if task_description else "- Task: Not specified"
         
         # Format expected answer (keep secret)
-        answer_text = f"- Expected Answer (confidential): {expected_answer}"
+        answer_text = f"- Expected Answer (confidential): {PromptFormatter.format_value(expected_answer)}"
         
         # Format student submissions
         submission_text = PromptFormatter._format_student_submissions(student_work)
@@ -176,8 +241,8 @@ Use British English spellings.
         if not student_work.get('has_submissions'):
             return "- Your Work: No responses submitted yet"
         
-        latest = student_work.get('latest_response', 'None')
-        feedback = student_work.get('latest_feedback', 'None')
+        latest = PromptFormatter.format_value(student_work.get('latest_response', 'None'))
+        feedback = PromptFormatter.format_value(student_work.get('latest_feedback', 'None'))
         total = student_work.get('total_submissions', 0)
         wrong = student_work.get('total_wrong', 0)
         
@@ -251,8 +316,13 @@ I have detailed information about your current question, including your progress
 
     @staticmethod
     def get_part_letter(position: int) -> str:
-        """Convert position to lowercase letter (1-indexed)."""
-        return chr(96 + (position + 1))
+        """Convert position to lowercase letter (1-indexed), continuing with aa, ab, ... after z."""
+        letters = ""
+        position += 1
+        while position > 0:
+            position, remainder = divmod(position - 1, 26)
+            letters = chr(97 + remainder) + letters
+        return letters
 
 
 # Legacy function wrappers for backward compatibility
@@ -0,0 +1,115 @@
+"""
+Retrieval of the worked solution and tutorial sections relevant to the student's message.
+---
+Instead of putting every section of every part into the tutor prompt, the sections are chunked and
+embedded into a local persistent vector index (Chroma) and each turn only keeps the top-k sections
+for the student's message within the current part.
+
+Chunk ids are content hashes, so a section is embedded once: re-indexing a new version of a question
+only embeds the new or changed chunks and removes the stale ones.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Iterator, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+try:
+    from .parse_json_context_to_prompt import section_key
+except ImportError:
+    from src.agents.utils.parse_json_context_to_prompt import section_key
+
+SECTION_KINDS = {
+    "worked_solution": "publishedWorkedSolutionSections",
+    "tutorial": "publishedStructuredTutorialSections",
+}
+
+def _hash(*values: Any) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def question_key(question_information: dict) -> str:
+    """Stable identifier of a question across versions, from the ids of its parts."""
+    return _hash(sorted(str(part.get("publishedPartId")) for part in question_information.get("parts") or []))[:32]
+
+
+class QuestionSectionRetriever:
+    """Local vector index of the question sections, queried per student message and current part."""
+
+    def __init__(self, embedding: Embeddings, persist_directory: Optional[str] = None, top_k: int = 4, chunk_size: int = 1000, chunk_overlap: int = 100):
+        from langchain_chroma import Chroma
+
+        self.top_k = top_k
+        self._store = Chroma(collection_name="question_sections", embedding_function=embedding, persist_directory=persist_directory)
+        self._splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._indexed_versions: dict[str, str] = {}
+
+    def _chunks(self, key: str, question_information: dict) -> Iterator[tuple[str, str, dict]]:
+        """(chunk id, text, metadata) of every chunk of every section of the question."""
+        for part in question_information.get("parts") or []:
+            part_id = part.get("publishedPartId")
+            for kind, field in SECTION_KINDS.items():
+                for section in part.get(field) or []:
+                    text = f"{section.get('title', '')}\n\n{section.get('content', '')}".strip()
+                    for i, chunk in enumerate(self._splitter.split_text(text)):
+                        metadata = {"question_key": key, "part_id": str(part_id), "section_key": section_key(part_id, kind, section)}
+                        yield _hash(key, metadata["section_key"], i, chunk), chunk, metadata
+
+    def index_question(self, question_information: dict) -> str:
+        """Bring the index up to date with this version of the question. Returns the question key."""
+        key = question_key(question_information)
+        chunks = {chunk_id: (text, metadata) for chunk_id, text, metadata in self._chunks(key, question_information)}
+        version = _hash(sorted(chunks))
+        if self._indexed_versions.get(key) == version:
+            return key
+
+        existing_ids = set(self._store.get(where={"question_key": key}, include=[])["ids"])
+        stale_ids = existing_ids - chunks.keys()
+        new_ids = [chunk_id for chunk_id in chunks if chunk_id not in existing_ids]
+        if stale_ids:
+            self._store.delete(ids=list(stale_ids))
+        if new_ids:
+            # only the new or changed chunks are embedded
+            self._store.add_texts(
+                texts=[chunks[chunk_id][0] for chunk_id in new_ids],
+                metadatas=[chunks[chunk_id][1] for chunk_id in new_ids],
+                ids=new_ids,
+            )
+        self._indexed_versions[key] = version
+        return key
+
+    def select_sections(self, question_information: dict, query: str, current_part_id: Optional[str] = None) -> Optional[set]:
+        """
+        section_key() of the top-k sections relevant to the query, within the current part if known.
+        None (include all the sections) if no section of the question, or of the current part, is indexed:
+        an empty selection would leave every worked solution and tutorial section out of the prompt.
+        """
+        key = self.index_question(question_information)
+        where: dict = {"question_key": key}
+        if current_part_id:
+            where = {"$and": [{"question_key": key}, {"part_id": str(current_part_id)}]}
+        documents = self._store.similarity_search(query, k=self.top_k, filter=where)
+        return {document.metadata["section_key"] for document in documents} or None
+
+
+_retriever: Optional[QuestionSectionRetriever] = None
+
+def retrieval_enabled() -> bool:
+    return os.environ.get("QUESTION_RETRIEVAL", "").lower() in ("1", "true", "yes")
+
+def get_retriever() -> QuestionSectionRetriever:
+    """Process-wide retriever configured by RETRIEVAL_INDEX_DIR, RETRIEVAL_TOP_K and EMBEDDING_PROVIDER."""
+    global _retriever
+    if _retriever is None:
+        try:
+            from ..llm_factory import get_embedding
+        except ImportError:
+            from src.agents.llm_factory import get_embedding
+        _retriever = QuestionSectionRetriever(
+            get_embedding(),
+            persist_directory=os.environ.get("RETRIEVAL_INDEX_DIR", "/tmp/question_index"),
+            top_k=int(os.environ.get("RETRIEVAL_TOP_K", "4")),
+        )
+    return _retriever
@@ -0,0 +1,86 @@
+import copy
+import tempfile
+import unittest
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+try:
+    from .question_retrieval import QuestionSectionRetriever
+    from .parse_json_context_to_prompt import parse_json_to_prompt
+except ImportError:
+    from src.agents.utils.question_retrieval import QuestionSectionRetriever
+    from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embedding counting the embedded texts."""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+def question(worked_solutions: list[list[str]]) -> dict:
+    return {
+        "questionTitle": "Dot Product",
+        "parts": [
+            {
+                "publishedPartId": f"part-{i}",
+                "publishedPartPosition": i,
+                "publishedPartContent": f"Part {i} content",
+                "publishedWorkedSolutionSections": [
+                    {"id": f"ws-{i}-{j}", "position": j, "title": "", "content": content} for j, content in enumerate(sections)
+                ],
+                "publishedResponseAreas": [],
+            }
+            for i, sections in enumerate(worked_solutions)
+        ],
+    }
+
+class TestQuestionSectionRetriever(unittest.TestCase):
+    """
+    TestCase Class used to test the retrieval of the question sections.
+    ---
+    A deterministic fake embedding and a temporary Chroma index are used.
+    """
+
+    def setUp(self):
+        self.embedding = CountingEmbedding(size=32)
+        self.retriever = QuestionSectionRetriever(self.embedding, persist_directory=tempfile.mkdtemp(), top_k=1)
+        self.question = question([["multiply the components", "sum the products"], ["subtract the vectors"]])
+
+    def test_unchanged_question_is_embedded_once(self):
+        self.retriever.index_question(self.question)
+        self.retriever.index_question(copy.deepcopy(self.question))
+
+        self.assertEqual(self.embedding.embedded, 3)
+
+    def test_new_version_only_embeds_changed_sections(self):
+        self.retriever.index_question(self.question)
+        updated = copy.deepcopy(self.question)
+        updated["parts"][1]["publishedWorkedSolutionSections"][0]["content"] = "subtract b from a"
+        self.retriever.index_question(updated)
+
+        self.assertEqual(self.embedding.embedded, 4)
+        selected = self.retriever.select_sections(updated, "subtract b from a", "part-1")
+        self.assertEqual(selected, {"part-1:worked_solution:ws-1-0"})
+
+    def test_selection_is_scoped_to_the_current_part(self):
+        selected = self.retriever.select_sections(self.question, "subtract the vectors", "part-0")
+
+        self.assertEqual(len(selected), 1)
+        self.assertTrue(next(iter(selected)).startswith("part-0:"))
+
+    def test_nothing_indexed_selects_all_sections(self):
+        self.assertIsNone(self.retriever.select_sections(self.question, "subtract the vectors", "part-unknown"))
+        self.assertIsNone(self.retriever.select_sections(question([[], []]), "subtract the vectors", "part-0"))
+
+        prompt = parse_json_to_prompt([], self.question, {}, self.retriever.select_sections(self.question, "subtract the vectors", "part-unknown"))
+        self.assertIn("multiply the components", prompt)
+        self.assertIn("subtract the vectors", prompt)
+
+    def test_prompt_only_includes_selected_sections(self):
+        prompt = parse_json_to_prompt([], self.question, {}, {"part-0:worked_solution:ws-0-1"})
+
+        self.assertIn("sum the products", prompt)
+        self.assertNotIn("multiply the components", prompt)
+        self.assertNotIn("subtract the vectors", prompt)
@@ -0,0 +1,188 @@
+"""
+Semantic cache of the tutor responses to the opening messages of a conversation.
+---
+Across a cohort, many students open a conversation about the same question part with a paraphrase of
+the same question. On the first turns the tutor's answer depends on the question context, the student's
+submissions (their latest response and feedback are in the prompt) and the student's message, so a response
+generated for one student can be served to the others with the same submissions, e.g. all fresh starts:
+
+- the student's message is embedded with the configured embedding client (EMBEDDING_PROVIDER)
+- the lookup is scoped to the question version, the current part and the submission state (cache_scope())
+- a cached response is returned if its message is at least RESPONSE_CACHE_THRESHOLD similar (cosine)
+
+Each scope keeps at most RESPONSE_CACHE_MAX_ENTRIES responses in a fixed-size vector matrix; the least
+recently used response is evicted when it is full, and responses older than RESPONSE_CACHE_TTL seconds
+are not served. At this size an exact scan is a single matrix product, as fast as an approximate index.
+Hits, misses and evictions are counted for the hit-rate metrics (stats()).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from .single_flight import request_key
+except ImportError:
+    from src.agents.utils.single_flight import request_key
+
+
+def submission_state(question_submission_summary: Optional[list]) -> list:
+    """Fields of the student's submissions rendered in the tutor prompt, by response area."""
+    state = []
+    for area in question_submission_summary or []:
+        latest = area.get("latestSubmission")
+        if latest:
+            state.append([area.get("publishedResponseAreaId"), latest.get("submission"), latest.get("feedback"), area.get("totalSubmissions"), area.get("totalWrongSubmissions")])
+    return sorted(state, key=lambda entry: str(entry[0]))
+
+def cache_scope(question_information: dict, current_part_id: Optional[str], question_submission_summary: Optional[list] = None) -> str:
+    """
+    Scope of the cached responses: a hash of the question content (any edit is a new version), the current part
+    and the student's submissions. Without submissions, the scope of a fresh start is shared by all the students.
+    """
+    state = submission_state(question_submission_summary)
+    if not state:
+        return request_key(question_information, current_part_id)
+    return request_key(question_information, current_part_id, state)
+
+
+@dataclass
+class CacheLookup:
+    """Result of a lookup, passed back to store() on a miss so the message is not embedded twice."""
+    scope: str
+    vector: np.ndarray
+    response: Optional[str] = None
+    similarity: float = 0.0
+
+
+class _ScopeIndex:
+    """Fixed-capacity matrix of the normalised message vectors of a scope, with their responses."""
+
+    def __init__(self, dimension: int, capacity: int):
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.responses: list[Optional[str]] = [None] * capacity
+        self.created = np.zeros(capacity)
+        self.last_used = np.zeros(capacity)
+        self.size = 0
+
+
+class SemanticResponseCache:
+    """Per-scope semantic cache of tutor responses, shared by the conversations of the process."""
+
+    def __init__(self, embedding: Embeddings, threshold: float = 0.92, max_entries: int = 256, ttl: Optional[float] = None, max_scopes: int = 1024):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self._lock = threading.Lock()
+        self._scopes: OrderedDict[str, _ScopeIndex] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalise(vector: list[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _search(self, scope: str, vector: np.ndarray) -> CacheLookup:
+        lookup = CacheLookup(scope, vector)
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is not None and index.size:
+                self._scopes.move_to_end(scope)
+                similarities = index.vectors[:index.size] @ vector
+                now = time.monotonic()
+                if self.ttl is not None:
+                    similarities[index.created[:index.size] < now - self.ttl] = -np.inf
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    index.last_used[best] = now
+                    lookup.response, lookup.similarity = index.responses[best], float(similarities[best])
+            if lookup.response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return lookup
+
+    def lookup(self, scope: str, message: str) -> CacheLookup:
+        """Cached response of the most similar message of the scope (response None on a miss)."""
+        return self._search(scope, self._normalise(self.embedding.embed_query(message)))
+
+    async def alookup(self, scope: str, message: str) -> CacheLookup:
+        """Async version of lookup(), awaiting the embedding."""
+        return self._search(scope, self._normalise(await self.embedding.aembed_query(message)))
+
+    def store(self, lookup: CacheLookup, response: str) -> None:
+        """Cache the response generated after a miss, evicting the least recently used (or expired) response of a full scope."""
+        if not response:
+            return
+        with self._lock:
+            index = self._scopes.get(lookup.scope)
+            if index is None:
+                if len(self._scopes) >= self.max_scopes:
+                    _, evicted = self._scopes.popitem(last=False)
+                    self.evictions += evicted.size
+                index = self._scopes[lookup.scope] = _ScopeIndex(lookup.vector.shape[0], self.max_entries)
+            self._scopes.move_to_end(lookup.scope)
+
+            now = time.monotonic()
+            if index.size < self.max_entries:
+                slot = index.size
+                index.size += 1
+            else:
+                expired = index.created < now - self.ttl if self.ttl is not None else np.zeros(self.max_entries, dtype=bool)
+                slot = int(np.argmin(np.where(expired, -1.0, index.last_used)))
+                self.evictions += 1
+            index.vectors[slot] = lookup.vector
+            index.responses[slot] = response
+            index.created[slot] = index.last_used[slot] = now
+
+    def stats(self) -> dict[str, Any]:
+        """Hit-rate metrics of the cache since the process started."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": sum(index.size for index in self._scopes.values()),
+                "scopes": len(self._scopes),
+            }
+
+
+_response_cache: Optional[SemanticResponseCache] = None
+
+def response_cache_enabled() -> bool:
+    return os.environ.get("RESPONSE_CACHE", "").lower() in ("1", "true", "yes")
+
+def get_response_cache() -> Optional[SemanticResponseCache]:
+    """
+    Process-wide cache configured by RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL
+    and EMBEDDING_PROVIDER, None if RESPONSE_CACHE is not enabled.
+    """
+    global _response_cache
+    if not response_cache_enabled():
+        return None
+    if _response_cache is None:
+        try:
+            from ..llm_factory import get_embedding
+        except ImportError:
+            from src.agents.llm_factory import get_embedding
+        ttl = os.environ.get("RESPONSE_CACHE_TTL")
+        _response_cache = SemanticResponseCache(
+            get_embedding(),
+            threshold=float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+            ttl=float(ttl) if ttl else None,
+        )
+    return _response_cache
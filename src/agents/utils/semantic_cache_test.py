@@ -0,0 +1,108 @@
+import asyncio
+import re
+import unittest
+
+from langchain_core.embeddings import Embeddings
+
+try:
+    from .semantic_cache import SemanticResponseCache, cache_scope
+    from .fake_llm import FakeChatModel
+    from ..base_agent.base_agent import BaseAgent, invoke_base_agent, ainvoke_base_agent
+except ImportError:
+    from src.agents.utils.semantic_cache import SemanticResponseCache, cache_scope
+    from src.agents.utils.fake_llm import FakeChatModel
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent, ainvoke_base_agent
+
+VOCABULARY = ["how", "do", "i", "compute", "calculate", "the", "dot", "product", "cross", "vectors", "of", "two", "what", "is"]
+
+class BagOfWordsEmbedding(Embeddings):
+    """Word-count embedding, so paraphrases sharing most words are similar."""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        self.embedded += 1
+        words = re.findall(r"[a-z]+", text.lower())
+        return [float(words.count(word)) for word in VOCABULARY] + [1e-3]
+
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+class TestSemanticResponseCache(unittest.TestCase):
+    """
+    TestCase Class used to test the semantic cache of the opening tutor responses.
+    """
+
+    def setUp(self):
+        self.cache = SemanticResponseCache(BagOfWordsEmbedding(), threshold=0.85, max_entries=2)
+        self.scope = cache_scope({"questionTitle": "Dot Product"}, "part-1")
+
+    def test_paraphrase_hits_within_scope(self):
+        miss = self.cache.lookup(self.scope, "How do I compute the dot product of two vectors?")
+        self.assertIsNone(miss.response)
+        self.cache.store(miss, "What do you multiply first?")
+
+        self.assertEqual(self.cache.lookup(self.scope, "how do i calculate the dot product of two vectors").response, "What do you multiply first?")
+        self.assertIsNone(self.cache.lookup(self.scope, "what is the cross product").response)
+        other_part = cache_scope({"questionTitle": "Dot Product"}, "part-2")
+        self.assertIsNone(self.cache.lookup(other_part, "How do I compute the dot product of two vectors?").response)
+
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.25)
+
+    def test_submissions_are_part_of_the_scope(self):
+        question = {"questionTitle": "Dot Product"}
+        wrong = [{"publishedResponseAreaId": "area-1", "totalSubmissions": 1, "latestSubmission": {"submission": "3", "feedback": "Incorrect"}}]
+        right = [{"publishedResponseAreaId": "area-1", "totalSubmissions": 1, "latestSubmission": {"submission": "5", "feedback": "Correct"}}]
+
+        self.assertEqual(cache_scope(question, "part-1", []), self.scope)
+        self.assertEqual(cache_scope(question, "part-1", [{"publishedResponseAreaId": "area-1"}]), self.scope)
+        self.assertNotEqual(cache_scope(question, "part-1", wrong), self.scope)
+        self.assertNotEqual(cache_scope(question, "part-1", wrong), cache_scope(question, "part-1", right))
+
+        miss = self.cache.lookup(cache_scope(question, "part-1", wrong), "Why is my answer wrong?")
+        self.cache.store(miss, "Check the sign of the second term.")
+        self.assertIsNone(self.cache.lookup(cache_scope(question, "part-1", right), "Why is my answer wrong?").response)
+
+    def test_least_recently_used_is_evicted(self):
+        for message in ["what is the dot product", "what is the cross product", "how do i compute vectors"]:
+            if message == "how do i compute vectors":
+                # use the first entry, so the second one is the least recently used
+                self.assertIsNotNone(self.cache.lookup(self.scope, "what is the dot product").response)
+            self.cache.store(self.cache.lookup(self.scope, message), f"answer to {message}")
+
+        self.assertIsNotNone(self.cache.lookup(self.scope, "what is the dot product").response)
+        self.assertIsNone(self.cache.lookup(self.scope, "what is the cross product").response)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+
+    def test_expired_responses_are_not_served(self):
+        cache = SemanticResponseCache(BagOfWordsEmbedding(), threshold=0.85, ttl=0)
+        cache.store(cache.lookup(self.scope, "what is the dot product"), "answer")
+
+        self.assertIsNone(cache.lookup(self.scope, "what is the dot product").response)
+
+    def test_agent_serves_first_turns_from_cache(self):
+        agent = BaseAgent(routes=FAKE_ROUTES, checkpointer=None, response_cache=self.cache)
+        agent.llm = FakeChatModel(response="What do you multiply first?")
+
+        def ask(message: str, history: list, scope: str | None = None) -> str:
+            return invoke_base_agent(message, history + [{"type": "user", "content": message}], "", "", "", "cache-test", base_agent=agent, response_cache_scope=scope)["output"]
+
+        ask("How do I compute the dot product?", [], self.scope)
+        self.assertEqual(ask("how do i calculate the dot product", [], self.scope), "What do you multiply first?")
+        self.assertEqual(agent.llm.calls, 1)
+
+        # opted out, or past the first turn
+        ask("How do I compute the dot product?", [])
+        ask("How do I compute the dot product?", [{"type": "user", "content": "hi"}, {"type": "ai", "content": "hello"}], self.scope)
+        self.assertEqual(agent.llm.calls, 3)
+
+        answer = asyncio.run(ainvoke_base_agent("how do i compute the dot product", [{"type": "user", "content": "how do i compute the dot product"}], "", "", "", "cache-test", base_agent=agent, response_cache_scope=self.scope))
+        self.assertEqual(answer["output"], "What do you multiply first?")
+        self.assertEqual(agent.llm.calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Single-flight coalescing of duplicate requests.
+---
+A double-clicked send or a frontend retry starts a second run of the same request while the first one is
+still waiting on the LLM. With SingleFlight the duplicates wait on the result of the first execution
+instead of starting their own LLM calls, and a late retry within the retention window gets the same result.
+Failed executions are not retained, so a retry after an error runs again.
+
+Sync (threads) and async (asyncio tasks) callers share the same in-flight executions.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+def request_key(*parts: Any) -> str:
+    """Hash of the JSON-encodable parts of a request."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """In-flight and recently completed executions by key, completed ones are kept for `retention` seconds."""
+
+    def __init__(self, retention: float = 10.0):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._executions: dict[Hashable, Future] = {}
+        self._completed: deque = deque()
+        self.coalesced = 0
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """Future of the execution of the key and whether the caller has to run it (leader)."""
+        with self._lock:
+            now = time.monotonic()
+            while self._completed and self._completed[0][0] <= now - self.retention:
+                _, expired_key, expired = self._completed.popleft()
+                if self._executions.get(expired_key) is expired:
+                    del self._executions[expired_key]
+            future = self._executions.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._executions[key] = future
+            return future, True
+
+    def _complete(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if error is not None or self.retention <= 0:
+                self._executions.pop(key, None)
+            else:
+                self._completed.append((time.monotonic(), key, future))
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, key: Optional[Hashable], function: Callable[[], Any]) -> Any:
+        """Run function() once for concurrent callers with the same key (no coalescing if the key is None)."""
+        if key is None:
+            return function()
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = function()
+        except BaseException as error:
+            self._complete(key, future, error=error)
+            raise
+        self._complete(key, future, result)
+        return result
+
+    async def arun(self, key: Optional[Hashable], function: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of run(), the duplicates await the first execution without blocking the event loop."""
+        if key is None:
+            return await function()
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(await asyncio.wrap_future(future))
+        try:
+            result = await function()
+        except BaseException as error:
+            self._complete(key, future, error=error)
+            raise
+        self._complete(key, future, result)
+        return result
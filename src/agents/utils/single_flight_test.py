@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .single_flight import SingleFlight
+except ImportError:
+    from src.agents.utils.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    TestCase Class used to test the coalescing of duplicate requests.
+    """
+
+    def setUp(self):
+        self.executions = 0
+        self.lock = threading.Lock()
+
+    def slow_request(self, result: str = "answer") -> str:
+        with self.lock:
+            self.executions += 1
+        time.sleep(0.1)
+        return result
+
+    def test_concurrent_duplicates_run_once(self):
+        single_flight = SingleFlight(retention=0)
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: single_flight.run("conversation:hash", self.slow_request), range(5)))
+
+        self.assertEqual(results, ["answer"] * 5)
+        self.assertEqual(self.executions, 1)
+        self.assertEqual(single_flight.coalesced, 4)
+
+    def test_retention_window(self):
+        single_flight = SingleFlight(retention=0.2)
+
+        single_flight.run("key", self.slow_request)
+        single_flight.run("key", self.slow_request)
+        self.assertEqual(self.executions, 1)
+
+        time.sleep(0.25)
+        single_flight.run("key", self.slow_request)
+        single_flight.run("other key", self.slow_request)
+        self.assertEqual(self.executions, 3)
+
+    def test_errors_are_not_retained(self):
+        single_flight = SingleFlight(retention=10)
+
+        def failing_request():
+            self.slow_request()
+            raise RuntimeError("LLM call failed")
+
+        with self.assertRaises(RuntimeError):
+            single_flight.run("key", failing_request)
+        self.assertEqual(single_flight.run("key", self.slow_request), "answer")
+        self.assertEqual(self.executions, 2)
+
+    def test_async_duplicates_run_once(self):
+        single_flight = SingleFlight(retention=0)
+
+        async def request():
+            self.executions += 1
+            await asyncio.sleep(0.1)
+            return {"response": "answer"}
+
+        async def run():
+            return await asyncio.gather(*(single_flight.arun("key", request) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, [{"response": "answer"}] * 5)
+        self.assertEqual(self.executions, 1)
@@ -7,36 +7,103 @@ The agents will play the role of a tutor and a student conversing about the ques
 
 The conversations will be 20 turns long, with the tutor and student taking turns to send a message.
 
-The tutor can be one of the following types:
-- Informational Agent (base)
-The tutor agent can be selected by changing the "agent_type" field in this script.
+The tutor can be any agent variant of the registry in 'agent_registry.py' (e.g. base, combined_summary, or a
+variant defined in AGENT_VARIANTS_PATH). The tutor agents are selected with the --tutor-agent-types option.
 
 The student can have multiple skill levels and conversational styles. Those are defined by the prompts used by the LLM.
 
 Any of the models accessible through the API calls defined in the 'llm_factory.py' can be used for either the tutor and the agent LLM.
+
+-> BENCHMARK MODE: compare model routings (which model serves the tutor, summariser, style analyser and student roles).
+The same conversations are generated once per routing and the per-role LLM latency and the summary/style outputs are reported:
+$ python -m src.agents.utils.synthetic_conversation_generation --benchmark-routings '{"default": {}, "mini": {"summariser": "openai:gpt-4o-mini", "style_analyser": "openai:gpt-4o-mini"}}'
+
+-> SCALING MODE: long-horizon conversations of several lengths, recording for each turn the prompt tokens sent to the LLMs
+(4 characters per token), the latency and the process RSS. All roles use the offline fake LLM unless --scaling-real-llm is set
+(the configured routes, or the calls replayed from LLM_CASSETTE):
+$ python -m src.agents.utils.synthetic_conversation_generation --benchmark-scaling 10 50 100 200 --scaling-output scaling.csv
 """
 
+import argparse
+import contextlib
 import csv
+import io
 import json
+import resource
+import statistics
+import time
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
 try:
   from ..student_agent.student_agent import invoke_student_agent
   from .parse_json_context_to_prompt import parse_json_to_prompt
   from ..base_agent.base_agent import invoke_base_agent
+  from ..agent_registry import AGENT_VARIANTS, agent_variant_names, build_agent, get_agent
+  from ..llm_factory import latency_budget, estimate_tokens
 except ImportError:
   from src.agents.student_agent.student_agent import invoke_student_agent
   from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
   from src.agents.base_agent.base_agent import invoke_base_agent
+  from src.agents.agent_registry import AGENT_VARIANTS, agent_variant_names, build_agent, get_agent
+  from src.agents.llm_factory import latency_budget, estimate_tokens
 import os
 
+# Routes of the scaling mode: every role answered by the offline fake LLM
+FAKE_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake", "student": "fake"}
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+  """Counts the chat model calls and their prompt tokens (4 characters per token) while it is the current counter."""
+
+  def __init__(self):
+    self.calls = 0
+    self.prompt_tokens = 0
+
+  def on_chat_model_start(self, serialized: dict, messages: list, **kwargs: Any) -> None:
+    self.calls += len(messages)
+    self.prompt_tokens += sum(estimate_tokens(batch) for batch in messages)
+
+_prompt_token_counter: ContextVar[Optional[PromptTokenCounter]] = ContextVar("prompt_token_counter", default=None)
+register_configure_hook(_prompt_token_counter, inheritable=True)
 
-def generate_synthetic_conversations(raw_text: str, num_turns: int, student_agent_type: str, tutor_agent_type: str):
+def rss_mb() -> float:
+  """Resident set size of the process in MB (peak RSS where /proc is not available)."""
+  try:
+    with open("/proc/self/statm", "r") as file:
+      return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+  except (OSError, ValueError):
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+@contextlib.contextmanager
+def measure_turn(turn_metrics: Optional[list], turn: int, role: str):
+  """Append the prompt tokens, LLM calls, latency and RSS of a turn to turn_metrics (no-op if None)."""
+  if turn_metrics is None:
+    yield
+    return
+  counter = PromptTokenCounter()
+  token = _prompt_token_counter.set(counter)
+  start_time = time.perf_counter()
+  try:
+    yield
+  finally:
+    latency = time.perf_counter() - start_time
+    _prompt_token_counter.reset(token)
+    turn_metrics.append({"turn": turn + 1, "role": role, "prompt_tokens": counter.prompt_tokens, "llm_calls": counter.calls, "latency": round(latency, 4), "rss_mb": round(rss_mb(), 1)})
+
+
+def generate_synthetic_conversations(raw_text: str, num_turns: int, student_agent_type: str, tutor_agent_type: str, routes: dict | None = None, turn_metrics: list | None = None):
   """
   Generate a synthetic dataset of conversations between a tutor and a student [both LLMs].
+  Optional routes override the model routing of the agents (see LLM_ROUTES in llm_factory.py).
+  If a turn_metrics list is given, the metrics of each turn are appended to it (see measure_turn()).
   """
-  if tutor_agent_type == "base": 
-    invoke_tutor_agent = invoke_base_agent
-  else:
-    raise ValueError("Invalid tutor agent type")
+  if tutor_agent_type not in agent_variant_names():
+    raise ValueError(f"Invalid tutor agent type '{tutor_agent_type}', expected one of {', '.join(agent_variant_names())}")
+  tutor_agent = get_agent(tutor_agent_type) if routes is None else build_agent(AGENT_VARIANTS[tutor_agent_type], routes=routes)
+  invoke_tutor_agent = partial(invoke_base_agent, base_agent=tutor_agent)
     
   parsed_json = json.loads(raw_text)
   params = parsed_json["params"]
@@ -64,38 +131,134 @@ def generate_synthetic_conversations(raw_text: str, num_turns: int, student_agen
     else:
       message = conversation_history[-1]["content"]
 
-    if i % 2 == 0:
-      # Student starts
-      student_response = invoke_student_agent(message, conversation_history[:-1], summary, student_agent_type, question_response_details_prompt, conversation_id)
-      conversation_history.append({
-        "role": "user",
-        "content": student_response["output"]
-      })
-    else:
-      tutor_response = invoke_tutor_agent(message, conversation_history, summary, conversational_style, question_response_details_prompt, conversation_id)
-      conversation_history.append({
-        "role": "assistant",
-        "content": tutor_response["output"]
-      })
-
-      if "summary" in tutor_response:
-        summary = tutor_response["summary"]
-      if "conversationalStyle" in tutor_response:
-        conversational_style = tutor_response["conversationalStyle"]
+    with measure_turn(turn_metrics, i, "student" if i % 2 == 0 else "tutor"):
+      if i % 2 == 0:
+        # Student starts
+        student_response = invoke_student_agent(message, conversation_history[:-1], summary, student_agent_type, question_response_details_prompt, conversation_id, routes)
+        conversation_history.append({
+          "role": "user",
+          "content": student_response["output"]
+        })
+      else:
+        tutor_response = invoke_tutor_agent(message, conversation_history, summary, conversational_style, question_response_details_prompt, conversation_id)
+        conversation_history.append({
+          "role": "assistant",
+          "content": tutor_response["output"]
+        })
+
+        # intermediate_steps: [summary, conversational style, conversation history]
+        summary = tutor_response["intermediate_steps"][0]
+        conversational_style = tutor_response["intermediate_steps"][1]
   
   #  Save Conversation
   conversation_output = {
     "conversation_id": conversation_id+"_"+student_agent_type+"_"+tutor_agent_type+"_synthetic",
     "student_agent_type": student_agent_type,
     "tutor_agent_type": tutor_agent_type,
-    "conversation": conversation_history
+    "conversation": conversation_history,
+    "summary": summary,
+    "conversational_style": conversational_style
   }
   return conversation_output
 
 
+def benchmark_model_routings(raw_text: str, num_turns: int, student_agent_type: str, routings: dict) -> dict:
+  """
+  Benchmark mode: generate the same conversation once per model routing ({name: routes}) and
+  report the LLM latency per role, the total time and the summary/style outputs of each routing.
+  """
+  results = {}
+  for routing_name, routes in routings.items():
+    print(f"Benchmarking routing '{routing_name}': {routes}")
+    start_time = time.perf_counter()
+    with latency_budget() as llm_attempts:
+      conversation = generate_synthetic_conversations(raw_text, num_turns, student_agent_type, "base", routes=routes)
+    total_time = time.perf_counter() - start_time
+
+    latency_per_role = {}
+    for attempt in llm_attempts:
+      if attempt["outcome"] == "ok":
+        latency_per_role.setdefault(attempt["llm"], []).append(attempt["latency"])
+
+    results[routing_name] = {
+      "routes": routes,
+      "total_time": round(total_time, 3),
+      "latency": {
+        role: {"calls": len(latencies), "mean": round(statistics.mean(latencies), 3), "max": round(max(latencies), 3)}
+        for role, latencies in latency_per_role.items()
+      },
+      "summary": conversation["summary"],
+      "conversational_style": conversation["conversational_style"],
+    }
+  return results
+
+
+def benchmark_conversation_scaling(raw_text: str, turn_counts: list[int], student_agent_type: str, routes: dict | None = FAKE_ROUTES) -> dict:
+  """
+  Scaling mode: generate one conversation per number of turns and report how the prompt tokens, the latency
+  and the RSS grow over the turns, per role (student/tutor). Returns {num_turns: {"turns": [...], "summary": {...}}}.
+  """
+  results = {}
+  for num_turns in turn_counts:
+    print(f"Benchmarking a conversation of {num_turns} turns")
+    turn_metrics = []
+    rss_before = rss_mb()
+    start_time = time.perf_counter()
+    # the agents log every turn, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+      generate_synthetic_conversations(raw_text, num_turns, student_agent_type, "base", routes=routes, turn_metrics=turn_metrics)
+    total_time = time.perf_counter() - start_time
+
+    summary = {"total_time": round(total_time, 3), "rss_growth_mb": round(turn_metrics[-1]["rss_mb"] - rss_before, 1)}
+    for role in ("student", "tutor"):
+      turns = [turn for turn in turn_metrics if turn["role"] == role]
+      if not turns:
+        continue
+      last = turns[-min(5, len(turns)):]
+      summary[role] = {
+        "first_prompt_tokens": turns[0]["prompt_tokens"],
+        "last_prompt_tokens": turns[-1]["prompt_tokens"],
+        "max_prompt_tokens": max(turn["prompt_tokens"] for turn in turns),
+        "mean_latency": round(statistics.mean(turn["latency"] for turn in turns), 4),
+        "last_turns_mean_latency": round(statistics.mean(turn["latency"] for turn in last), 4),
+      }
+    results[num_turns] = {"turns": turn_metrics, "summary": summary}
+  return results
+
+
 if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Generate synthetic tutor/student conversations.")
+  parser.add_argument("--benchmark-routings", help="JSON {name: routes} of model routings to benchmark instead of generating the dataset")
+  parser.add_argument("--benchmark-turns", type=int, default=16, help="conversation turns in benchmark mode (the tutor summarises past 11 messages)")
+  parser.add_argument("--benchmark-scaling", type=int, nargs="+", help="conversation lengths (turns) to benchmark in scaling mode, e.g. 10 50 100 200")
+  parser.add_argument("--scaling-real-llm", action="store_true", help="use the configured routes (or LLM_CASSETTE) instead of the fake LLM in scaling mode")
+  parser.add_argument("--scaling-output", help="CSV file for the per-turn metrics of the scaling mode")
+  parser.add_argument("--tutor-agent-types", nargs="+", default=["base"], help="tutor agent variants of the dataset (see agent_registry.py)")
+  args = parser.parse_args()
+
+  if args.benchmark_scaling:
+    with open("src/agents/utils/example_inputs/example_input_1.json", "r") as file:
+      raw_text = file.read()
+    results = benchmark_conversation_scaling(raw_text, args.benchmark_scaling, "base", None if args.scaling_real_llm else FAKE_ROUTES)
+    print(json.dumps({num_turns: result["summary"] for num_turns, result in results.items()}, indent=2))
+    if args.scaling_output:
+      with open(args.scaling_output, "w", newline='') as csvfile:
+        csv_writer = csv.DictWriter(csvfile, fieldnames=["num_turns", "turn", "role", "prompt_tokens", "llm_calls", "latency", "rss_mb"])
+        csv_writer.writeheader()
+        for num_turns, result in results.items():
+          for turn in result["turns"]:
+            csv_writer.writerow({"num_turns": num_turns, **turn})
+    raise SystemExit(0)
+
+  if args.benchmark_routings:
+    with open("src/agents/utils/example_inputs/example_input_1.json", "r") as file:
+      raw_text = file.read()
+    results = benchmark_model_routings(raw_text, args.benchmark_turns, "base", json.loads(args.benchmark_routings))
+    print(json.dumps(results, indent=2))
+    raise SystemExit(0)
+
   num_turns = 6
-  tutor_agent_types   = ["base"]                           
+  tutor_agent_types   = args.tutor_agent_types
   # Students can be "base", "curious", "contradicting", "reliant", "confused", "unrelated"
   student_agent_types = ["base", "curious", "contradicting", "reliant", "confused", "unrelated"]  
 
@@ -0,0 +1,125 @@
+"""
+Warm-up of the chat function during the Lambda init phase (or before a server worker reports ready).
+---
+Constructing the agent at import is not enough for a fast first request: the first invocation still pays
+for the lazy imports of LangChain, LangGraph and the provider SDKs, the first run of the graph and the
+prompt parser, and loading the tokenizer data. warm_up() pays these costs up front with a dry pass against
+the offline fake LLM, so no network connection is opened and no API key is used. The one exception is on-prem:
+the models of the roles routed to the local inference server ('ollama') are loaded into the server's memory.
+
+This keeps the init phase snapshot-friendly (Lambda SnapStart): nothing in the snapshot depends on an open
+connection, and the random state used for the retry jitter is reseeded after a restore.
+
+Enabled with WARM_UP=true, and by default when running in Lambda (AWS_LAMBDA_FUNCTION_NAME is set).
+"""
+
+import importlib
+import os
+import random
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+try:
+    from ..base_agent.base_agent import BaseAgent, invoke_base_agent
+    from ..llm_factory import get_llm, preload_local_models
+    from ..agent_registry import AGENT_VARIANTS, compile_agent_variants
+    from .metrics import metrics
+    from .message_normalisation import normalise_messages
+    from .parse_json_context_to_prompt import parse_json_to_prompt
+except ImportError:
+    from src.agents.base_agent.base_agent import BaseAgent, invoke_base_agent
+    from src.agents.llm_factory import get_llm, preload_local_models
+    from src.agents.agent_registry import AGENT_VARIANTS, compile_agent_variants
+    from src.agents.utils.metrics import metrics
+    from src.agents.utils.message_normalisation import normalise_messages
+    from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
+
+WARM_UP_ROUTES = {"tutor": "fake", "summariser": "fake", "style_analyser": "fake"}
+
+# Modules the provider SDKs only import when the first request is sent or its response parsed
+LAZY_IMPORTS = [
+    "openai.types.chat",
+    "openai.resources.chat.completions",
+    "langchain_openai.chat_models.base",
+    "langchain_core.output_parsers.openai_tools",
+    "tiktoken_ext.openai_public",
+]
+
+WARM_UP_QUESTION = {
+    "questionTitle": "Warm-up",
+    "questionGuidance": "",
+    "questionContent": "Compute $a \\cdot b$.",
+    "durationLowerBound": 0,
+    "durationUpperBound": 5,
+    "parts": [{
+        "publishedPartId": "warm-up-part",
+        "publishedPartPosition": 0,
+        "publishedPartContent": "Compute the dot product.",
+        "publishedPartAnswerContent": "",
+        "publishedWorkedSolutionSections": [{"id": "warm-up-ws", "position": 0, "title": "", "content": "Multiply and sum the components."}],
+        "publishedStructuredTutorialSections": [],
+        "publishedResponseAreas": [],
+    }],
+}
+
+def warm_up_enabled() -> bool:
+    setting = os.environ.get("WARM_UP")
+    if setting is not None:
+        return setting.lower() in ("1", "true", "yes")
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+def warm_up() -> dict:
+    """Run the warm-up steps, returning the duration of each step in seconds. A failing step is reported and skipped."""
+    timings = {}
+    for name, step in [("imports", _import_lazy_modules), ("prompt_parser", _dry_parse), ("graph", _dry_graph_pass), ("agent_variants", compile_agent_variants), ("local_models", _preload_local_models), ("tokenizer", _load_tokenizer)]:
+        start_time = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"WARNING:: warm-up step '{name}' failed: ", e)
+        timings[name] = time.perf_counter() - start_time
+    # the dry pass is not a request
+    metrics.reset()
+    _register_snapshot_hooks()
+    print("Warm-up done: ", {name: round(duration, 3) for name, duration in timings.items()})
+    return timings
+
+def _import_lazy_modules() -> None:
+    for module in LAZY_IMPORTS:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+def _dry_parse() -> None:
+    parse_json_to_prompt([], WARM_UP_QUESTION, {"currentPart": {"id": "warm-up-part", "position": 0}})
+    normalise_messages([{"type": "user", "content": "Hello"}, {"type": "assistant", "content": "Hi"}])
+
+def _dry_graph_pass() -> None:
+    """Run the summarisation and the tutor nodes of a base agent graph on the fake LLM."""
+    agent = BaseAgent(routes=WARM_UP_ROUTES, checkpointer=InMemorySaver())
+    history = []
+    for i in range(agent.max_messages_to_summarize + 1):
+        history.append(HumanMessage(content=f"warm-up {i}") if i % 2 == 0 else AIMessage(content=f"warm-up {i}"))
+    invoke_base_agent("warm-up", history, "", "", "", f"warm-up-{uuid.uuid4()}", base_agent=agent)
+
+def _preload_local_models() -> None:
+    """Load the local models of the default routes and of the agent variants (nothing to do without an 'ollama' route)."""
+    preloaded = preload_local_models([None] + [variant.routes for variant in AGENT_VARIANTS.values() if variant.routes])
+    if preloaded:
+        print("Preloaded local models: ", preloaded)
+
+def _load_tokenizer() -> None:
+    """Load the tokenizer data of the tutor model (for OpenAI models: the tiktoken encoding, from TIKTOKEN_CACHE_DIR if set)."""
+    get_llm("tutor").get_num_tokens("warm-up")
+
+def _register_snapshot_hooks() -> None:
+    try:
+        from snapshot_restore_py import register_after_restore
+    except ImportError:
+        return
+    # every restored execution environment must draw its own retry jitter
+    register_after_restore(random.seed)
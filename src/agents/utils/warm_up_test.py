@@ -0,0 +1,28 @@
+import os
+import unittest
+from unittest import mock
+
+try:
+    from .warm_up import warm_up, warm_up_enabled
+except ImportError:
+    from src.agents.utils.warm_up import warm_up, warm_up_enabled
+
+class TestWarmUp(unittest.TestCase):
+    """
+    TestCase Class used to test the warm-up of the init phase.
+    ---
+    The dry pass runs on the offline fake provider, the tutor role is routed to it as well.
+    """
+
+    def test_runs_every_step(self):
+        with mock.patch.dict(os.environ, {"LLM_ROUTE_TUTOR": "fake"}):
+            timings = warm_up()
+
+        self.assertEqual(set(timings), {"imports", "prompt_parser", "graph", "agent_variants", "local_models", "tokenizer"})
+
+    def test_enabled_in_lambda_by_default(self):
+        with mock.patch.dict(os.environ, {"AWS_LAMBDA_FUNCTION_NAME": "chat"}):
+            os.environ.pop("WARM_UP", None)
+            self.assertTrue(warm_up_enabled())
+        with mock.patch.dict(os.environ, {"AWS_LAMBDA_FUNCTION_NAME": "chat", "WARM_UP": "false"}):
+            self.assertFalse(warm_up_enabled())
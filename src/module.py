@@ -1,3 +1,4 @@
+import os
 import time
 from typing import Any
 from lf_toolkit.chat.result import ChatResult as Result
@@ -5,12 +6,31 @@ from lf_toolkit.chat.params import ChatParams as Params
 
 try:
     from .agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
-    from .agents.base_agent.base_agent import invoke_base_agent
+    from .agents.base_agent.base_agent import invoke_base_agent, ainvoke_base_agent
     from .agents.utils.types import JsonType
+    from .agents.llm_factory import latency_budget
+    from .agents.utils.question_retrieval import retrieval_enabled, get_retriever
+    from .agents.utils.single_flight import SingleFlight, request_key
+    from .agents.utils.semantic_cache import response_cache_enabled, cache_scope
+    from .agents.utils.opening_turns import get_opening_turn_store, opening_request_key
+    from .agents.utils.message_classifier import classify_message, message_classifier_enabled
+    from .agents.utils.metrics import AGENT_LATENCY, LLM_ATTEMPTS, TUTOR_REPLIES
+    from .agents.agent_registry import DEFAULT_AGENT_VARIANT, get_agent
 except ImportError:
     from src.agents.utils.parse_json_context_to_prompt import parse_json_to_prompt
-    from src.agents.base_agent.base_agent import invoke_base_agent
+    from src.agents.base_agent.base_agent import invoke_base_agent, ainvoke_base_agent
     from src.agents.utils.types import JsonType
+    from src.agents.llm_factory import latency_budget
+    from src.agents.utils.question_retrieval import retrieval_enabled, get_retriever
+    from src.agents.utils.single_flight import SingleFlight, request_key
+    from src.agents.utils.semantic_cache import response_cache_enabled, cache_scope
+    from src.agents.utils.opening_turns import get_opening_turn_store, opening_request_key
+    from src.agents.utils.message_classifier import classify_message, message_classifier_enabled
+    from src.agents.utils.metrics import AGENT_LATENCY, LLM_ATTEMPTS, TUTOR_REPLIES
+    from src.agents.agent_registry import DEFAULT_AGENT_VARIANT, get_agent
+
+# Duplicate requests (double-clicked send, frontend retries) wait on the first execution, see single_flight.py
+_single_flight = SingleFlight(retention=float(os.environ.get("SINGLE_FLIGHT_RETENTION", "10")))
 
 def chat_module(message: Any, params: Params) -> JsonType:
     """
@@ -35,12 +55,107 @@ def chat_module(message: Any, params: Params) -> JsonType:
     to output the Chatbot response.
     """
 
-    result = Result()
+    return _single_flight.run(_request_key(message, params), lambda: _chat_module(message, params))
+
+async def chat_module_async(message: Any, params: Params) -> JsonType:
+    """
+    Async version of chat_module() with the same inputs and outputs.
+    ---
+    The agent is invoked through the async LangGraph/LLM path so that
+    an event loop can serve many conversations concurrently.
+    """
+
+    return await _single_flight.arun(_request_key(message, params), lambda: _chat_module_async(message, params))
+
+def _chat_module(message: Any, params: Params) -> JsonType:
+    fast_path_result = _fast_path_result(message, params)
+    if fast_path_result is not None:
+        return fast_path_result
+
+    include_test_data, agent_kwargs = _agent_arguments(message, params)
+
+    start_time = time.time()
+
+    with latency_budget(_latency_budget()) as llm_attempts:
+        chatbot_response = invoke_base_agent(**agent_kwargs)
+
+    end_time = time.time()
+    AGENT_LATENCY.observe((end_time - start_time) * 1000, variant=agent_kwargs["base_agent"].variant)
+    chatbot_response["agent_type"] = agent_kwargs["base_agent"].variant
+
+    return _chat_result(chatbot_response, end_time - start_time, include_test_data, llm_attempts)
+
+async def _chat_module_async(message: Any, params: Params) -> JsonType:
+    fast_path_result = _fast_path_result(message, params)
+    if fast_path_result is not None:
+        return fast_path_result
+
+    include_test_data, agent_kwargs = _agent_arguments(message, params)
+
+    start_time = time.time()
+
+    with latency_budget(_latency_budget()) as llm_attempts:
+        chatbot_response = await ainvoke_base_agent(**agent_kwargs)
+
+    end_time = time.time()
+    AGENT_LATENCY.observe((end_time - start_time) * 1000, variant=agent_kwargs["base_agent"].variant)
+    chatbot_response["agent_type"] = agent_kwargs["base_agent"].variant
+
+    return _chat_result(chatbot_response, end_time - start_time, include_test_data, llm_attempts)
+
+def _request_key(message: Any, params: Params) -> str | None:
+    """
+    Single-flight key of a request: its conversation id and a hash of the message and the parameters (history included),
+    so only identical requests are coalesced. None (no coalescing) without a conversation id.
+    """
+    if "conversation_id" not in params:
+        return None
+    return f"{params['conversation_id']}:{request_key(message, params)}"
+
+def _fast_path_result(message: Any, params: Params) -> JsonType | None:
+    """
+    Templated response of a greeting, acknowledgement or off-topic message (MESSAGE_CLASSIFIER enabled), without running the agent.
+    None for the other messages, and for the openers answered by the precomputed opening turns.
+    """
+    if not message_classifier_enabled():
+        return None
+
+    start_time = time.time()
+    question_response_details = params.get("question_response_details") or {}
+    question_information = question_response_details.get("questionInformation") or {}
+    conversation_history = params.get("conversation_history") or []
+    message_class = classify_message(message, conversation_history, question_information)
+    if message_class.response is None:
+        return None
+    if len(conversation_history) <= 1 and (params.get("agent_type") or DEFAULT_AGENT_VARIANT) == DEFAULT_AGENT_VARIANT:
+        # the openers the agent answers from the precomputed opening turns (a greeting on a fresh part) keep that answer
+        question_submission_summary = question_response_details.get("questionSubmissionSummary") or []
+        question_access_information = question_response_details.get("questionAccessInformation") or {}
+        if _opening_turn_key(message, params, question_submission_summary, question_information, question_access_information) is not None:
+            return None
+
+    chatbot_response = {
+        "input": message,
+        "output": message_class.response,
+        "intermediate_steps": [params.get("summary", ""), params.get("conversational_style", ""), conversation_history],
+        "message_class": message_class.label,
+    }
+    TUTOR_REPLIES.inc(source="fast_path")
+    return _chat_result(chatbot_response, time.time() - start_time, params.get("include_test_data", False), [])
+
+def _agent_arguments(message: Any, params: Params) -> tuple[bool, dict]:
+    """
+    Read the chat parameters and build the keyword arguments of the agent invocation.
+    """
+
     include_test_data = False
     conversation_history = []
     summary = ""
     conversationalStyle = ""
     question_response_details_prompt = ""
+    response_cache_scope = None
+    opening_turn_key = None
+    agent_type = params.get("agent_type") or DEFAULT_AGENT_VARIANT
 
     if "include_test_data" in params:
         include_test_data = params["include_test_data"]
@@ -55,11 +170,20 @@ def chat_module(message: Any, params: Params) -> JsonType:
         question_submission_summary = question_response_details["questionSubmissionSummary"] if "questionSubmissionSummary" in question_response_details else []
         question_information = question_response_details["questionInformation"] if "questionInformation" in question_response_details else {}
         question_access_information = question_response_details["questionAccessInformation"] if "questionAccessInformation" in question_response_details else {}
+        selected_sections = _select_question_sections(message, question_information, question_access_information)
+        response_cache_scope = _response_cache_scope(params, question_submission_summary, question_information, question_access_information)
+        if response_cache_scope and agent_type != DEFAULT_AGENT_VARIANT:
+            # the variants of an A/B test do not share their cached responses
+            response_cache_scope = f"{response_cache_scope}:{agent_type}"
+        if agent_type == DEFAULT_AGENT_VARIANT:
+            # the opening turns are precomputed with the base agent
+            opening_turn_key = _opening_turn_key(message, params, question_submission_summary, question_information, question_access_information)
         try:
             question_response_details_prompt = parse_json_to_prompt(
                 question_submission_summary,
                 question_information,
-                question_access_information
+                question_access_information,
+                selected_sections
             )
             print("INFO:: ", question_response_details_prompt)
         except Exception as e:
@@ -69,23 +193,81 @@ def chat_module(message: Any, params: Params) -> JsonType:
         conversation_id = params["conversation_id"]
     else:
         raise Exception("Internal Error: The conversation id is required in the parameters of the chat module.")
-    
-    start_time = time.time()
 
-    chatbot_response = invoke_base_agent(query=message, \
-                            conversation_history=conversation_history, \
-                            summary=summary, \
-                            conversationalStyle=conversationalStyle, \
-                            question_response_details=question_response_details_prompt, \
-                            session_id=conversation_id)
+    return include_test_data, {
+        "query": message,
+        "conversation_history": conversation_history,
+        "summary": summary,
+        "conversationalStyle": conversationalStyle,
+        "question_response_details": question_response_details_prompt,
+        "session_id": conversation_id,
+        "response_cache_scope": response_cache_scope,
+        "opening_turn_key": opening_turn_key,
+        "base_agent": get_agent(agent_type),
+    }
 
-    end_time = time.time()
+def _select_question_sections(message: Any, question_information: dict, question_access_information: dict) -> set | None:
+    """
+    Worked solution and tutorial sections relevant to the message (QUESTION_RETRIEVAL enabled), None to include all of them.
+    """
+    if not retrieval_enabled() or not question_information:
+        return None
+    try:
+        current_part_id = ((question_access_information or {}).get("currentPart") or {}).get("id")
+        return get_retriever().select_sections(question_information, str(message), current_part_id)
+    except Exception as e:
+        print("WARNING:: question section retrieval failed, including all sections: ", e)
+        return None
+
+def _response_cache_scope(params: Params, question_submission_summary: list, question_information: dict, question_access_information: dict) -> str | None:
+    """
+    Scope (question version, current part and submissions) of the response cache, None if the cache is disabled (RESPONSE_CACHE),
+    the request opts out with "response_cache": false or there is no question to scope it to.
+    """
+    if not response_cache_enabled() or params.get("response_cache") is False or not question_information:
+        return None
+    current_part_id = ((question_access_information or {}).get("currentPart") or {}).get("id")
+    return cache_scope(question_information, current_part_id, question_submission_summary)
+
+def _opening_turn_key(message: Any, params: Params, question_submission_summary: list, question_information: dict, question_access_information: dict) -> str | None:
+    """
+    Key of the precomputed opening turn answering the message, None if there is no store (OPENING_TURNS_PATH),
+    the request opts out with "response_cache": false or the message is not an opener of a fresh part.
+    """
+    if get_opening_turn_store() is None or params.get("response_cache") is False:
+        return None
+    return opening_request_key(message, question_submission_summary, question_information, question_access_information)
+
+def _latency_budget() -> float | None:
+    """
+    Latency budget (in seconds) shared by all LLM calls of a request, from LLM_LATENCY_BUDGET.
+    A tighter budget set by the caller (e.g. the Lambda remaining time in the handler) still applies.
+    """
+    budget = os.environ.get("LLM_LATENCY_BUDGET")
+    return float(budget) if budget else None
+
+def _chat_result(chatbot_response: dict, processing_time: float, include_test_data: bool, llm_attempts: list) -> JsonType:
+    """
+    Convert the agent response into the chat function response.
+    """
+
+    for attempt in llm_attempts:
+        LLM_ATTEMPTS.inc(outcome=attempt["outcome"])
+
+    result = Result()
 
-    result._processing_time = end_time - start_time
+    result._processing_time = processing_time
     result.add_response("chatbot_response", chatbot_response["output"])
     result.add_metadata("summary", chatbot_response["intermediate_steps"][0])
     result.add_metadata("conversational_style", chatbot_response["intermediate_steps"][1])
     result.add_metadata("conversation_history", chatbot_response["intermediate_steps"][2])
-    result.add_processing_time(end_time - start_time)
+    result.add_metadata("llm_attempts", llm_attempts)
+    if "message_class" in chatbot_response:
+        result.add_metadata("message_class", chatbot_response["message_class"])
+    if "agent_type" in chatbot_response:
+        result.add_metadata("agent_type", chatbot_response["agent_type"])
+    if "llm_output" in chatbot_response:
+        result.add_metadata("llm_output", chatbot_response["llm_output"])
+    result.add_processing_time(processing_time)
 
     return result.to_dict(include_test_data=include_test_data)
\ No newline at end of file
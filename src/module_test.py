@@ -1,9 +1,17 @@
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 try:
-    from .module import Params, chat_module
+    from .module import Params, chat_module, _fast_path_result
+    from .agents.utils.opening_turns import OpeningTurnStore, opening_request_key
 except ImportError:
-    from module import Params, chat_module
+    from module import Params, chat_module, _fast_path_result
+    from agents.utils.opening_turns import OpeningTurnStore, opening_request_key
+
+EXAMPLE_INPUT = os.path.join(os.path.dirname(__file__), "agents", "utils", "example_inputs", "example_input_1.json")
 
 class TestChatModuleFunction(unittest.TestCase):
     """
@@ -83,4 +91,27 @@ class TestChatModuleFunction(unittest.TestCase):
         result = chat_module(response, params)
 
         self.assertIsNotNone(result.get("processing_time"))
-        self.assertGreaterEqual(result.get("processing_time"), 0)
\ No newline at end of file
+        self.assertGreaterEqual(result.get("processing_time"), 0)
+
+    def test_fast_path_with_opening_turns(self):
+        # greetings get the templated fast path, except the openers answered by a precomputed opening turn
+        with open(EXAMPLE_INPUT, "r") as file:
+            details = json.load(file)["params"]["question_response_details"]
+        part_id = details["questionInformation"]["parts"][0]["publishedPartId"]
+        details["questionAccessInformation"] = {"currentPart": {"id": part_id, "position": 0}}
+        details["questionSubmissionSummary"] = []
+        store = OpeningTurnStore(os.path.join(tempfile.mkdtemp(), "opening_turns.json"))
+        store.put(opening_request_key("Hi", [], details["questionInformation"], details["questionAccessInformation"]), "Hi! What is the question asking you to find?")
+        store.save()
+
+        def params(message: str, submissions: list) -> Params:
+            return Params(conversation_history=[{"type": "user", "content": message}], summary="", conversational_style="",
+                          question_response_details={**details, "questionSubmissionSummary": submissions}, conversation_id="1234Test")
+
+        with mock.patch.dict(os.environ, {"MESSAGE_CLASSIFIER": "true", "OPENING_TURNS_PATH": store.path}):
+            for message in ["yo", "hiii", "hey there tutor"]:
+                with self.subTest(message=message):
+                    self.assertIsNotNone(_fast_path_result(message, params(message, [])))
+            self.assertIsNone(_fast_path_result("Hello!", params("Hello!", [])))
+            submissions = [{"publishedPartId": part_id, "totalSubmissions": 2}]
+            self.assertIsNotNone(_fast_path_result("Hello!", params("Hello!", submissions)))